@@ -1,24 +1,85 @@
-import pandas as pd
 import json
+import os
 
-# 数据清洗部分
-def clean_data(input_file, output_json):
-    # 读取数据
-    excel_data = pd.ExcelFile(input_file)
-    data = excel_data.parse('Sheet1')
-    
-    # 规范列名
-    data.columns = data.columns.str.replace('\n', '').str.strip()
-    
-    # 提取需要的列并清洗数据
-    data_cleaned = data[['一级分类', '首日打赏']].copy()
-    data_cleaned['首日打赏'] = pd.to_numeric(data_cleaned['首日打赏'], errors='coerce')
+from novel_trends.aggregate import aggregate_chunks
+from novel_trends.chartdata import columns, data_path, write_chart_data
+from novel_trends.cube import rollup
+from novel_trends.dataset import load_dataset
+from novel_trends.templates import render_page
+
+# 流水线中饼图的输出文件名和读取的列
+OUTPUT_HTML = '不同类别的打赏_饼图.html'
+INPUT_COLUMNS = ['一级分类', '首日打赏']
+
+# 查询服务中饼图数据的接口名称，见 novel_trends.server
+QUERY = 'rewards'
+
+# 饼图的渲染函数，data 为按列存储的分类名称和打赏总额
+RENDER_JS = """
+function (chart, data) {
+    chart.setOption({
+        title: {
+            text: '分类打赏总额占比',
+            left: 'center'
+        },
+        tooltip: {
+            trigger: 'item'
+        },
+        legend: {
+            orient: 'vertical',
+            left: 'left'
+        },
+        series: [
+            {
+                name: '打赏总额',
+                type: 'pie',
+                radius: '50%',
+                data: data.name.map(function (name, i) {
+                    return {name: name, value: data.value[i]};
+                }),
+                emphasis: {
+                    itemStyle: {
+                        shadowBlur: 10,
+                        shadowOffsetX: 0,
+                        shadowColor: 'rgba(0, 0, 0, 0.5)'
+                    }
+                }
+            }
+        ]
+    });
+}
+"""
+
+# 数据汇总部分
+def summarize_rewards(data):
+    # 提取需要的列，首日打赏按 float64 累加以免丢失精度
+    data_cleaned = data[['一级分类', '首日打赏']].astype({'首日打赏': 'float64'})
     
     # 按一级分类汇总首日打赏
-    summary = data_cleaned.groupby('一级分类', as_index=False)['首日打赏'].sum()
+    summary = data_cleaned.groupby('一级分类', as_index=False, observed=True)['首日打赏'].sum()
     
     # 填充缺失值为0
     summary['首日打赏'] = summary['首日打赏'].fillna(0)
+    return summary
+
+# 分块汇总部分：逐块求和后合并，结果与 summarize_rewards 一致，数据集不需要整体载入内存
+def summarize_reward_chunks(chunks):
+    summary = aggregate_chunks(
+        chunks, '一级分类', {'首日打赏': ('首日打赏', 'sum')},
+        prepare=lambda chunk: chunk[['一级分类', '首日打赏']].astype({'首日打赏': 'float64'})
+    ).reset_index()
+    summary['首日打赏'] = summary['首日打赏'].fillna(0)
+    return summary
+
+# 立方体汇总部分：从聚合立方体上卷到一级分类，结果与 summarize_rewards 一致
+def summarize_reward_cube(cube):
+    summary = rollup(cube, ['一级分类'], ['首日打赏']).reset_index()
+    return summary[summary['一级分类'].notna()].reset_index(drop=True)
+
+# 数据清洗部分
+def clean_data(input_file, output_json):
+    # 读取数据并汇总
+    summary = summarize_rewards(load_dataset(input_file))
     
     # 保存为 JSON 文件
     summary.to_json(output_json, orient='records', force_ascii=False, indent=4)
@@ -32,72 +93,57 @@ def generate_html(input_json, output_html):
     
     # 生成用于 ECharts 的数据格式
     chart_data = [{"name": item["一级分类"], "value": item["首日打赏"]} for item in data]
+    render_html(chart_data, output_html)
+
+def render_html(chart_data, output_html):
+    # 数据按列写入单独的 JSON 文件，由页面加载
+    data_file, data_url = data_path(output_html)
+    write_chart_data(columns(chart_data, ['name', 'value']), data_file)
     
-    # HTML 模板
-    html_template = f"""
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Reward Visualization</title>
-        <script src="https://cdn.jsdelivr.net/npm/echarts/dist/echarts.min.js"></script>
-    </head>
-    <body>
-        <div id="main" style="width: 600px; height: 400px;"></div>
-        <script>
-            var chartDom = document.getElementById('main');
-            var myChart = echarts.init(chartDom);
-            var option;
-
-            option = {{
-                title: {{
-                    text: '分类打赏总额占比',
-                    left: 'center'
-                }},
-                tooltip: {{
-                    trigger: 'item'
-                }},
-                legend: {{
-                    orient: 'vertical',
-                    left: 'left'
-                }},
-                series: [
-                    {{
-                        name: '打赏总额',
-                        type: 'pie',
-                        radius: '50%',
-                        data: {chart_data},
-                        emphasis: {{
-                            itemStyle: {{
-                                shadowBlur: 10,
-                                shadowOffsetX: 0,
-                                shadowColor: 'rgba(0, 0, 0, 0.5)'
-                            }}
-                        }}
-                    }}
-                ]
-            }};
-
-            option && myChart.setOption(option);
-        </script>
-    </body>
-    </html>
-    """
-    
-    # 保存 HTML 文件
-    with open(output_html, 'w', encoding='utf-8') as f:
-        f.write(html_template)
+    # 使用共享的页面外壳生成 HTML 文件
+    outputs = render_page(output_html, 'Reward Visualization', RENDER_JS, data_url,
+                          style='width: 600px; height: 400px;')
+    return outputs + [data_file]
+
+def chart_records(summary):
+    return [
+        {"name": name, "value": float(value)}
+        for name, value in zip(summary['一级分类'], summary['首日打赏'])
+    ]
 
-# 执行清洗和生成
-input_file = '../data/飞卢小说数据.xlsx'
-output_json = 'cleaned_data.json'
-output_html = 'reward_visualization.html'
+def render_summary(summary, output_dir):
+    output_html = os.path.join(output_dir, OUTPUT_HTML)
+    return render_html(chart_records(summary), output_html)
 
-# 数据清洗
-clean_data(input_file, output_json)
+# 查询服务：返回与数据文件相同结构的饼图数据
+def query(df):
+    return columns(chart_records(summarize_rewards(df)), ['name', 'value'])
 
-# 生成 HTML
-generate_html(output_json, output_html)
+# 流水线阶段：基于已加载的数据直接生成饼图
+def build(df, output_dir):
+    return render_summary(summarize_rewards(df), output_dir)
+
+# 流水线阶段：由聚合立方体生成饼图，见 novel_trends.cube
+def build_from_cube(cube, output_dir):
+    return render_summary(summarize_reward_cube(cube), output_dir)
+
+# 流水线阶段（分块模式）：chunks 为逐块读取的数据
+def build_chunked(chunks, output_dir):
+    return render_summary(summarize_reward_chunks(chunks), output_dir)
+
+def main():
+    # 执行清洗和生成
+    input_file = '../data/飞卢小说数据.xlsx'
+    output_json = 'cleaned_data.json'
+    output_html = 'reward_visualization.html'
+    
+    # 数据清洗
+    clean_data(input_file, output_json)
+    
+    # 生成 HTML
+    generate_html(output_json, output_html)
+    
+    print(f"HTML 文件已生成: {output_html}")
 
-print(f"HTML 文件已生成: {output_html}")
+if __name__ == "__main__":
+    main()
@@ -1,96 +1,138 @@
-import pandas as pd
-import jieba
 import json
+import os
+from collections import Counter
 
-# 数据清洗和 HTML 文件生成部分
-def process_book_titles(input_file, output_json, output_html):
-    # 读取 Excel 文件
-    excel_data = pd.ExcelFile(input_file)
-    data = excel_data.parse('Sheet1')
-    
-    # 提取书名列
-    data['书名'] = data['书名'].astype(str)  # 确保书名为字符串
-    all_titles = ' '.join(data['书名'])
+from novel_trends.chartdata import data_path, write_chart_data
+from novel_trends.dataset import load_dataset
+from novel_trends.segment import TOKEN_CACHE, segment_titles
+from novel_trends.templates import ECHARTS, WORDCLOUD, render_page
+
+# 流水线中词云图的输出文件名和读取的列
+OUTPUT_HTML = '词云.html'
+INPUT_COLUMNS = ['书号', '书名', '一级分类', '二级分类']
+
+# 默认只保留词频最高的 100 个词，词云的数据量不随书籍数量增长
+DEFAULT_TOP_K = 100
+DEFAULT_MIN_FREQ = 2
+
+# 词云图的渲染函数，依赖 echarts-wordcloud 插件
+PAGE_SCRIPTS = (ECHARTS, WORDCLOUD)
+RENDER_JS = """
+function (chart, data) {
+    chart.setOption({
+        tooltip: {
+            show: true
+        },
+        series: [{
+            type: 'wordCloud',
+            gridSize: 2,
+            sizeRange: [12, 50],
+            rotationRange: [-90, 90],
+            shape: 'circle',
+            width: 800,
+            height: 600,
+            drawOutOfBound: true,
+            textStyle: {
+                fontFamily: 'sans-serif',
+                fontWeight: 'bold',
+                color: function () {
+                    return 'rgb(' + [
+                        Math.round(Math.random() * 255),
+                        Math.round(Math.random() * 255),
+                        Math.round(Math.random() * 255)
+                    ].join(',') + ')';
+                }
+            },
+            data: data.name.map(function (name, i) { return {name: name, value: data.value[i]}; })
+        }]
+    });
+}
+"""
+
+# 读取停用词文件，每行一个词，忽略空行和 # 开头的注释
+def load_stopwords(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return sorted({line.strip() for line in f if line.strip() and not line.startswith('#')})
+
+# 书名分词和词频统计部分
+def count_title_words(data, top_k=DEFAULT_TOP_K, min_freq=DEFAULT_MIN_FREQ,
+                      categories=None, subcategories=None, stopwords=None, jobs=None, cache_file=TOKEN_CACHE):
+    # 按一级分类、二级分类筛选书籍
+    if categories:
+        data = data[data['一级分类'].isin(categories)]
+    if subcategories:
+        data = data[data['二级分类'].isin(subcategories)]
+    stopwords = set(stopwords or ())
     
-    # 分词
-    words = jieba.lcut(all_titles)
+    # 逐个书名分词（书名之间不会粘连），结果按书号缓存，cache_file 为 None 时不使用缓存
+    titles = data['书名'].astype(str)  # 确保书名为字符串
+    tokens = segment_titles(data['书号'], titles, cache_file=cache_file, jobs=jobs)
     
     # 统计词频
-    word_freq = {}
-    for word in words:
-        if len(word.strip()) > 1:  # 过滤单字
-            word_freq[word] = word_freq.get(word, 0) + 1
+    word_freq = Counter(
+        word for title_tokens in tokens for word in title_tokens
+        if len(word.strip()) > 1 and word not in stopwords  # 过滤单字和停用词
+    )
+    
+    # 取词频最高的 top_k 个词（Counter.most_common 内部使用堆选择），top_k 为空时不限数量
+    top_words = word_freq.most_common(top_k or None)
     
     # 过滤低频词
-    word_freq = {word: freq for word, freq in word_freq.items() if freq >= 70}
+    return {word: freq for word, freq in top_words if freq >= min_freq}
+
+# 数据清洗和 HTML 文件生成部分
+def process_book_titles(input_file, output_json, output_html):
+    # 读取数据并统计词频
+    word_freq = count_title_words(load_dataset(input_file))
     
     # 保存词频数据为 JSON 文件
     with open(output_json, 'w', encoding='utf-8') as f:
         json.dump(word_freq, f, ensure_ascii=False)
     
     # 生成 HTML 文件
-    html_content = f"""
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>词云图</title>
-        <script src="https://cdn.jsdelivr.net/npm/echarts/dist/echarts.min.js"></script>
-    </head>
-    <body>
-        <h1>基于书名的词云图</h1>
-        <div id="main" style="width: 800px; height: 600px;"></div>
-        <script>
-            // 加载词频数据
-            var wordFreq = {json.dumps(word_freq, ensure_ascii=False)};
-            var data = Object.entries(wordFreq).map(([name, value]) => {{ return {{ name, value }}; }});
-
-            // 配置词云图
-            var chartDom = document.getElementById('main');
-            var myChart = echarts.init(chartDom);
-            var option = {{
-                tooltip: {{
-                    show: true
-                }},
-                series: [{{
-                    type: 'wordCloud',
-                    gridSize: 2,
-                    sizeRange: [12, 50],
-                    rotationRange: [-90, 90],
-                    shape: 'circle',
-                    width: 800,
-                    height: 600,
-                    drawOutOfBound: true,
-                    textStyle: {{
-                        fontFamily: 'sans-serif',
-                        fontWeight: 'bold',
-                        color: function() {{
-                            return 'rgb(' + [
-                                Math.round(Math.random() * 255),
-                                Math.round(Math.random() * 255),
-                                Math.round(Math.random() * 255)
-                            ].join(',') + ')';
-                        }}
-                    }},
-                    data: data
-                }}]
-            }};
-            myChart.setOption(option);
-        </script>
-    </body>
-    </html>
-    """
-    with open(output_html, 'w', encoding='utf-8') as f:
-        f.write(html_content)
+    render_html(word_freq, output_html)
     
     print(f"HTML 文件已生成: {output_html}")
 
+# 词云数据按列写入单独的 JSON 文件，页面使用共享外壳，返回生成的文件路径
+def render_html(word_freq, output_html, title='基于书名的词云图'):
+    data_file, data_url = data_path(output_html)
+    write_chart_data({'name': list(word_freq), 'value': list(word_freq.values())}, data_file)
+    
+    outputs = render_page(
+        output_html, '词云图', RENDER_JS, data_url,
+        header=f"<h1>{title}</h1>", style='width: 800px; height: 600px;', scripts=PAGE_SCRIPTS,
+    )
+    return outputs + [data_file]
+
+
+# 流水线阶段：基于已加载的数据直接生成词云图，参数含义同 count_title_words
+def build(df, output_dir, top_k=DEFAULT_TOP_K, min_freq=DEFAULT_MIN_FREQ,
+          categories=None, subcategories=None, stopwords=None):
+    word_freq = count_title_words(
+        df, top_k=top_k, min_freq=min_freq,
+        categories=categories, subcategories=subcategories, stopwords=stopwords,
+    )
+    
+    # 有筛选条件时在标题中注明
+    title = '基于书名的词云图'
+    filters = list(categories or []) + list(subcategories or [])
+    if filters:
+        title += f"（{'、'.join(filters)}）"
+    
+    output_html = os.path.join(output_dir, OUTPUT_HTML)
+    return render_html(word_freq, output_html, title)
+
+
+def main():
+    # 文件路径设置
+    input_file = "../data/飞卢小说数据.xlsx"  # 替换为您的文件路径
+    output_json = "word_freq.json"  # 替换为输出 JSON 的路径
+    output_html = "book_titles_wordcloud.html"  # 替换为输出 HTML 的路径
+    
+    # 运行程序
+    process_book_titles(input_file, output_json, output_html)
 
-# 文件路径设置
-input_file = "../data/飞卢小说数据.xlsx"  # 替换为您的文件路径
-output_json = "word_freq.json"  # 替换为输出 JSON 的路径
-output_html = "book_titles_wordcloud.html"  # 替换为输出 HTML 的路径
 
-# 运行程序
-process_book_titles(input_file, output_json, output_html)
+if __name__ == "__main__":
+    main()
@@ -1,119 +1,380 @@
-import pandas as pd
+import glob
 import json
+import math
+import os
 
+from novel_trends.aggregate import aggregate_chunks
+from novel_trends.chartdata import columns, data_path, write_chart_data
+from novel_trends.dataset import load_dataset
+from novel_trends.templates import render_page
 
-def analyze_author_data(input_file):
+# 流水线中雷达图的输出文件名和读取的列
+OUTPUT_HTML = '多作者雷达图对比.html'
+INPUT_COLUMNS = ['作者', '总次数(双榜)', '最好名次(双榜)', '首日鲜花', '首日评价', '首日字数(千)']
+
+# 参与对比的作者至少需要的书籍数量
+DEFAULT_MIN_BOOKS = 5
+
+# 雷达图的各项指标
+CATEGORIES = ['平均上榜次数', '平均最好名次', '平均首日鲜花', '平均首日评价', '平均首日字数']
+
+# 按作者分组统计书籍数量和各项均值，分块聚合时同样使用
+COLUMNS_TO_AVERAGE = ['总次数(双榜)', '最好名次(双榜)', '首日鲜花', '首日评价', '首日字数(千)']
+AUTHOR_AGGS = {
+    '书籍数量': ('总次数(双榜)', 'size'),
+    '平均上榜次数': ('总次数(双榜)', 'mean'),
+    '平均最好名次': ('最好名次(双榜)', 'mean'),
+    '平均首日鲜花': ('首日鲜花', 'mean'),
+    '平均首日评价': ('首日评价', 'mean'),
+    '平均首日字数': ('首日字数(千)', 'mean'),  # 此处匹配实际列名
+}
+
+# 名次越小越好：按该指标排序时取最小值，归一化时反转，使雷达图上越靠外表现越好
+LOWER_IS_BETTER = {'平均最好名次'}
+
+# 首屏展示的作者数量、排序依据的指标以及其余作者每页的数量
+DEFAULT_TOP_N = 10
+DEFAULT_METRIC = '平均首日鲜花'
+PAGE_SIZE = 10
+
+# 数据文件中相对于页面的地址，页面移动到其他目录（如综合页面）时需要改写
+DATA_URLS = ['pages']
+
+# 雷达图数据项按列写入数据文件的字段
+PAGE_KEYS = ['name', 'value', 'raw']
+
+# 雷达图的渲染函数：首屏作者随主数据文件加载，其余作者通过图表下方的翻页按钮按需加载
+RENDER_JS = """
+function (chart, data) {
+    var indicators = data.indicators;
+    var pageCount = data.pageCount;
+    var pages = {};
+    var current = 0;
+
+    // 翻页按钮放在图表容器之后
+    var pager = document.createElement('div');
+    pager.style.textAlign = 'center';
+    pager.innerHTML = '<button>上一页</button> <span></span> <button>下一页</button>';
+    chart.getDom().insertAdjacentElement('afterend', pager);
+    var prevButton = pager.children[0];
+    var pageInfo = pager.children[1];
+    var nextButton = pager.children[2];
+
+    // 按列存储的分页数据还原为雷达图数据项
+    function toItems(page) {
+        return page.name.map(function (name, i) {
+            return {name: name, value: page.value[i], raw: page.raw[i]};
+        });
+    }
+
+    function showPage(page) {
+        var items = pages[page];
+        current = page;
+        chart.setOption({
+            legend: {data: items.map(function (item) { return item.name; })},
+            series: [{data: items}]
+        });
+        pageInfo.textContent = '第 ' + (page + 1) + ' / ' + (pageCount + 1) + ' 页';
+        prevButton.disabled = page === 0;
+        nextButton.disabled = page === pageCount;
+    }
+
+    function loadPage(page) {
+        if (page < 0 || page > pageCount) return;
+        if (pages[page]) {
+            showPage(page);
+            return;
+        }
+        fetch(data.pages + '/page-' + page + '.json')
+            .then(function (response) { return response.json(); })
+            .then(function (rows) {
+                pages[page] = toItems(rows);
+                showPage(page);
+            });
+    }
+
+    prevButton.onclick = function () { loadPage(current - 1); };
+    nextButton.onclick = function () { loadPage(current + 1); };
+
+    pages[0] = toItems(data.page);
+    chart.setOption({
+        title: {
+            text: '多作者维度雷达图',
+            left: 'center'
+        },
+        tooltip: {
+            trigger: 'item',
+            formatter: function (params) {
+                var lines = [params.name];
+                indicators.forEach(function (indicator, i) {
+                    var raw = params.data.raw[i];
+                    lines.push(indicator.name + '：' + (raw === null ? '-' : raw));
+                });
+                return lines.join('<br/>');
+            }
+        },
+        legend: {
+            top: 'bottom',
+            data: []
+        },
+        radar: {
+            indicator: indicators
+        },
+        series: [{
+            name: '作者对比',
+            type: 'radar',
+            data: []
+        }]
+    });
+    showPage(0);
+}
+"""
+
+
+def analyze_author_data(input_file, min_books=DEFAULT_MIN_BOOKS, metric=DEFAULT_METRIC):
     """
     分析作者数据，生成多作者雷达图数据
-    
+
     Args:
         input_file (str): 输入Excel文件路径
-        
+        min_books (int): 作者至少需要的书籍数量
+        metric (str): 作者排序依据的指标
+
     Returns:
         tuple: 包含作者统计数据、雷达图数据和分类数据的元组
     """
     # 1. 加载数据
-    df = pd.read_excel(input_file, sheet_name='Sheet1')
-    
-    # 2. 清理列名
-    df.columns = df.columns.str.replace('\n', '')  # 去掉列名中的换行符
-    
-    # 转换为数值类型的列
-    columns_to_clean = ['总次数(双榜)', '最好名次(双榜)', '首日鲜花', '首日评价', '首日字数(千)']
-    for col in columns_to_clean:
-        df[col] = pd.to_numeric(df[col], errors='coerce')
-    
-    # 3. 筛选出至少有 5 本书的作者
-    author_book_count = df.groupby('作者').size()
-    valid_authors = author_book_count[author_book_count > 5].index
-    
-    # 筛选出符合条件的作者数据
-    filtered_df = df[df['作者'].isin(valid_authors)]
-    
-    # 4. 分组统计
-    author_stats = filtered_df.groupby('作者').agg(
-        平均上榜次数=('总次数(双榜)', 'mean'),
-        平均最好名次=('最好名次(双榜)', 'mean'),
-        平均首日鲜花=('首日鲜花', 'mean'),
-        平均首日评价=('首日评价', 'mean'),
-        平均首日字数=('首日字数(千)', 'mean')  # 此处匹配实际列名
-    ).reset_index()
-    
+    return analyze_author_frame(load_dataset(input_file), min_books, metric)
+
+
+def rank_authors(author_stats, metric=DEFAULT_METRIC, top_n=DEFAULT_TOP_N):
+    """
+    按指标对作者排序：前 top_n 名用 nlargest/nsmallest 选出，其余作者按同一指标排在后面
+
+    Args:
+        author_stats (pd.DataFrame): 作者统计数据
+        metric (str): 排序依据的指标，可以是 CATEGORIES 中的指标或 书籍数量
+        top_n (int): 首屏展示的作者数量
+
+    Returns:
+        pd.DataFrame: 排序后的作者统计数据
+
+    Raises:
+        ValueError: 未知的指标
+    """
+    if metric not in CATEGORIES and metric != '书籍数量':
+        raise ValueError(f"未知的雷达图排序指标：{metric}（可选：书籍数量、{'、'.join(CATEGORIES)}）")
+
+    ascending = metric in LOWER_IS_BETTER
+    pick = author_stats.nsmallest if ascending else author_stats.nlargest
+    top = pick(top_n, metric)
+    rest = author_stats.drop(top.index).sort_values(metric, ascending=ascending, kind='stable')
+    return author_stats.loc[top.index.append(rest.index)]
+
+
+def normalize_indicators(values):
+    """
+    对每项指标做最小-最大值归一化，取值范围为 0~1
+
+    LOWER_IS_BETTER 中的指标归一化后取反；所有作者取值相同的指标统一取 0.5。
+
+    Args:
+        values (pd.DataFrame): 各作者的指标原始值，列为 CATEGORIES
+
+    Returns:
+        pd.DataFrame: 归一化后的指标值
+    """
+    low, high = values.min(), values.max()
+    span = (high - low).where(high > low)
+    normalized = ((values - low) / span).fillna(0.5).where(values.notna())
+    for col in LOWER_IS_BETTER & set(values.columns):
+        normalized[col] = 1 - normalized[col]
+    return normalized.round(4)
+
+
+def _json_values(matrix):
+    """
+    将数值矩阵转换为列表，缺失值转换为 None，保证输出的是合法的 JSON
+    """
+    return [[None if math.isnan(v) else v for v in row] for row in matrix.tolist()]
+
+
+def analyze_author_frame(df, min_books=DEFAULT_MIN_BOOKS, metric=DEFAULT_METRIC, top_n=DEFAULT_TOP_N):
+    """
+    基于已加载的数据分析作者数据，不修改传入的 DataFrame
+
+    Args:
+        df (pd.DataFrame): 原始小说数据
+        min_books (int): 作者至少需要的书籍数量
+        metric (str): 作者排序依据的指标
+        top_n (int): 首屏展示的作者数量
+
+    Returns:
+        tuple: 包含作者统计数据、雷达图数据和分类数据的元组，作者按 metric 排序
+    """
+    # 2-3. 一次分组同时统计书籍数量和各项均值
+    author_stats = _author_columns(df).groupby('作者', observed=True).agg(**AUTHOR_AGGS)
+    return summarize_authors(author_stats, min_books, metric, top_n)
+
+
+def analyze_author_chunks(chunks, min_books=DEFAULT_MIN_BOOKS, metric=DEFAULT_METRIC, top_n=DEFAULT_TOP_N):
+    """
+    逐块统计作者数据后合并，结果与 analyze_author_frame 一致，数据集不需要整体载入内存
+
+    部分结果按作者保存，内存占用随作者数量增长，与书籍的行数无关。
+
+    Args:
+        chunks (iterable): 逐块读取的小说数据
+        min_books (int): 作者至少需要的书籍数量
+        metric (str): 作者排序依据的指标
+        top_n (int): 首屏展示的作者数量
+
+    Returns:
+        tuple: 包含作者统计数据、雷达图数据和分类数据的元组，作者按 metric 排序
+    """
+    author_stats = aggregate_chunks(chunks, '作者', AUTHOR_AGGS, prepare=_author_columns)
+    return summarize_authors(author_stats, min_books, metric, top_n)
+
+
+def _author_columns(df):
+    """
+    数值列按 float64 求均值，列名和类型已由 schema 统一
+    """
+    return df[['作者'] + COLUMNS_TO_AVERAGE].astype({col: 'float64' for col in COLUMNS_TO_AVERAGE})
+
+
+def summarize_authors(author_stats, min_books=DEFAULT_MIN_BOOKS, metric=DEFAULT_METRIC, top_n=DEFAULT_TOP_N):
+    """
+    由按作者分组的统计数据筛选、排序作者并生成雷达图数据
+
+    Args:
+        author_stats (pd.DataFrame): 以作者为索引的书籍数量和各项均值
+        min_books (int): 作者至少需要的书籍数量
+        metric (str): 作者排序依据的指标
+        top_n (int): 首屏展示的作者数量
+
+    Returns:
+        tuple: 包含作者统计数据、雷达图数据和分类数据的元组，作者按 metric 排序
+    """
+    # 4. 筛选出至少有 min_books 本书的作者，并按指标排序
+    author_stats = author_stats[author_stats['书籍数量'] >= min_books].reset_index()
+    author_stats = rank_authors(author_stats, metric, top_n).reset_index(drop=True)
+
     # 让所有数值保留两位小数
-    for col in ['平均上榜次数', '平均最好名次', '平均首日鲜花', '平均首日评价', '平均首日字数']:
-        author_stats[col] = author_stats[col].round(2)
-    
-    # 5. 准备雷达图数据
-    categories = ['平均上榜次数', '平均最好名次', '平均首日鲜花', '平均首日评价', '平均首日字数']
-    categories_json = json.dumps([{"name": cat} for cat in categories], ensure_ascii=False)
-    
-    # 构建雷达图数据格式
-    radar_data = []
-    for _, row in author_stats.iterrows():
-        radar_data.append({
-            "name": row['作者'],
-            "value": row[categories].tolist()
-        })
-    
+    author_stats[CATEGORIES] = author_stats[CATEGORIES].round(2)
+
+    # 5. 准备雷达图数据：各指标量纲差异很大，坐标轴统一归一化到 0~1，提示框中显示原始值
+    categories_json = json.dumps([{"name": cat, "min": 0, "max": 1} for cat in CATEGORIES], ensure_ascii=False)
+
+    names = author_stats['作者'].astype(str).tolist()
+    values = _json_values(normalize_indicators(author_stats[CATEGORIES]).to_numpy())
+    raw_values = _json_values(author_stats[CATEGORIES].to_numpy())
+    radar_data = [
+        {"name": name, "value": value, "raw": raw}
+        for name, value, raw in zip(names, values, raw_values)
+    ]
+
     return author_stats, radar_data, categories_json
 
 
-def generate_radar_html(author_stats, radar_data, categories_json, output_html):
+def write_author_pages(radar_data, output_html, top_n=DEFAULT_TOP_N, page_size=PAGE_SIZE):
+    """
+    将首屏之外的作者按 page_size 分页写入 JSON 文件，页面翻页时再按需加载
+
+    Args:
+        radar_data (list): 按指标排序的雷达图数据
+        output_html (str): 输出HTML文件路径
+        top_n (int): 首屏展示的作者数量，这些作者写入页面的主数据文件
+        page_size (int): 每页的作者数量
+
+    Returns:
+        list: 生成的分页文件路径
+    """
+    stem = os.path.splitext(os.path.basename(output_html))[0]
+    directory = os.path.splitext(data_path(output_html)[0])[0]
+    os.makedirs(directory, exist_ok=True)
+    # 清理上次构建留下的分页，作者变少时旧的分页文件不会再被引用
+    for stale in glob.glob(os.path.join(directory, 'page-*.json*')):
+        os.remove(stale)
+
+    paths = []
+    rest = radar_data[top_n:]
+    for number, start in enumerate(range(0, len(rest), page_size), start=1):
+        path = data_path(output_html, f'{stem}/page-{number}')[0]
+        paths.append(write_chart_data(columns(rest[start:start + page_size], PAGE_KEYS), path))
+    return paths
+
+
+def generate_radar_html(author_stats, radar_data, categories_json, output_html, min_books=DEFAULT_MIN_BOOKS,
+                        metric=DEFAULT_METRIC, top_n=DEFAULT_TOP_N, page_size=PAGE_SIZE):
     """
     生成多作者雷达图的HTML文件
-    
+
+    首屏只加载排名前 top_n 的作者，其余作者分页写入 JSON 文件，通过翻页按需加载。
+
     Args:
         author_stats (pd.DataFrame): 作者统计数据
         radar_data (list): 雷达图数据
         categories_json (str): JSON格式的分类数据
         output_html (str): 输出HTML文件路径
+        min_books (int): 作者至少需要的书籍数量，用于页面标题
+        metric (str): 作者排序依据的指标，用于页面标题
+        top_n (int): 首屏展示的作者数量
+        page_size (int): 其余作者每页的数量
+
+    Returns:
+        list: 生成的文件路径，包括数据文件和分页文件
     """
-    # 生成 HTML 文件
-    html_content = f"""
-<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="utf-8">
-    <title>多作者雷达图对比</title>
-    <script src="https://cdn.jsdelivr.net/npm/echarts/dist/echarts.min.js"></script>
-</head>
-<body>
-    <div style="text-align: center; font-size: 20px; margin-bottom: 20px;">超过5本书籍的作者维度对比</div>
-    <div id="radar-chart" style="width: 100%; height: 600px;"></div>
-    <script>
-        var chartDom = document.getElementById('radar-chart');
-        var myChart = echarts.init(chartDom);
-
-        var option = {{
-            title: {{
-                text: '多作者维度雷达图',
-                left: 'center'
-            }},
-            tooltip: {{
-                trigger: 'item'
-            }},
-            legend: {{
-                top: 'bottom',
-                data: {json.dumps(author_stats['作者'].tolist(), ensure_ascii=False)}
-            }},
-            radar: {{
-                indicator: {categories_json}
-            }},
-            series: [{{
-                name: '作者对比',
-                type: 'radar',
-                data: {json.dumps(radar_data, ensure_ascii=False)}
-            }}]
-        }};
-        myChart.setOption(option);
-    </script>
-</body>
-</html>
+    page_files = write_author_pages(radar_data, output_html, top_n, page_size)
+
+    # 指标、分页数量和首屏作者写入页面的主数据文件，各列只存一次列名
+    data_file, data_url = data_path(output_html)
+    write_chart_data({
+        'indicators': json.loads(categories_json),
+        # 分页文件所在目录，相对于页面
+        'pages': os.path.splitext(data_url)[0],
+        'pageCount': len(page_files),
+        'page': columns(radar_data[:top_n], PAGE_KEYS),
+    }, data_file)
+
+    # 使用共享的页面外壳生成 HTML 文件，标题和说明放在图表上方
+    header = f"""
+<div style="text-align: center; font-size: 20px; margin-bottom: 20px;">至少{min_books}本书籍的作者维度对比（共{len(author_stats)}位作者，按{metric}排序）</div>
+<div style="text-align: center; color: #666;">各指标已按最小-最大值归一化，越靠外表现越好；悬停查看原始数值</div>
 """
-    
-    # 保存 HTML 文件
-    with open(output_html, 'w', encoding='utf-8') as f:
-        f.write(html_content)
+    outputs = render_page(output_html, '多作者雷达图对比', RENDER_JS, data_url, header=header)
+    return outputs + [data_file] + page_files
+
+
+def build(df, output_dir, min_books=DEFAULT_MIN_BOOKS, metric=DEFAULT_METRIC, top_n=DEFAULT_TOP_N):
+    """
+    流水线阶段：基于已加载的数据生成多作者雷达图
+
+    Args:
+        df (pd.DataFrame): 原始小说数据
+        output_dir (str): 输出目录
+        min_books (int): 作者至少需要的书籍数量
+        metric (str): 作者排序依据的指标
+        top_n (int): 首屏展示的作者数量
+
+    Returns:
+        list: 生成的文件路径，包括分页数据文件
+    """
+    author_stats, radar_data, categories_json = analyze_author_frame(df, min_books, metric, top_n)
+    output_html = os.path.join(output_dir, OUTPUT_HTML)
+    return generate_radar_html(author_stats, radar_data, categories_json, output_html, min_books, metric, top_n)
+
+
+def build_chunked(chunks, output_dir, min_books=DEFAULT_MIN_BOOKS, metric=DEFAULT_METRIC, top_n=DEFAULT_TOP_N):
+    """
+    流水线阶段（分块模式）：逐块统计作者数据后生成多作者雷达图，参数同 build
+
+    Args:
+        chunks (iterable): 逐块读取的小说数据
+    """
+    author_stats, radar_data, categories_json = analyze_author_chunks(chunks, min_books, metric, top_n)
+    output_html = os.path.join(output_dir, OUTPUT_HTML)
+    return generate_radar_html(author_stats, radar_data, categories_json, output_html, min_books, metric, top_n)
 
 
 def main():
@@ -123,13 +384,13 @@ def main():
     # 设置文件路径
     input_file = '../data/飞卢小说数据.xlsx'
     output_html = '../visualizations/charts/多作者雷达图对比.html'
-    
+
     # 分析作者数据
     author_stats, radar_data, categories_json = analyze_author_data(input_file)
-    
+
     # 生成雷达图HTML
     generate_radar_html(author_stats, radar_data, categories_json, output_html)
-    
+
     print(f"雷达图HTML已生成：{output_html}")
 
 
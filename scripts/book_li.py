@@ -0,0 +1,301 @@
+import json
+import os
+import re
+from collections import defaultdict
+
+from novel_trends.chartdata import columns, data_path, write_chart_data
+from novel_trends.dataset import load_dataset
+from novel_trends.segment import TOKEN_CACHE, segment_titles
+from novel_trends.templates import render_page
+
+# 流水线中力导向图的输出文件名和读取的列
+OUTPUT_HTML = '力图.html'
+INPUT_COLUMNS = ['书号', '书名', '作者', '一级分类', '二级分类']
+
+# 默认只为同人小说建图，节点按二级分类着色
+DEFAULT_CATEGORIES = ['同人小说']
+
+# 两本书共享的各类关联键的权重：同一 IP 前缀（如 "原神："）、同一作者、同一书名词语
+KEY_WEIGHTS = {'ip': 3, 'author': 2, 'token': 1}
+
+# 权重达到 min_weight 的两本书之间才连线，默认共享一个书名词语不足以连线
+DEFAULT_MIN_WEIGHT = 2
+
+# 每个节点最多的连线数量
+DEFAULT_MAX_DEGREE = 8
+
+# 关联键下的书籍超过 MAX_POSTINGS 本时（如热门 IP、常见词语）不再两两配对，
+# 只与按书号排序后相邻的 WINDOW 本书配对，候选对的数量与书籍数量成线性关系
+MAX_POSTINGS = 50
+WINDOW = 5
+
+# IP 前缀：书名中全角或半角冒号之前、不超过 8 个字的部分
+IP_PREFIX = re.compile(r'^([^：:]{1,8})[：:]')
+
+# 力导向图的渲染函数，data 为按列存储的节点、按节点下标存储的连线和分类列表
+RENDER_JS = """
+function (chart, data) {
+    var nodes = data.nodes;
+    chart.setOption({
+        title: {
+            text: data.title,
+            left: 'center'
+        },
+        tooltip: {
+            formatter: function (params) {
+                if (params.dataType === 'node') {
+                    return '书名: ' + params.data.name + '<br/>分类: ' + data.categories[params.data.category] +
+                        '<br/>作者: ' + params.data.author + '<br/>关联: ' + params.data.value;
+                }
+                return '关联: ' + nodes.name[params.data.source] + ' -> ' + nodes.name[params.data.target];
+            }
+        },
+        legend: {
+            top: 'bottom',
+            data: data.categories
+        },
+        series: [{
+            type: 'graph',
+            layout: 'force',
+            force: {
+                repulsion: 300,
+                edgeLength: [50, 150]
+            },
+            roam: true,
+            // 书名可能重复，节点以下标作为 id
+            data: nodes.name.map(function (name, i) {
+                return {
+                    id: String(i),
+                    name: name,
+                    category: nodes.category[i],
+                    author: nodes.author[i],
+                    value: nodes.degree[i],
+                    symbolSize: 8 + Math.sqrt(nodes.degree[i]) * 4
+                };
+            }),
+            links: data.links.source.map(function (source, i) {
+                return {source: String(source), target: String(data.links.target[i])};
+            }),
+            categories: data.categories.map(function (category) { return {name: category}; }),
+            label: {
+                show: nodes.name.length <= 100,
+                position: 'right'
+            },
+            lineStyle: {
+                color: 'source',
+                curveness: 0.3
+            }
+        }]
+    });
+}
+"""
+
+
+def title_keys(title, tokens):
+    """
+    书名中用于关联的键：IP 前缀和长度至少为 2 的词语
+
+    参数:
+    title: str - 书名
+    tokens: list - 书名的分词结果
+
+    返回:
+    set - ('ip', 前缀) 和 ('token', 词语) 组成的集合
+    """
+    keys = {('token', token) for token in tokens if len(token.strip()) > 1}
+    match = IP_PREFIX.match(title)
+    if match:
+        keys.add(('ip', match.group(1).strip()))
+    return keys
+
+
+def build_index(keys_per_book):
+    """
+    建立 关联键 -> 书籍下标 的倒排索引
+
+    参数:
+    keys_per_book: list - 每本书的关联键集合
+
+    返回:
+    dict - 关联键 -> 按下标排序的书籍下标列表
+    """
+    index = defaultdict(list)
+    for book, keys in enumerate(keys_per_book):
+        for key in keys:
+            index[key].append(book)
+    return index
+
+
+def candidate_pairs(index, max_postings=MAX_POSTINGS, window=WINDOW):
+    """
+    通过倒排索引累加每对书籍共享的关联键权重，不需要比较所有的书籍对
+
+    参数:
+    index: dict - build_index 返回的倒排索引
+    max_postings: int - 关联键下的书籍不超过该数量时两两配对
+    window: int - 超过 max_postings 时每本书只与之后的 window 本书配对
+
+    返回:
+    dict - (下标较小的书, 下标较大的书) -> 权重
+    """
+    weights = defaultdict(int)
+    for (kind, _), books in index.items():
+        if len(books) < 2:
+            continue
+        weight = KEY_WEIGHTS[kind]
+        span = len(books) if len(books) <= max_postings else window + 1
+        for i, first in enumerate(books):
+            for second in books[i + 1:i + span]:
+                weights[first, second] += weight
+    return weights
+
+
+def select_links(weights, node_count, min_weight=DEFAULT_MIN_WEIGHT, max_degree=DEFAULT_MAX_DEGREE):
+    """
+    按权重从高到低选取连线，两端的节点都未达到 max_degree 时才保留
+
+    参数:
+    weights: dict - candidate_pairs 返回的权重
+    node_count: int - 节点数量
+    min_weight: int - 连线的最低权重
+    max_degree: int - 每个节点最多的连线数量
+
+    返回:
+    list - (书, 书, 权重) 列表，按权重从高到低排列
+    """
+    degree = [0] * node_count
+    links = []
+    for (first, second), weight in sorted(weights.items(), key=lambda item: (-item[1], item[0])):
+        if weight < min_weight:
+            break
+        if degree[first] >= max_degree or degree[second] >= max_degree:
+            continue
+        degree[first] += 1
+        degree[second] += 1
+        links.append((first, second, weight))
+    return links
+
+
+def build_graph(df, categories=None, min_weight=DEFAULT_MIN_WEIGHT, max_degree=DEFAULT_MAX_DEGREE,
+                cache_file=TOKEN_CACHE):
+    """
+    为指定一级分类的书籍建立关联图：共享 IP 前缀、作者或书名词语的书籍之间连线
+
+    参数:
+    df: DataFrame - 小说数据
+    categories: list - 只为这些一级分类的书籍建图，默认 DEFAULT_CATEGORIES
+    min_weight: int - 连线的最低权重
+    max_degree: int - 每个节点最多的连线数量
+    cache_file: str - 分词缓存文件，与词云共用，为 None 时不使用缓存
+
+    返回:
+    dict - title、nodes（按列存储的书号、书名、分类下标、作者和连线数量）、links（按节点下标存储）和 categories，
+    没有任何连线的书籍不出现在图中
+    """
+    categories = categories or DEFAULT_CATEGORIES
+    books = df[df['一级分类'].isin(categories)].sort_values('书号', kind='stable')
+    book_ids = books['书号'].tolist()
+    titles = books['书名'].astype(str).tolist()
+    authors = books['作者'].astype(str).tolist()
+    tokens = segment_titles(books['书号'], titles, cache_file=cache_file)
+
+    keys_per_book = [
+        title_keys(title, title_tokens) | {('author', author)}
+        for title, title_tokens, author in zip(titles, tokens, authors)
+    ]
+    weights = candidate_pairs(build_index(keys_per_book))
+    links = select_links(weights, len(titles), min_weight, max_degree)
+
+    # 只保留有连线的书籍，节点下标重新编号
+    degree = defaultdict(int)
+    for first, second, _ in links:
+        degree[first] += 1
+        degree[second] += 1
+    kept = sorted(degree)
+    position = {book: i for i, book in enumerate(kept)}
+
+    subcategories = books['二级分类'].astype(str).tolist()
+    category_names = sorted({subcategories[book] for book in kept})
+    category_index = {name: i for i, name in enumerate(category_names)}
+    nodes = [
+        {
+            'id': book_ids[book],
+            'name': titles[book],
+            'category': category_index[subcategories[book]],
+            'author': authors[book],
+            'degree': degree[book],
+        }
+        for book in kept
+    ]
+    return {
+        'title': f"{'、'.join(categories)}力导向图",
+        'nodes': columns(nodes, ['id', 'name', 'category', 'author', 'degree']),
+        'links': {
+            'source': [position[first] for first, _, _ in links],
+            'target': [position[second] for _, second, _ in links],
+        },
+        'categories': category_names,
+    }
+
+
+def graph_records(graph):
+    """
+    将图数据转换为按记录存储的 nodes/edges 结构，键与仓库中的 同人小说_力导向数据.json 一致
+
+    书名可能重复，节点以书号为 id，书名只作为显示的名称；连线的 source/target 为书号
+    """
+    nodes = graph['nodes']
+    ids = nodes['id']
+    return {
+        'nodes': [
+            {'id': book_id, 'name': name, 'category': graph['categories'][category]}
+            for book_id, name, category in zip(ids, nodes['name'], nodes['category'])
+        ],
+        'edges': [
+            {'source': ids[source], 'target': ids[target]}
+            for source, target in zip(graph['links']['source'], graph['links']['target'])
+        ],
+    }
+
+
+def render_html(graph, output_html):
+    """
+    图数据写入单独的 JSON 文件，页面使用共享外壳
+
+    返回:
+    list - 生成的文件路径
+    """
+    data_file, data_url = data_path(output_html)
+    write_chart_data(graph, data_file)
+    outputs = render_page(output_html, graph['title'], RENDER_JS, data_url,
+                          style='width: 1200px; height: 800px; margin: auto;')
+    return outputs + [data_file]
+
+
+def build(df, output_dir, categories=None, min_weight=DEFAULT_MIN_WEIGHT, max_degree=DEFAULT_MAX_DEGREE):
+    """
+    流水线阶段：基于已加载的数据生成力导向图，参数含义同 build_graph
+    """
+    graph = build_graph(df, categories, min_weight, max_degree)
+    output_html = os.path.join(output_dir, OUTPUT_HTML)
+    return render_html(graph, output_html)
+
+
+def main():
+    # 设置文件路径
+    input_file = '../data/飞卢小说数据.xlsx'
+    output_json = '../visualizations/charts/同人小说_力导向数据.json'
+    output_html = '../visualizations/charts/力图.html'
+
+    graph = build_graph(load_dataset(input_file))
+
+    # 保存按记录存储的图数据
+    with open(output_json, 'w', encoding='utf-8') as f:
+        json.dump(graph_records(graph), f, ensure_ascii=False, indent=4)
+
+    render_html(graph, output_html)
+    print(f"力导向图已生成：{output_html}，共 {len(graph['nodes']['name'])} 个节点、{len(graph['links']['source'])} 条连线")
+
+
+if __name__ == "__main__":
+    main()
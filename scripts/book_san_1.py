@@ -1,115 +1,147 @@
-import pandas as pd
-import json
+import os
+
+from novel_trends.aggregate import aggregate_chunks
+from novel_trends.chartdata import data_path, frame_columns, write_chart_data
+from novel_trends.cube import rollup
+from novel_trends.dataset import load_dataset
+from novel_trends.templates import render_page
+
+# 流水线中散点图的输出文件名和读取的列
+OUTPUT_HTML = '二级分类分析_散点图.html'
+INPUT_COLUMNS = ['二级分类', '书名', '总次数(双榜)', '最好名次(双榜)', '最差名次(双榜)']
+
+# 查询服务中散点图数据的接口名称，见 novel_trends.server
+QUERY = 'scatter'
+
+# 散点图的渲染函数，data 为按列存储的各二级分类统计
+RENDER_JS = """
+function (chart, data) {
+    // 转换数据格式
+    var scatterData = data["二级分类"].map(function (name, i) {
+        return {
+            name: name,
+            value: [data["总上榜次数"][i], data["平均名次"][i], data["书籍数量"][i]],
+            itemStyle: {
+                color: data["颜色"][i]
+            }
+        };
+    });
+
+    // 配置项
+    chart.setOption({
+        title: {
+            text: '二级分类分析',
+            left: 'center'
+        },
+        tooltip: {
+            formatter: function (params) {
+                return '分类: ' + params.data.name +
+                    '<br>总上榜次数: ' + params.data.value[0] +
+                    '<br>平均名次: ' + params.data.value[1] +
+                    '<br>书籍数量: ' + params.data.value[2];
+            }
+        },
+        xAxis: {
+            name: '总上榜次数',
+            type: 'value'
+        },
+        yAxis: {
+            name: '平均名次',
+            type: 'value',
+            inverse: true
+        },
+        series: [{
+            name: '分类分析',
+            type: 'scatter',
+            data: scatterData,
+            symbolSize: function (data) {
+                return Math.sqrt(data[2]) * 10;  // 点大小与书籍数量相关
+            }
+        }]
+    });
+}
+"""
 
 # 数据清洗部分
 def clean_scatter_data(input_file, output_csv):
-    # 加载原始数据
-    df = pd.read_excel(input_file, sheet_name='Sheet1')
-    
-    # 数据清洗
-    # 确保数值字段为数值类型
-    df['总次数'] = pd.to_numeric(df['总次数\n(双榜)'], errors='coerce')
-    df['最好名次'] = pd.to_numeric(df['最好名次\n(双榜)'], errors='coerce')
-    df['最差名次'] = pd.to_numeric(df['最差名次\n(双榜)'], errors='coerce')
-    
-    # 计算平均名次
-    df['平均名次'] = (df['最好名次'] + df['最差名次']) / 2
-    
-    # 按二级分类聚合数据
-    category_data = df.groupby('二级分类').agg(
-        总上榜次数=('总次数', 'sum'),  # x轴
-        平均名次=('平均名次', 'mean'),  # y轴
-        书籍数量=('书名', 'count')  # 点大小
-    ).reset_index()
-    
-    # 为每个分类分配颜色（基于分类名称的唯一性）
-    category_data['颜色'] = category_data.index.map(lambda x: f"hsl({x * 30 % 360}, 70%, 50%)")  # HSL颜色
+    # 加载原始数据并聚合
+    category_data = aggregate_categories(load_dataset(input_file))
     
     # 保存清洗后的数据
     category_data.to_csv(output_csv, index=False, encoding='utf-8-sig')
     return category_data
 
+# 按二级分类聚合的各项数据，分块聚合时同样使用
+CATEGORY_AGGS = {
+    '总上榜次数': ('总次数(双榜)', 'sum'),  # x轴
+    '平均名次': ('平均名次', 'mean'),  # y轴
+    '书籍数量': ('书名', 'count'),  # 点大小
+}
+
+def with_average_rank(df):
+    # 提取需要的列，列名和类型已由 schema 统一
+    return df[['二级分类', '书名', '总次数(双榜)']].assign(
+        # 计算平均名次
+        平均名次=(df['最好名次(双榜)'].astype('float64') + df['最差名次(双榜)']) / 2
+    )
+
+def assign_colors(category_data):
+    # 为每个分类分配颜色（基于分类名称的唯一性）
+    category_data['颜色'] = category_data.index.map(lambda x: f"hsl({x * 30 % 360}, 70%, 50%)")  # HSL颜色
+    return category_data
+
+# 数据聚合部分
+def aggregate_categories(df):
+    # 按二级分类聚合数据
+    category_data = with_average_rank(df).groupby('二级分类', observed=True).agg(**CATEGORY_AGGS).reset_index()
+    return assign_colors(category_data)
+
+# 分块聚合部分：逐块计算部分结果后合并，结果与 aggregate_categories 一致
+def aggregate_category_chunks(chunks):
+    category_data = aggregate_chunks(chunks, '二级分类', CATEGORY_AGGS, prepare=with_average_rank).reset_index()
+    return assign_colors(category_data)
+
+# 立方体聚合部分：从聚合立方体上卷到二级分类，结果与 aggregate_categories 一致
+def aggregate_category_cube(cube):
+    category_data = rollup(cube, ['二级分类'], ['总上榜次数', '平均名次', '书名数量'])
+    category_data = category_data.rename(columns={'书名数量': '书籍数量'}).reset_index()
+    category_data = category_data[category_data['二级分类'].notna()].reset_index(drop=True)
+    return assign_colors(category_data)
+
 # 加载清洗后的分类数据
 # category_data = pd.read_csv('清洗后的分类数据.csv')
 
 # HTML 文件生成部分
 def generate_html(category_data, output_html):
-    # 转换为 JSON 格式
-    scatter_data = category_data.to_dict(orient='records')
-    scatter_data_json = json.dumps(scatter_data, ensure_ascii=False)
+    # 数据按列写入单独的 JSON 文件，由页面加载
+    data_file, data_url = data_path(output_html)
+    write_chart_data(frame_columns(category_data), data_file)
     
-    # 生成 HTML 文件
-    html_content = f"""
-<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="utf-8">
-    <title>二级分类分析</title>
-    <script src="https://cdn.jsdelivr.net/npm/echarts/dist/echarts.min.js"></script>
-</head>
-<body>
-    <div id="chart" style="width: 100%; height: 600px;"></div>
-    <script>
-        var chartDom = document.getElementById('chart');
-        var myChart = echarts.init(chartDom);
-
-        // 数据
-        var data = {scatter_data_json};
-
-        // 转换数据格式
-        var scatterData = data.map(function (item) {{
-            return {{
-                name: item["二级分类"],
-                value: [item["总上榜次数"], item["平均名次"], item["书籍数量"]],
-                itemStyle: {{
-                    color: item["颜色"]
-                }}
-            }};
-        }});
-
-        // 配置项
-        var option = {{
-            title: {{
-                text: '二级分类分析',
-                left: 'center'
-            }},
-            tooltip: {{
-                formatter: function (params) {{
-                    return '分类: ' + params.data.name +
-                        '<br>总上榜次数: ' + params.data.value[0] +
-                        '<br>平均名次: ' + params.data.value[1] +
-                        '<br>书籍数量: ' + params.data.value[2];
-                }}
-            }},
-            xAxis: {{
-                name: '总上榜次数',
-                type: 'value'
-            }},
-            yAxis: {{
-                name: '平均名次',
-                type: 'value',
-                inverse: true
-            }},
-            series: [{{
-                name: '分类分析',
-                type: 'scatter',
-                data: scatterData,
-                symbolSize: function (data) {{
-                    return Math.sqrt(data[2]) * 10;  // 点大小与书籍数量相关
-                }}
-            }}]
-        }};
-
-        // 绘制图表
-        myChart.setOption(option);
-    </script>
-</body>
-</html>
-"""
+    # 使用共享的页面外壳生成 HTML 文件
+    outputs = render_page(output_html, '二级分类分析', RENDER_JS, data_url)
+    return outputs + [data_file]
+
+# 流水线阶段：基于已加载的数据直接生成散点图
+def build(df, output_dir):
+    category_data = aggregate_categories(df)
+    output_html = os.path.join(output_dir, OUTPUT_HTML)
+    return generate_html(category_data, output_html)
+
+# 查询服务：返回与数据文件相同结构的散点图数据
+def query(df):
+    return frame_columns(aggregate_categories(df))
+
+# 流水线阶段：由聚合立方体生成散点图，见 novel_trends.cube
+def build_from_cube(cube, output_dir):
+    category_data = aggregate_category_cube(cube)
+    output_html = os.path.join(output_dir, OUTPUT_HTML)
+    return generate_html(category_data, output_html)
 
-# 保存 HTML 文件
-with open(output_html, 'w', encoding='utf-8') as f:
-    f.write(html_content)
+# 流水线阶段（分块模式）：chunks 为逐块读取的数据
+def build_chunked(chunks, output_dir):
+    category_data = aggregate_category_chunks(chunks)
+    output_html = os.path.join(output_dir, OUTPUT_HTML)
+    return generate_html(category_data, output_html)
 
 # 主函数
 def main():
@@ -1,56 +1,153 @@
-import pandas as pd
-from pyecharts import options as opts
-from pyecharts.charts import Sunburst
 import os
 
-def build_sunburst_data(data, total_count):
+from novel_trends.chartdata import data_path, write_chart_data
+from novel_trends.cube import rollup
+from novel_trends.dataset import load_dataset
+from novel_trends.templates import render_page
+
+# 流水线中旭日图的输出文件名和读取的列
+OUTPUT_HTML = 'hidden_small_labels_sunburst_chart.html'
+INPUT_COLUMNS = ['一级分类', '二级分类', '作者']
+
+# 默认的层级（由外到内），可以追加 作者 等更细的层级
+DEFAULT_LEVELS = ['一级分类', '二级分类']
+
+# 可以由聚合立方体构建的层级
+CUBE_LEVELS = ['一级分类', '二级分类']
+
+# 同级中占总量百分比低于该值的节点合并为 "其他"
+DEFAULT_MIN_SHARE = 0.5
+OTHER_NAME = '其他'
+
+# 一级节点的调色板，分类数超过预设颜色时自动生成新的颜色
+PALETTE = ["#8dd3c7", "#ffffb3", "#bebada", "#fb8072", "#80b1d3", "#fdb462", "#b3de69",
+           "#fccde5", "#d9d9d9", "#bc80bd", "#ccebc5", "#ffed6f"]
+
+# 旭日图的渲染函数，节点的颜色、提示和标签显示已在数据中设置好
+RENDER_JS = """
+function (chart, data) {
+    chart.setOption({
+        title: {
+            text: '小说分类旭日图（隐藏小于5%的分类名称）'
+        },
+        tooltip: {
+            trigger: 'item',
+            formatter: '{b}: {c} ({d}%)'  // 显示百分比
+        },
+        series: [{
+            type: 'sunburst',
+            name: '小说分类',
+            data: data.nodes,
+            radius: ['10%', '90%'],
+            label: {
+                fontSize: 12,
+                formatter: '{b}',  // 显示分类名称
+                position: 'inside'  // 将文字放置在区域内部
+            }
+        }]
+    });
+}
+"""
+
+def palette_color(index):
+    """
+    按序号从调色板取颜色，超出预设颜色后按黄金角生成新的色相，分类再多也不会重复
+
+    参数:
+    index: int - 一级节点的序号
+
+    返回:
+    str - CSS 颜色
+    """
+    if index < len(PALETTE):
+        return PALETTE[index]
+    return f"hsl({(index - len(PALETTE)) * 137.5 % 360:.1f}, 60%, 75%)"
+
+def count_tree(counts):
+    """
+    由逐层分组计数构建嵌套的计数树，一次遍历同时累加各层的合计
+
+    参数:
+    counts: Series - 以各层级为多级索引的书籍数量
+
+    返回:
+    dict - 节点名称 -> [数量, 子节点字典]
+    """
+    tree = {}
+    for path, count in zip(counts.index, counts.tolist()):
+        path = path if isinstance(path, tuple) else (path,)
+        children = tree
+        for name in path:
+            node = children.setdefault(name, [0, {}])
+            node[0] += count
+            children = node[1]
+    return tree
+
+def collapse_small(children, total_count, min_share):
     """
-    构建旭日图数据的嵌套结构，并为每个一级分类设置独特颜色
+    将占比低于 min_share 的子节点合并为一个 "其他" 节点，只有一个小节点时保持原样
+
+    参数:
+    children: dict - 节点名称 -> [数量, 子节点字典]
+    total_count: int - 总书籍数量
+    min_share: float - 合并阈值（占总量的百分比）
+
+    返回:
+    list - (名称, 数量, 子节点字典, 合并的节点数) 列表，"其他" 节点排在最后
+    """
+    kept, small = [], []
+    for name, (count, grandchildren) in children.items():
+        target = small if count / total_count * 100 < min_share else kept
+        target.append((name, count, grandchildren, 1))
+    if len(small) < 2:
+        return kept + small
+    return kept + [(OTHER_NAME, sum(item[1] for item in small), {}, len(small))]
+
+def sunburst_nodes(children, total_count, min_share, depth=0):
+    """
+    将计数树转换为旭日图节点
+
+    一级节点全部保留并设置颜色；其余层级合并占比过小的节点，并按占比隐藏较小的名称和标签。
+    """
+    if depth == 0:
+        items = [(name, count, grandchildren, 1) for name, (count, grandchildren) in children.items()]
+    else:
+        items = collapse_small(children, total_count, min_share)
+
+    nodes = []
+    for index, (name, count, grandchildren, merged) in enumerate(items):
+        percentage = count / total_count * 100  # 计算百分比
+        label = f"{name}（{merged}项）" if merged > 1 else name
+        node = {
+            "name": name if depth == 0 or percentage >= 2.5 else "",  # 小于2.5%的隐藏名称
+            "value": count,
+        }
+        if grandchildren:
+            node["children"] = sunburst_nodes(grandchildren, total_count, min_share, depth + 1)
+        if depth == 0:
+            node["itemStyle"] = {"color": palette_color(index)}  # 设置一级分类颜色
+        node["tooltip"] = {"formatter": f"{label}: {count} ({percentage:.2f}%)"}  # 鼠标悬停显示详细信息
+        if depth > 0:
+            node["label"] = {"show": percentage >= 5}  # 小于5%的文字隐藏
+        nodes.append(node)
+    return nodes
+
+def build_sunburst_data(data, total_count, levels=None, min_share=DEFAULT_MIN_SHARE):
+    """
+    构建旭日图数据的嵌套结构，并为每个一级节点分配调色板颜色
     
     参数:
-    data: DataFrame - 包含一级分类、二级分类和数量的数据集
+    data: DataFrame - 包含各层级列和数量的数据集
     total_count: int - 总书籍数量
+    levels: list - 由外到内的层级列，默认 DEFAULT_LEVELS
+    min_share: float - 占总量百分比低于该值的同级节点合并为 "其他"，为 0 时不合并
     
     返回:
     list - 符合旭日图要求的嵌套数据结构
     """
-    # 为每个一级分类定义独特颜色
-    color_map = {
-        "都市言情": "#8dd3c7",
-        "玄幻奇幻": "#ffffb3",
-        "历史军事": "#bebada",
-        "同人小说": "#fb8072",
-        "科幻网游": "#80b1d3",
-        "悬疑灵异": "#fdb462",
-        "其他": "#b3de69"
-    }
-    
-    result = []
-    # 遍历一级分类
-    for first_level in data['一级分类'].unique():
-        first_level_data = data[data['一级分类'] == first_level]
-        first_level_total = first_level_data['数量'].sum()  # 一级分类总量
-        
-        children = []
-        # 遍历二级分类
-        for _, row in first_level_data.iterrows():
-            percentage = row['数量'] / total_count * 100  # 计算百分比
-            children.append({
-                "name": row['二级分类'] if percentage >= 2.5 else "",  # 小于2.5%的隐藏名称
-                "value": row['数量'],
-                "tooltip": {"formatter": f"{row['二级分类']}: {row['数量']} ({percentage:.2f}%)"},  # 鼠标悬停显示详细信息
-                "label": {"show": percentage >= 5}  # 小于5%的文字隐藏
-            })
-        
-        result.append({
-            "name": first_level,
-            "value": first_level_total,  # 一级分类总量
-            "children": children,
-            "itemStyle": {"color": color_map.get(first_level, "#d9d9d9")},  # 设置一级分类颜色
-            "tooltip": {"formatter": f"{first_level}: {first_level_total} ({first_level_total / total_count * 100:.2f}%)"}  # 一级分类百分比
-        })
-    
-    return result
+    levels = levels or DEFAULT_LEVELS
+    counts = data.set_index(levels)['数量']
+    return sunburst_nodes(count_tree(counts), int(total_count), min_share)
 
 def generate_sunburst_chart(input_file, output_html):
     """
@@ -61,37 +158,115 @@ def generate_sunburst_chart(input_file, output_html):
     output_html: str - 输出HTML文件路径
     """
     # 加载数据
-    df = pd.ExcelFile(input_file).parse('Sheet1')
+    df = load_dataset(input_file)
+    render_sunburst(df, output_html)
+    print(f"动态交互的旭日图已生成并保存为 {output_html}")
+
+def sunburst_data(df, levels=None, min_share=DEFAULT_MIN_SHARE):
+    """
+    按各层级分组统计书籍数量，生成旭日图节点
+    
+    参数:
+    df: DataFrame - 原始小说数据
+    levels: list - 由外到内的层级列，默认 DEFAULT_LEVELS
+    min_share: float - 合并为 "其他" 的占比阈值（百分比）
+    
+    返回:
+    list - 旭日图节点
     
-    # 按一级分类和二级分类统计书籍数量
-    category_counts = df.groupby(['一级分类', '二级分类']).size().reset_index(name='数量')
+    异常:
+    ValueError - 层级不在 INPUT_COLUMNS 中
+    """
+    levels = levels or DEFAULT_LEVELS
+    unknown = [level for level in levels if level not in INPUT_COLUMNS]
+    if unknown:
+        raise ValueError(f"旭日图不支持的层级：{', '.join(unknown)}（可选：{', '.join(INPUT_COLUMNS)}）")
+    
+    # 按各层级一次分组统计书籍数量
+    category_counts = df.groupby(levels, observed=True).size().reset_index(name='数量')
     total_count = category_counts['数量'].sum()
+    return build_sunburst_data(category_counts, total_count, levels, min_share)
+
+def sunburst_cube_data(cube, levels=None, min_share=DEFAULT_MIN_SHARE):
+    """
+    从聚合立方体上卷得到各层级的书籍数量，生成与 sunburst_data 相同的旭日图节点
     
-    # 构建旭日图数据
-    sunburst_data = build_sunburst_data(category_counts, total_count)
-    
-    # 创建旭日图
-    sunburst_chart = (
-        Sunburst()
-        .add(
-            series_name="小说分类",
-            data_pair=sunburst_data,
-            radius=["10%", "90%"],
-            label_opts=opts.LabelOpts(
-                font_size=12,
-                formatter="{b}",  # 显示分类名称
-                position="inside",  # 将文字放置在区域内部
-            ),
-        )
-        .set_global_opts(
-            title_opts=opts.TitleOpts(title="小说分类旭日图（隐藏小于5%的分类名称）"),
-            tooltip_opts=opts.TooltipOpts(formatter="{b}: {c} ({d}%)"),  # 显示百分比
-        )
-    )
-    
-    # 保存为HTML文件
-    sunburst_chart.render(output_html)
-    print(f"动态交互的旭日图已生成并保存为 {output_html}")
+    参数:
+    cube: DataFrame - 聚合立方体，见 novel_trends.cube
+    levels: list - 由外到内的层级列，只能取 CUBE_LEVELS 中的列
+    min_share: float - 合并为 "其他" 的占比阈值（百分比）
+    
+    返回:
+    list - 旭日图节点
+    """
+    levels = levels or DEFAULT_LEVELS
+    category_counts = rollup(cube, levels, ['书籍数量']).reset_index().rename(columns={'书籍数量': '数量'})
+    category_counts = category_counts.dropna(subset=levels)
+    total_count = category_counts['数量'].sum()
+    return build_sunburst_data(category_counts, total_count, levels, min_share)
+
+def write_sunburst(nodes, output_html):
+    """
+    写入旭日图数据文件和页面
+    
+    参数:
+    nodes: list - 旭日图节点
+    output_html: str - 输出HTML文件路径
+    
+    返回:
+    list - 生成的文件路径
+    """
+    # 嵌套结构原样写入数据文件
+    data_file, data_url = data_path(output_html)
+    write_chart_data({'nodes': nodes}, data_file)
+    
+    # 使用共享的页面外壳生成 HTML 文件
+    outputs = render_page(output_html, '小说分类旭日图', RENDER_JS, data_url, style='width: 900px; height: 500px;')
+    return outputs + [data_file]
+
+def render_sunburst(df, output_html, levels=None, min_share=DEFAULT_MIN_SHARE):
+    """
+    基于已加载的数据渲染旭日图
+    
+    参数:
+    df: DataFrame - 原始小说数据
+    output_html: str - 输出HTML文件路径
+    levels: list - 由外到内的层级列，默认 DEFAULT_LEVELS
+    min_share: float - 合并为 "其他" 的占比阈值（百分比）
+    
+    返回:
+    list - 生成的文件路径
+    """
+    return write_sunburst(sunburst_data(df, levels, min_share), output_html)
+
+def build(df, output_dir, levels=None, min_share=DEFAULT_MIN_SHARE):
+    """
+    流水线阶段：基于已加载的数据生成旭日图
+    
+    参数:
+    df: DataFrame - 原始小说数据
+    output_dir: str - 输出目录
+    levels: list - 由外到内的层级列，默认 DEFAULT_LEVELS
+    min_share: float - 合并为 "其他" 的占比阈值（百分比）
+    
+    返回:
+    list - 生成的文件路径
+    """
+    output_html = os.path.join(output_dir, OUTPUT_HTML)
+    return render_sunburst(df, output_html, levels, min_share)
+
+def cube_supports(levels=None, min_share=DEFAULT_MIN_SHARE):
+    """
+    层级都在聚合立方体的维度中时才能由立方体构建，追加 作者 层级时需要原始数据
+    """
+    return all(level in CUBE_LEVELS for level in levels or DEFAULT_LEVELS)
+
+def build_from_cube(cube, output_dir, levels=None, min_share=DEFAULT_MIN_SHARE):
+    """
+    流水线阶段：由聚合立方体生成旭日图，参数同 build
+    """
+    output_html = os.path.join(output_dir, OUTPUT_HTML)
+    return write_sunburst(sunburst_cube_data(cube, levels, min_share), output_html)
 
 def main():
     """
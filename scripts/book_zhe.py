@@ -1,7 +1,73 @@
-import pandas as pd
 import json
 import os
 
+from novel_trends.chartdata import columns, data_path, write_chart_data
+from novel_trends.dataset import load_dataset
+from novel_trends.templates import render_page
+from novel_trends.timeseries import DEFAULT_GRANULARITY, PERIOD_NAMES, melt_counts, period_labels
+
+# 流水线中折线图的输出文件名和读取的列
+OUTPUT_HTML = '书籍动态趋势对比.html'
+INPUT_COLUMNS = ['首次上榜日期(双榜)', '末次上榜日期(双榜)', '入库时间']
+
+# 查询服务中折线图数据的接口名称，见 novel_trends.server
+QUERY = 'trend'
+
+# 折线图的渲染函数，data 为按列存储的各时间段统计
+RENDER_JS = """
+function (chart, data) {
+    // 提取数据
+    var months = data[data.period];
+    var firstCounts = data.首次上榜数量;
+    var lastCounts = data.末次上榜数量;
+    var storageCounts = data.入库书籍数量;
+
+    chart.setOption({
+        title: {
+            text: '书籍动态趋势对比'
+        },
+        tooltip: {
+            trigger: 'axis'
+        },
+        legend: {
+            data: ['首次上榜数量', '末次上榜数量', '入库书籍数量']
+        },
+        xAxis: {
+            type: 'category',
+            data: months
+        },
+        yAxis: {
+            type: 'value',
+            name: '书籍数量'
+        },
+        series: [
+            {
+                name: '首次上榜数量',
+                type: 'line',
+                data: firstCounts
+            },
+            {
+                name: '末次上榜数量',
+                type: 'line',
+                data: lastCounts
+            },
+            {
+                name: '入库书籍数量',
+                type: 'line',
+                data: storageCounts
+            }
+        ]
+    });
+}
+"""
+
+# 参与统计的日期列及其在结果中的名称
+TREND_COLUMNS = {
+    '首次上榜日期(双榜)': '首次上榜数量',
+    '末次上榜日期(双榜)': '末次上榜数量',
+    '入库时间': '入库书籍数量',
+}
+
 def clean_data(input_file, output_json):
     """
     清洗小说数据，按月份统计首次上榜、末次上榜和入库书籍数量
@@ -13,139 +79,103 @@ def clean_data(input_file, output_json):
     返回:
     list - 处理后的月度统计数据
     """
-    # 加载数据
-    df = pd.read_excel(input_file, sheet_name='Sheet1')
+    # 加载数据并统计
+    final_data_json = monthly_trend(load_dataset(input_file))
     
-    # 清理列名，去掉换行符
-    df.columns = df.columns.str.replace('\n', '')
-    
-    # 转换日期格式
-    df['首次上榜日期(双榜)'] = pd.to_datetime(df['首次上榜日期(双榜)'], errors='coerce')
-    df['末次上榜日期(双榜)'] = pd.to_datetime(df['末次上榜日期(双榜)'], errors='coerce')
-    df['入库时间'] = pd.to_datetime(df['入库时间'], errors='coerce')
-    
-    # 提取月份
-    df['首次上榜月份'] = df['首次上榜日期(双榜)'].dt.to_period('M').astype(str)
-    df['末次上榜月份'] = df['末次上榜日期(双榜)'].dt.to_period('M').astype(str)
-    df['入库月份'] = df['入库时间'].dt.to_period('M').astype(str)
+    # 确保输出目录存在
+    os.makedirs(os.path.dirname(output_json), exist_ok=True)
     
-    # 按月份统计各类型书籍数量
-    first_counts = df.groupby('首次上榜月份').size().reset_index(name='首次上榜数量')
-    last_counts = df.groupby('末次上榜月份').size().reset_index(name='末次上榜数量')
-    storage_counts = df.groupby('入库月份').size().reset_index(name='入库书籍数量')
+    with open(output_json, 'w', encoding='utf-8') as f:
+        json.dump(final_data_json, f, ensure_ascii=False, indent=4)
     
-    # 合并所有月份，确保每个月都有数据
-    all_months = pd.concat(
-        [first_counts['首次上榜月份'], last_counts['末次上榜月份'], storage_counts['入库月份']]
-    ).drop_duplicates().sort_values()
+    return final_data_json
+
+def monthly_trend(df):
+    """
+    基于已加载的数据按月份统计首次上榜、末次上榜和入库书籍数量，不修改传入的数据
     
-    # 构建最终数据集
-    final_data = pd.DataFrame({'月份': all_months})
-    final_data = (
-        final_data.merge(first_counts, left_on='月份', right_on='首次上榜月份', how='left')
-        .merge(last_counts, left_on='月份', right_on='末次上榜月份', how='left')
-        .merge(storage_counts, left_on='月份', right_on='入库月份', how='left')
-    )
+    参数:
+    df: DataFrame - 原始小说数据
     
-    # 保留需要的列，并填充缺失值为0
-    final_data = final_data[['月份', '首次上榜数量', '末次上榜数量', '入库书籍数量']].fillna(0)
+    返回:
+    list - 处理后的月度统计数据
+    """
+    return trend_table(df, 'month')
+
+def trend_table(df, granularity=DEFAULT_GRANULARITY):
+    """
+    按时间段统计首次上榜、末次上榜和入库书籍数量
     
-    # 转换为JSON格式并保存
-    final_data_json = final_data.to_dict(orient='records')
+    三个日期列合并为长表后一次计数，并补齐到完整的日历，没有书籍的时间段计为 0。
     
-    # 确保输出目录存在
-    os.makedirs(os.path.dirname(output_json), exist_ok=True)
+    参数:
+    df: DataFrame - 原始小说数据（不会被修改）
+    granularity: str - 时间粒度，可选 day、week、month、quarter
     
-    with open(output_json, 'w', encoding='utf-8') as f:
-        json.dump(final_data_json, f, ensure_ascii=False, indent=4)
+    返回:
+    list - 每个时间段一条记录，时间段的键名由粒度决定（如按月统计时为 "月份"）
+    """
+    counts = melt_counts(df, TREND_COLUMNS, granularity)
+    final_data = counts.reset_index(drop=True)
+    final_data.insert(0, PERIOD_NAMES[granularity], period_labels(counts.index, granularity))
     
-    print(f"数据清洗完成，已生成 JSON 文件：{output_json}")
-    return final_data_json
+    # 转换为JSON格式
+    return final_data.to_dict(orient='records')
 
-def generate_html(data, output_html):
+def generate_html(data, output_html, period_name='月份'):
     """
     生成书籍动态趋势对比的HTML可视化页面
     
     参数:
-    data: list - 月度统计数据
+    data: list - 按时间段的统计数据
     output_html: str - 输出HTML文件路径
+    period_name: str - 记录中时间段的键名
+    
+    返回:
+    list - 生成的文件路径
     """
-    html_content = f"""
-<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="utf-8">
-    <title>书籍动态趋势对比</title>
-    <script src="https://cdn.jsdelivr.net/npm/echarts/dist/echarts.min.js"></script>
-</head>
-<body>
-    <div id="trend-chart" style="width: 100%; height: 600px;"></div>
-    <script>
-        // 加载数据
-        var data = {json.dumps(data, ensure_ascii=False)};
-
-        // 提取数据
-        var months = data.map(item => item.月份);
-        var firstCounts = data.map(item => item.首次上榜数量);
-        var lastCounts = data.map(item => item.末次上榜数量);
-        var storageCounts = data.map(item => item.入库书籍数量);
-
-        // 配置折线图
-        var chartDom = document.getElementById('trend-chart');
-        var myChart = echarts.init(chartDom);
+    # 数据按列写入单独的 JSON 文件，由页面加载
+    data_file, data_url = data_path(output_html)
+    write_chart_data(trend_payload(data, period_name), data_file)
+    
+    # 使用共享的页面外壳生成HTML文件
+    outputs = render_page(output_html, '书籍动态趋势对比', RENDER_JS, data_url)
+    
+    return outputs + [data_file]
 
-        var option = {{
-            title: {{
-                text: '书籍动态趋势对比'
-            }},
-            tooltip: {{
-                trigger: 'axis'
-            }},
-            legend: {{
-                data: ['首次上榜数量', '末次上榜数量', '入库书籍数量']
-            }},
-            xAxis: {{
-                type: 'category',
-                data: months
-            }},
-            yAxis: {{
-                type: 'value',
-                name: '书籍数量'
-            }},
-            series: [
-                {{
-                    name: '首次上榜数量',
-                    type: 'line',
-                    data: firstCounts
-                }},
-                {{
-                    name: '末次上榜数量',
-                    type: 'line',
-                    data: lastCounts
-                }},
-                {{
-                    name: '入库书籍数量',
-                    type: 'line',
-                    data: storageCounts
-                }}
-            ]
-        }};
+def trend_payload(data, period_name='月份'):
+    """
+    按列组织的折线图数据，period 记录时间段所在的列；没有数据时各列为空列表，结构不变
+    """
+    return {'period': period_name, **columns(data, [period_name, *TREND_COLUMNS.values()])}
 
-        // 渲染图表
-        myChart.setOption(option);
-    </script>
-</body>
-</html>
-"""
+def query(df, granularity=DEFAULT_GRANULARITY):
+    """
+    查询服务：返回与数据文件相同结构的折线图数据
     
-    # 确保输出目录存在
-    os.makedirs(os.path.dirname(output_html), exist_ok=True)
+    参数:
+    df: DataFrame - 筛选后的小说数据
+    granularity: str - 时间粒度，可选 day、week、month、quarter
     
-    # 保存HTML文件
-    with open(output_html, 'w', encoding='utf-8') as f:
-        f.write(html_content)
+    返回:
+    dict - 按列组织的各时间段统计
+    """
+    return trend_payload(trend_table(df, granularity), PERIOD_NAMES[granularity])
+
+def build(df, output_dir, granularity=DEFAULT_GRANULARITY):
+    """
+    流水线阶段：基于已加载的数据生成书籍动态趋势折线图
     
-    print(f"HTML 文件已生成：{output_html}")
+    参数:
+    df: DataFrame - 原始小说数据
+    output_dir: str - 输出目录
+    granularity: str - 时间粒度，可选 day、week、month、quarter
+    
+    返回:
+    list - 生成的文件路径
+    """
+    output_html = os.path.join(output_dir, OUTPUT_HTML)
+    return generate_html(trend_table(df, granularity), output_html, PERIOD_NAMES[granularity])
 
 def main():
     """
@@ -158,9 +188,11 @@ def main():
     
     # 执行数据清洗
     data = clean_data(input_file, output_json)
+    print(f"数据清洗完成，已生成 JSON 文件：{output_json}")
     
     # 生成可视化HTML
     generate_html(data, output_html)
+    print(f"HTML 文件已生成：{output_html}")
 
 if __name__ == "__main__":
     main()
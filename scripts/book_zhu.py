@@ -1,13 +1,228 @@
-import pandas as pd
-import json
+import os
 import sys
 
+import numpy as np
+
+from novel_trends.chartdata import data_path, write_chart_data
+from novel_trends.cube import rollup
+from novel_trends.dataset import load_dataset
+from novel_trends.templates import render_page
+from novel_trends.timeseries import DEFAULT_GRANULARITY, period_counts, period_labels
+
+# 流水线中动态排序柱状图的输出文件名和读取的列
+OUTPUT_HTML = '动态排序柱状图.html'
+INPUT_COLUMNS = ['一级分类', '首次上榜日期(双榜)']
+
+# 可以由聚合立方体（按月汇总）构建的时间粒度
+CUBE_GRANULARITIES = ('month', 'quarter')
+
+# 动态排序柱状图的渲染函数，data 中各时间段的分类排序和书籍数量按时间顺序排列
+RENDER_JS = """
+function (chart, data) {
+    var months = data.months;
+
+    // 动态排序柱状图配置
+    chart.setOption({
+        baseOption: {
+            timeline: {
+                axisType: 'category',
+                autoPlay: true,
+                playInterval: 2000,
+                data: months
+            },
+            tooltip: {
+                trigger: 'axis',
+                axisPointer: { type: 'shadow' }
+            },
+            xAxis: {
+                type: 'value',
+                name: data.valueName
+            },
+            yAxis: {
+                type: 'category',
+                inverse: true
+            },
+            series: [{
+                type: 'bar',
+                label: {
+                    show: true,
+                    position: 'right',
+                    formatter: '{c}'
+                }
+            }]
+        },
+        options: months.map((month, i) => {
+            return {
+                yAxis: {
+                    data: data.categories[i]
+                },
+                series: [{
+                    data: data.values[i]
+                }]
+            };
+        })
+    });
+}
+"""
+
+
+def prepare_bar_race_data(df, granularity=DEFAULT_GRANULARITY, cumulative=False):
+    """
+    按一级分类和首次上榜时间段统计书籍数量，生成动态排序柱状图所需的数据
+
+    一次分组得到 时间段 × 一级分类 的计数矩阵，再对每一行做向量化的降序排序，
+    不再逐个时间段筛选数据。
+
+    参数:
+    df: DataFrame - 原始小说数据（不会被修改）
+    granularity: str - 时间粒度，可选 day、week、month、quarter
+    cumulative: bool - 为 True 时统计截至每个时间段的累计书籍数量
+
+    返回:
+    tuple - (时间段列表, 每个时间段各分类的书籍数量, 每个时间段的分类排序)
+
+    异常:
+    ValueError - 缺少必要的列、时间粒度未知或没有有效的日期数据
+    """
+    # 验证必要的列是否存在（列名已由 schema 统一）
+    required_columns = ['一级分类', '首次上榜日期(双榜)']
+    for col in required_columns:
+        if col not in df.columns:
+            raise ValueError(f"数据中缺少必要的列 '{col}'")
+
+    # "首次上榜日期(双榜)" 已由 schema 解析为 datetime，检查转换结果
+    dates = df['首次上榜日期(双榜)']
+    if dates.isnull().all():
+        print("警告：所有日期转换失败，可能是日期格式不正确")
+
+    # 按时间段和一级分类一次计数，得到 时间段 × 一级分类 的矩阵；只保留有书籍上榜的时间段
+    counts = period_counts(dates, df['一级分类'], granularity, complete=False)
+    return rank_periods(counts, granularity, cumulative)
+
+
+def cube_counts(cube, granularity=DEFAULT_GRANULARITY):
+    """
+    从聚合立方体上卷得到 时间段 × 一级分类 的计数矩阵，与 period_counts(complete=False) 一致
+
+    参数:
+    cube: DataFrame - 聚合立方体，见 novel_trends.cube
+    granularity: str - 时间粒度，可选 month、quarter
+
+    返回:
+    DataFrame - 行为按时间先后排列的周期序号，列为出现过的一级分类，值为 int64 计数
+    """
+    counts = rollup(cube, ['一级分类', '月份'], ['书籍数量'], granularity)['书籍数量']
+    counts = counts[counts.index.get_level_values('一级分类').notna() & counts.index.get_level_values('月份').notna()]
+    matrix = counts.unstack('一级分类', fill_value=0)
+    matrix.index = matrix.index.astype('int64')
+    return matrix.astype('int64')
+
+
+def rank_periods(counts, granularity=DEFAULT_GRANULARITY, cumulative=False):
+    """
+    对 时间段 × 一级分类 的计数矩阵逐行排序，生成动态排序柱状图所需的数据
+
+    参数:
+    counts: DataFrame - 行为周期序号、列为一级分类的计数矩阵
+    granularity: str - 时间粒度
+    cumulative: bool - 为 True 时统计截至每个时间段的累计书籍数量
+
+    返回:
+    tuple - 同 prepare_bar_race_data
+
+    异常:
+    ValueError - 没有有效的日期数据
+    """
+    if counts.empty:
+        raise ValueError("没有找到有效的月份数据")
+    if cumulative:
+        counts = counts.cumsum()
+
+    # 每一行按书籍数量降序排序，数量相同时保持分类原有顺序；数量为 0 的分类排在末尾后截掉
+    matrix = counts.to_numpy()
+    order = np.argsort(-matrix, axis=1, kind='stable')
+    sorted_values = np.take_along_axis(matrix, order, axis=1)
+    sorted_names = counts.columns.astype(str).to_numpy()[order]
+    nonzero = (matrix > 0).sum(axis=1)
+
+    months = period_labels(counts.index, granularity)
+    data_by_month = {}
+    categories_by_month = {}
+    for month, values, names, size in zip(months, sorted_values.tolist(), sorted_names.tolist(), nonzero):
+        data_by_month[month] = values[:size]
+        categories_by_month[month] = names[:size]
+
+    return months, data_by_month, categories_by_month
+
+
+def render_html(months, data_by_month, categories_by_month, output_path, value_name='首次上榜书籍总数'):
+    """
+    生成动态排序柱状图的HTML文件
+
+    参数:
+    months: list - 时间段列表
+    data_by_month: dict - 每个时间段各分类的书籍数量
+    categories_by_month: dict - 每个时间段的分类排序
+    output_path: str - 输出HTML文件路径
+    value_name: str - 数值轴名称
+
+    返回:
+    list - 生成的文件路径
+    """
+    # 数据按列写入单独的 JSON 文件，各时间段的数据按顺序排列，不再以时间段为键重复存储
+    data_file, data_url = data_path(output_path)
+    write_chart_data({
+        'valueName': value_name,
+        'months': months,
+        'values': [data_by_month[month] for month in months],
+        'categories': [categories_by_month[month] for month in months],
+    }, data_file)
+
+    # 使用共享的页面外壳生成 HTML 文件
+    outputs = render_page(output_path, '动态排序柱状图', RENDER_JS, data_url)
+    return outputs + [data_file]
+
+
+def build(df, output_dir, granularity=DEFAULT_GRANULARITY, cumulative=False):
+    """
+    流水线阶段：基于已加载的数据生成动态排序柱状图
+
+    参数:
+    df: DataFrame - 原始小说数据
+    output_dir: str - 输出目录
+    granularity: str - 时间粒度，可选 day、week、month、quarter
+    cumulative: bool - 是否统计累计书籍数量
+
+    返回:
+    list - 生成的文件路径
+    """
+    output_path = os.path.join(output_dir, OUTPUT_HTML)
+    value_name = '累计首次上榜书籍总数' if cumulative else '首次上榜书籍总数'
+    return render_html(*prepare_bar_race_data(df, granularity, cumulative), output_path, value_name)
+
+
+def cube_supports(granularity=DEFAULT_GRANULARITY, cumulative=False):
+    """
+    立方体按月汇总，只能按月或季度统计
+    """
+    return granularity in CUBE_GRANULARITIES
+
+
+def build_from_cube(cube, output_dir, granularity=DEFAULT_GRANULARITY, cumulative=False):
+    """
+    流水线阶段：由聚合立方体生成动态排序柱状图，参数同 build
+    """
+    output_path = os.path.join(output_dir, OUTPUT_HTML)
+    value_name = '累计首次上榜书籍总数' if cumulative else '首次上榜书籍总数'
+    return render_html(*rank_periods(cube_counts(cube, granularity), granularity, cumulative), output_path, value_name)
+
+
 def main():
     try:
         # 1. 加载数据
         input_file = '../data/飞卢小说数据.xlsx'
         try:
-            df = pd.read_excel(input_file, sheet_name='Sheet1')
+            df = load_dataset(input_file)
             print(f"成功读取数据文件：{input_file}")
         except FileNotFoundError:
             print(f"错误：未找到数据文件 {input_file}")
@@ -16,142 +231,20 @@ def main():
             print(f"读取数据文件时出错：{str(e)}")
             return 1
 
-        # 2. 清理列名
-        df.columns = df.columns.str.replace('\n', '')  # 去掉列名中的换行符
-
-        # 检查实际列名
-        print("数据的列名：")
-        print(df.columns)
-
-        # 验证必要的列是否存在
-        required_columns = ['一级分类', '首次上榜日期(双榜)']
-        for col in required_columns:
-            if col not in df.columns:
-                print(f"错误：数据中缺少必要的列 '{col}'")
-                return 1
-
-        # 3. 数据清洗
-        # 转换 "首次上榜日期(双榜)" 为 datetime 格式
+        # 2. 数据清洗与统计
         try:
-            df['首次上榜日期(双榜)'] = pd.to_datetime(df['首次上榜日期(双榜)'], errors='coerce')
-            # 检查转换结果
-            if df['首次上榜日期(双榜)'].isnull().all():
-                print("警告：所有日期转换失败，可能是日期格式不正确")
-        except Exception as e:
-            print(f"日期转换时出错：{str(e)}")
+            months, data_by_month, categories_by_month = prepare_bar_race_data(df)
+        except ValueError as e:
+            print(f"错误：{str(e)}")
             return 1
-
-        # 添加 "首次上榜月份" 列
-        try:
-            df['首次上榜月份'] = df['首次上榜日期(双榜)'].dt.to_period('M').astype(str)
         except Exception as e:
-            print(f"添加月份列时出错：{str(e)}")
+            print(f"数据处理时出错：{str(e)}")
             return 1
 
-        # 按 "一级分类" 和 "首次上榜月份" 分组统计书籍数量
-        try:
-            grouped = df.groupby(['一级分类', '首次上榜月份']).size().reset_index(name='书籍总数')
-        except Exception as e:
-            print(f"数据分组时出错：{str(e)}")
-            return 1
-
-        # 获取所有月份
-        months = grouped['首次上榜月份'].unique().tolist()
-        if not months:
-            print("警告：没有找到有效的月份数据")
-            return 1
-
-        # 构建动态数据和分类顺序
-        data_by_month = {}
-        categories_by_month = {}
-        for month in months:
-            temp = grouped[grouped['首次上榜月份'] == month]
-            data = {row['一级分类']: row['书籍总数'] for _, row in temp.iterrows()}
-            sorted_categories = sorted(data.items(), key=lambda x: x[1], reverse=True)
-            categories = [cat[0] for cat in sorted_categories]
-            values = [cat[1] for cat in sorted_categories]
-            data_by_month[month] = values
-            categories_by_month[month] = categories
-
-        # 转换为 JSON 格式
-        months_json = json.dumps(months, ensure_ascii=False)
-        data_by_month_json = json.dumps(data_by_month, ensure_ascii=False)
-        categories_by_month_json = json.dumps(categories_by_month, ensure_ascii=False)
-
-        # 4. 生成 HTML 文件
-        html_content = f"""
-<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="utf-8">
-    <title>动态排序柱状图</title>
-    <script src="https://cdn.jsdelivr.net/npm/echarts/dist/echarts.min.js"></script>
-</head>
-<body>
-    <div id="dynamic-bar" style="width: 100%; height: 600px;"></div>
-    <script>
-        var chartDom = document.getElementById('dynamic-bar');
-        var myChart = echarts.init(chartDom);
-
-        // 数据
-        var months = {months_json};
-        var dataByMonth = {data_by_month_json};
-        var categoriesByMonth = {categories_by_month_json};
-
-        // 动态排序柱状图配置
-        var option = {{
-            baseOption: {{
-                timeline: {{
-                    axisType: 'category',
-                    autoPlay: true,
-                    playInterval: 2000,
-                    data: months
-                }}, 
-                tooltip: {{
-                    trigger: 'axis',
-                    axisPointer: {{ type: 'shadow' }}
-                }},
-                xAxis: {{
-                    type: 'value',
-                    name: '首次上榜书籍总数'
-                }},
-                yAxis: {{
-                    type: 'category',
-                    inverse: true
-                }}, 
-                series: [{{
-                    type: 'bar',
-                    label: {{
-                        show: true,
-                        position: 'right',
-                        formatter: '{{c}}'
-                    }}
-                }}]
-            }}, 
-            options: months.map(month => {{
-                return {{
-                    yAxis: {{
-                        data: categoriesByMonth[month]
-                    }}, 
-                    series: [{{
-                        data: dataByMonth[month]
-                    }}]
-                }};
-            }})
-        }};
-
-        // 渲染图表
-        myChart.setOption(option);
-    </script>
-</body>
-</html>
-"""
-
-        # 保存 HTML 文件
+        # 3. 生成并保存 HTML 文件
         output_path = '../visualizations/charts/动态排序柱状图.html'
         try:
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(html_content)
+            render_html(months, data_by_month, categories_by_month, output_path)
             print(f"HTML 文件已成功生成：{output_path}")
         except Exception as e:
             print(f"保存 HTML 文件时出错：{str(e)}")
@@ -0,0 +1,3 @@
+"""
+小说市场趋势分析的共享数据处理模块
+"""
@@ -0,0 +1,154 @@
+"""
+分块聚合
+
+数据集大于内存时按块读取（见 dataset.iter_dataset_chunks），每块先计算可合并的部分聚合结果：
+求和、非缺失值计数、行数、最小值和最大值，随后与之前的部分结果合并，均值在全部合并后由和与计数相除得到。
+内存占用只取决于块的大小和分组的数量，与数据集的行数无关。
+
+聚合的写法与 pandas 的具名聚合一致：{输出列: (输入列, 聚合方式)}，聚合方式可选
+sum、count、size、mean、min、max。分组键可以是一列或多列，与 groupby(observed=True) 一样排序，
+缺失的键默认被丢弃（dropna=False 时保留为单独的分组）。
+
+合并后的部分结果本身也可以保存下来，按更粗的分组键再次合并（见 cube 模块的上卷）。
+
+各块的和按块累加，与整体求和的累加顺序不同，浮点数的结果可能在最后几位有差异；
+整数值（包括以浮点数存储的整数）的求和、计数和均值与整体聚合的结果完全一致。
+"""
+import pandas as pd
+
+# 各聚合方式需要保存的部分结果
+PARTS = {
+    'sum': ('sum',),
+    'count': ('count',),
+    'size': ('size',),
+    'mean': ('sum', 'count'),
+    'min': ('min',),
+    'max': ('max',),
+}
+
+# 合并部分结果的方式：和与计数相加，最小值和最大值再取一次最小值和最大值
+MERGE = {'sum': 'sum', 'count': 'sum', 'size': 'sum', 'min': 'min', 'max': 'max'}
+
+
+def _part_name(name, part):
+    return f'{name}|{part}'
+
+
+def _plain_index(index):
+    # 不同数据块的分类列类别不同，统一为普通的索引后才能合并；多列分组时逐层转换
+    if isinstance(index, pd.MultiIndex):
+        levels = [index.get_level_values(i) for i in range(index.nlevels)]
+        return pd.MultiIndex.from_arrays(
+            [level.astype(object) if isinstance(level.dtype, pd.CategoricalDtype) else level for level in levels],
+            names=index.names,
+        )
+    return index.astype(object)
+
+
+def partial_aggregate(chunk, by, aggs, dropna=True):
+    """
+    计算一个数据块的部分聚合结果
+
+    参数:
+    chunk: DataFrame - 数据块
+    by: str 或 list - 分组列
+    aggs: dict - 输出列 -> (输入列, 聚合方式)
+    dropna: bool - 是否丢弃分组键缺失的行
+
+    返回:
+    DataFrame - 以分组键为索引，每项部分结果一列
+
+    异常:
+    ValueError - 不支持的聚合方式
+    """
+    unknown = sorted({func for _, func in aggs.values()} - set(PARTS))
+    if unknown:
+        raise ValueError(f"不支持分块计算的聚合方式：{', '.join(unknown)}（可选：{', '.join(PARTS)}）")
+    named = {
+        _part_name(name, part): (column, part)
+        for name, (column, func) in aggs.items()
+        for part in PARTS[func]
+    }
+    partial = chunk.groupby(by, observed=True, dropna=dropna).agg(**named)
+    partial.index = _plain_index(partial.index)
+    return partial
+
+
+def merge_partials(partials, levels=None, dropna=True):
+    """
+    合并多个部分聚合结果
+
+    参数:
+    partials: list - partial_aggregate 返回的部分结果
+    levels: list - 按这些分组键合并（上卷），其余分组键被汇总掉；默认保留全部分组键
+    dropna: bool - 是否丢弃分组键缺失的分组
+
+    返回:
+    DataFrame - 合并后的部分结果，分组键排序
+    """
+    combined = pd.concat(partials)
+    if levels is None:
+        levels = list(range(combined.index.nlevels))
+    how = {col: MERGE[col.rsplit('|', 1)[1]] for col in combined.columns}
+    return combined.groupby(level=levels, dropna=dropna).agg(how)
+
+
+def finalize(partial, aggs):
+    """
+    由合并后的部分结果计算最终的聚合结果
+
+    参数:
+    partial: DataFrame - 合并后的部分结果
+    aggs: dict - 输出列 -> (输入列, 聚合方式)
+
+    返回:
+    DataFrame - 与 groupby(by, observed=True).agg(**aggs) 相同的列
+    """
+    result = pd.DataFrame(index=partial.index)
+    for name, (_, func) in aggs.items():
+        if func == 'mean':
+            total = partial[_part_name(name, 'sum')].astype('float64')
+            count = partial[_part_name(name, 'count')]
+            result[name] = total.where(count > 0) / count.where(count > 0)
+        else:
+            result[name] = partial[_part_name(name, func)]
+    return result
+
+
+def merge_chunks(chunks, by, aggs, prepare=None, dropna=True):
+    """
+    逐块计算部分聚合结果并立即合并，任何时候只保留一个数据块和一份部分结果
+
+    参数:
+    chunks: iterable - 数据块（DataFrame）
+    by: str 或 list - 分组列
+    aggs: dict - 输出列 -> (输入列, 聚合方式)
+    prepare: callable - 聚合前对每个数据块的处理，如转换类型或计算派生列
+    dropna: bool - 是否丢弃分组键缺失的行
+
+    返回:
+    DataFrame - 合并后的部分结果，索引名为 by
+
+    异常:
+    ValueError - 没有任何数据块
+    """
+    merged = None
+    for chunk in chunks:
+        if prepare is not None:
+            chunk = prepare(chunk)
+        partial = partial_aggregate(chunk, by, aggs, dropna)
+        merged = partial if merged is None else merge_partials([merged, partial], dropna=dropna)
+    if merged is None:
+        raise ValueError("没有可聚合的数据")
+    merged.index.names = by if isinstance(by, list) else [by]
+    return merged
+
+
+def aggregate_chunks(chunks, by, aggs, prepare=None):
+    """
+    逐块聚合数据，参数同 merge_chunks
+
+    返回:
+    DataFrame - 以分组键为索引的聚合结果，索引名为 by
+    """
+    return finalize(merge_chunks(chunks, by, aggs, prepare), aggs)
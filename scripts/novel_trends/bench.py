@@ -0,0 +1,295 @@
+"""
+基准测试
+
+用合成数据集（见 synthetic 模块）测量各步骤随数据量增长的耗时和内存峰值：
+
+- 加载：流式解析 Excel（Excel 读写很慢，只对不超过 --excel-rows 行的数据测量），以及读取同样内容的 CSV 和 Parquet
+- 清洗：按 schema 规范列名和类型
+- 读取缓存：以内存映射方式读取 Feather 缓存，即数据未变化时流水线的加载方式
+- 去重：MinHash/LSH 查找近似重复的书名（见 dedup 模块），即构建时 --dedup 的额外开销
+- 各图表的聚合和渲染（写数据文件和页面）
+
+每个步骤先计时（重复多次时取最快的一次），再单独运行一次并用 tracemalloc 记录内存峰值，
+避免 tracemalloc 的开销影响计时。tracemalloc 只统计当前进程，分词并行时工作进程的内存不计入。
+
+结果可以写为 JSON 基线，之后的运行与基线比较，耗时或内存超出阈值的步骤标记为退化。
+"""
+import contextlib
+import gc
+import importlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from .config import SCRIPTS_DIR
+from .profiling import pad
+
+# 各构建脚本位于 scripts/ 目录下
+if SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR)
+
+RESULTS_VERSION = 1
+DEFAULT_ROWS = [10_000, 100_000, 1_000_000]
+EXCEL_MAX_ROWS = 10_000
+
+# 与基线相比增长超过该比例视为退化；差值低于噪声下限的不计
+DEFAULT_THRESHOLD = 0.2
+MIN_SECONDS_DELTA = 0.01
+MIN_PEAK_DELTA_MB = 1.0
+
+# 各图表的步骤：阶段名称 -> (构建脚本, 聚合函数 (模块, 数据) -> 结果, 渲染函数 (模块, 结果, 页面路径) -> 文件列表)
+CHART_STEPS = {
+    '饼图': ('book_bin1',
+             lambda m, df: m.summarize_rewards(df),
+             lambda m, summary, html: m.render_html(m.chart_records(summary), html)),
+    # 不读写分词缓存，每次都完整分词，也不会把合成书名写入真实数据的缓存
+    '词云': ('book_ciyun',
+             lambda m, df: m.count_title_words(df, cache_file=None),
+             lambda m, word_freq, html: m.render_html(word_freq, html)),
+    '雷达图': ('book_lei',
+               lambda m, df: m.analyze_author_frame(df),
+               lambda m, result, html: m.generate_radar_html(*result, html)),
+    '散点图': ('book_san_1',
+               lambda m, df: m.aggregate_categories(df),
+               lambda m, category_data, html: m.generate_html(category_data, html)),
+    '旭日图': ('book_xuri',
+               lambda m, df: m.sunburst_data(df),
+               lambda m, nodes, html: m.write_sunburst(nodes, html)),
+    '折线图': ('book_zhe',
+               lambda m, df: m.trend_table(df),
+               lambda m, data, html: m.generate_html(data, html)),
+    '柱状图': ('book_zhu',
+               lambda m, df: m.prepare_bar_race_data(df),
+               lambda m, result, html: m.render_html(*result, html)),
+    '力图': ('book_li',
+             lambda m, df: m.build_graph(df, cache_file=None),
+             lambda m, graph, html: m.render_html(graph, html)),
+}
+
+
+def measure(fn, repeat=1, memory=True):
+    """
+    测量函数的耗时和内存峰值
+
+    参数:
+    fn: callable - 无参数的函数
+    repeat: int - 计时的次数，取最快的一次
+    memory: bool - 是否再运行一次记录内存峰值
+
+    返回:
+    tuple - (函数的返回值, {'seconds': 秒, 'peak_mb': 内存峰值 MB 或 None})
+    """
+    best = float('inf')
+    result = None
+    for _ in range(max(1, repeat)):
+        gc.collect()
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+
+    peak = None
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            fn()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result, {
+        'seconds': round(best, 4),
+        'peak_mb': None if peak is None else round(peak / 2 ** 20, 2),
+    }
+
+
+def benchmark_rows(rows, stages=None, repeat=1, seed=0, memory=True, excel_max_rows=EXCEL_MAX_ROWS):
+    """
+    对指定行数的合成数据集运行所有步骤
+
+    参数:
+    rows: int - 合成数据集的行数
+    stages: list - 只测量这些图表阶段，为空时测量全部
+    repeat: int - 每个步骤计时的次数
+    seed: int - 合成数据的随机数种子
+    memory: bool - 是否记录内存峰值
+    excel_max_rows: int - 不超过该行数时才测量 Excel 加载
+
+    返回:
+    dict - 步骤名称 -> 测量结果，按执行顺序排列
+    """
+    from .dataset import _read_cache, _to_columnar, _write_cache
+    from .dedup import duplicate_groups
+    from .ingest import read_source
+    from .schema import normalize_dataset
+    from .synthetic import synthetic_dataset
+
+    results = {}
+
+    def record(step, fn):
+        # 屏蔽构建脚本自己打印的提示，只输出测量结果
+        with contextlib.redirect_stdout(io.StringIO()):
+            value, metrics = measure(fn, repeat, memory)
+        results[step] = metrics
+        peak = '' if metrics['peak_mb'] is None else f"，内存峰值 {metrics['peak_mb']:.1f} MB"
+        print(f"[{rows} 行] {step}：{metrics['seconds']:.3f}s{peak}")
+        return value
+
+    raw = synthetic_dataset(rows, seed)
+    with tempfile.TemporaryDirectory(prefix='novel_trends_bench_') as workdir:
+        if rows <= excel_max_rows:
+            excel_file = os.path.join(workdir, 'synthetic.xlsx')
+            raw.to_excel(excel_file, index=False)
+            record('加载', lambda: read_source(excel_file))
+        csv_file = os.path.join(workdir, 'synthetic.csv')
+        raw.to_csv(csv_file, index=False)
+        record('加载CSV', lambda: read_source(csv_file))
+        parquet_file = os.path.join(workdir, 'synthetic.parquet')
+        _to_columnar(raw.copy()).to_parquet(parquet_file, index=False)
+        record('加载Parquet', lambda: read_source(parquet_file))
+
+        df = record('清洗', lambda: _to_columnar(normalize_dataset(raw)))
+        del raw
+
+        cache_file = os.path.join(workdir, 'synthetic.feather')
+        _write_cache(df, cache_file)
+        df = record('读取缓存', lambda: _read_cache(cache_file))
+        record('去重', lambda: duplicate_groups(df))
+
+        output_dir = os.path.join(workdir, 'charts')
+        os.makedirs(output_dir)
+        for stage, (module_name, aggregate, render) in CHART_STEPS.items():
+            if stages and stage not in stages:
+                continue
+            module = importlib.import_module(module_name)
+            data = df[module.INPUT_COLUMNS]
+            output_html = os.path.join(output_dir, module.OUTPUT_HTML)
+            result = record(f'{stage}/聚合', lambda: aggregate(module, data))
+            record(f'{stage}/渲染', lambda: render(module, result, output_html))
+    return results
+
+
+def _environment():
+    import pandas as pd
+
+    return {
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def run_benchmark(rows_list=None, stages=None, repeat=1, seed=0, memory=True, excel_max_rows=EXCEL_MAX_ROWS):
+    """
+    对各个数据量运行基准测试
+
+    返回:
+    dict - 可以写为 JSON 基线的测量结果
+    """
+    results = {}
+    for rows in rows_list or DEFAULT_ROWS:
+        results[str(rows)] = benchmark_rows(rows, stages, repeat, seed, memory, excel_max_rows)
+    return {
+        'version': RESULTS_VERSION,
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'seed': seed,
+        'repeat': repeat,
+        'environment': _environment(),
+        'results': results,
+    }
+
+
+def load_results(path):
+    """
+    读取之前保存的测量结果
+
+    异常:
+    ValueError - 文件不是当前版本的测量结果
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if data.get('version') != RESULTS_VERSION:
+        raise ValueError(f"基线文件版本不符：{path}")
+    return data
+
+
+def save_results(data, path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=4)
+
+
+def _regressed(current, base, threshold, min_delta):
+    if current is None or base is None:
+        return False
+    return current > base * (1 + threshold) and current - base > min_delta
+
+
+def compare_results(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    将测量结果与基线逐项比较，只比较两边都有的数据量和步骤
+
+    参数:
+    current: dict - 本次的测量结果
+    baseline: dict - 基线
+    threshold: float - 增长超过该比例视为退化
+
+    返回:
+    list - 每项为 dict：rows、step、seconds、base_seconds、peak_mb、base_peak_mb、regressed
+    """
+    rows = []
+    for size, steps in current['results'].items():
+        base_steps = baseline['results'].get(size, {})
+        for step, metrics in steps.items():
+            base = base_steps.get(step)
+            if base is None:
+                continue
+            regressed = (
+                _regressed(metrics['seconds'], base['seconds'], threshold, MIN_SECONDS_DELTA)
+                or _regressed(metrics['peak_mb'], base['peak_mb'], threshold, MIN_PEAK_DELTA_MB)
+            )
+            rows.append({
+                'rows': int(size),
+                'step': step,
+                'seconds': metrics['seconds'],
+                'base_seconds': base['seconds'],
+                'peak_mb': metrics['peak_mb'],
+                'base_peak_mb': base['peak_mb'],
+                'regressed': regressed,
+            })
+    return rows
+
+
+def _change(current, base):
+    if current is None or base is None:
+        return '-'
+    if base == 0:
+        return '-' if current == 0 else '+inf'
+    return f"{(current - base) / base * 100:+.0f}%"
+
+
+def format_comparison(rows):
+    """
+    将比较结果格式化为文本表格
+    """
+    widths = [9, 18, 10, 10, 8, 10, 10, 8]
+    header = ['行数', '  步骤', '用时(s)', '基线', '变化', '峰值(MB)', '基线', '变化']
+    lines = [''.join(pad(text, width, i != 1) for i, (text, width) in enumerate(zip(header, widths)))]
+    for row in rows:
+        cells = [
+            row['rows'], '  ' + row['step'],
+            f"{row['seconds']:.3f}", f"{row['base_seconds']:.3f}", _change(row['seconds'], row['base_seconds']),
+            '-' if row['peak_mb'] is None else f"{row['peak_mb']:.1f}",
+            '-' if row['base_peak_mb'] is None else f"{row['base_peak_mb']:.1f}",
+            _change(row['peak_mb'], row['base_peak_mb']),
+        ]
+        line = ''.join(pad(cell, width, i != 1) for i, (cell, width) in enumerate(zip(cells, widths)))
+        lines.append(line + ('  退化' if row['regressed'] else ''))
+    return '\n'.join(lines)
@@ -0,0 +1,141 @@
+"""
+图表数据文件
+
+图表页面不再内嵌数据：数据按列组织，压缩成一行 JSON 写入输出目录下的 data/ 目录，
+由页面通过 fetch 加载。按列存储避免每条记录重复列名；数据和页面分开缓存，
+数据变化时浏览器不需要重新下载页面本身。
+
+可以为数据文件额外生成 gzip/brotli 预压缩副本（.json.gz、.json.br），
+由支持预压缩文件的静态服务器（如 nginx 的 gzip_static/brotli_static）直接发送。
+
+浏览器不允许 file:// 页面通过 fetch 读取本地文件，查看图表时需要通过 HTTP 访问，
+例如在 visualizations/ 目录下运行 python -m http.server。
+"""
+import gzip
+import json
+import math
+import os
+
+from .profiling import step
+
+DATA_DIR = 'data'
+
+# 预压缩方式及对应的文件后缀
+COMPRESSIONS = {'gzip': '.gz', 'br': '.br'}
+
+
+def data_path(output_html, name=None):
+    """
+    图表数据文件的路径，以及页面中引用它的相对地址
+
+    参数:
+    output_html: str - 图表页面路径
+    name: str - 数据文件名（不含扩展名），默认与页面同名
+
+    返回:
+    tuple - (文件路径, 相对于页面的地址)
+    """
+    name = name or os.path.splitext(os.path.basename(output_html))[0]
+    url = f"{DATA_DIR}/{name}.json"
+    return os.path.join(os.path.dirname(output_html), DATA_DIR, f"{name}.json"), url
+
+
+def _json_value(value):
+    # 缺失值写为 null，保证输出的是合法的 JSON
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def columns(records, keys=None):
+    """
+    将按行组织的记录转换为按列组织的字典
+
+    参数:
+    records: list - 字典列表
+    keys: list - 输出的列，默认取第一条记录的键
+
+    返回:
+    dict - 列名 -> 该列取值列表
+    """
+    if keys is None:
+        keys = list(records[0]) if records else []
+    return {key: [_json_value(record[key]) for record in records] for key in keys}
+
+
+def frame_columns(df):
+    """
+    将 DataFrame 转换为按列组织的字典，取值转换为 Python 原生类型
+    """
+    return {str(col): [_json_value(value) for value in df[col].tolist()] for col in df.columns}
+
+
+def write_chart_data(payload, path):
+    """
+    将图表数据写为紧凑的 JSON 文件
+
+    参数:
+    payload: dict - 图表数据
+    path: str - 输出文件路径
+
+    返回:
+    str - 输出文件路径
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with step('写数据文件'), open(path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False, separators=(',', ':'), allow_nan=False)
+    return path
+
+
+def _compress(content, method):
+    if method == 'gzip':
+        # 固定 mtime，内容不变时压缩结果也不变
+        return gzip.compress(content, compresslevel=9, mtime=0)
+    import brotli
+
+    return brotli.compress(content, quality=11)
+
+
+def available_compressions(methods):
+    """
+    过滤掉当前环境不支持的预压缩方式，brotli 是可选依赖
+
+    参数:
+    methods: list - 预压缩方式，可选 gzip、br
+
+    返回:
+    list - 可用的预压缩方式
+    """
+    methods = sorted(set(methods or ()))
+    if 'br' in methods:
+        try:
+            import brotli  # noqa: F401
+        except ImportError:
+            print("提示：未安装 brotli，跳过 .br 预压缩")
+            methods.remove('br')
+    return methods
+
+
+def precompress(paths, methods):
+    """
+    为生成的 JSON 数据文件写入预压缩副本
+
+    参数:
+    paths: list - 生成的文件路径，只处理其中的 .json 文件
+    methods: list - 预压缩方式，需先经过 available_compressions 过滤
+
+    返回:
+    list - 新生成的压缩文件路径
+    """
+    written = []
+    for path in paths:
+        if not path.endswith('.json'):
+            continue
+        with open(path, 'rb') as f:
+            content = f.read()
+        for method in methods:
+            target = path + COMPRESSIONS[method]
+            with step('预压缩'), open(target, 'wb') as f:
+                f.write(_compress(content, method))
+            written.append(target)
+    return written
@@ -0,0 +1,375 @@
+"""
+命令行入口
+
+用法（在 scripts/ 目录下运行）:
+    python -m novel_trends build
+    python -m novel_trends build --only 饼图 --only 词云
+    python -m novel_trends build --jobs 4
+    python -m novel_trends build --force
+    python -m novel_trends build --only 词云 --top 200 --category 同人小说 --stopwords stopwords.txt
+    python -m novel_trends bench --rows 10000 --rows 100000 --output benchmarks/baseline.json
+    python -m novel_trends bench --baseline benchmarks/baseline.json
+    python -m novel_trends serve --port 8000
+    python -m novel_trends ingest 新导出.xlsx
+    python -m novel_trends build --input ../data/books.sqlite3
+    python -m novel_trends build --dedup
+    python -m novel_trends dedup --output 重复书籍.csv
+"""
+import argparse
+import os
+
+from .config import CHARTS_DIR, DATA_FILE, STORE_FILE, VISUALIZATIONS_DIR
+
+
+def build_parser():
+    """
+    创建命令行参数解析器
+    """
+    parser = argparse.ArgumentParser(prog='novel_trends', description='小说市场趋势分析图表构建工具')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    build = subparsers.add_parser('build', help='加载一次数据并生成所有图表')
+    build.add_argument('--input', default=DATA_FILE,
+                       help='输入数据文件路径，支持 Excel（.xlsx）、CSV、Parquet 和书籍数据库（.sqlite3，见 ingest 命令）')
+    build.add_argument('--output-dir', default=CHARTS_DIR, help='图表输出目录')
+    build.add_argument('--only', action='append', metavar='阶段', help='只构建指定阶段，可重复使用')
+    build.add_argument('--no-cache', action='store_true', help='不使用列式数据缓存，直接解析数据源')
+    build.add_argument('--jobs', '-j', type=int, default=1, metavar='N',
+                       help='并行构建的进程数，默认 1（串行），0 表示使用全部 CPU 核心')
+    build.add_argument('--force', action='store_true', help='忽略增量构建清单，重新构建所有图表')
+    build.add_argument('--dashboard', metavar='文件',
+                       help='综合页面路径，默认 visualizations/dashboard.html（指定 --output-dir 时为输出目录下的 dashboard.html）')
+    build.add_argument('--no-dashboard', action='store_true', help='不生成综合页面')
+    build.add_argument('--chunk-rows', type=int, metavar='行数',
+                       help='分块模式：不整体加载数据集，逐块读取并分块聚合，只构建饼图、雷达图、散点图、旭日图和柱状图，'
+                            '用于内存放不下的数据集')
+    build.add_argument('--profile', action='store_true',
+                       help='剖析数据加载和各阶段的用时、内存峰值、行数和写入字节数，报告写入输出目录下的 profile.json')
+    build.add_argument('--profile-dump', metavar='目录', help='剖析时为每个阶段保存 cProfile 结果（.pstats）到该目录')
+    build.add_argument('--compress', action='append', choices=['gzip', 'br'],
+                       help='为图表数据文件额外生成预压缩副本（.json.gz/.json.br），可重复使用；br 需要安装 brotli')
+
+    wordcloud = build.add_argument_group('词云选项')
+    wordcloud.add_argument('--top', type=int, default=None, metavar='K',
+                           help='只保留词频最高的 K 个词，默认 100，0 表示不限数量')
+    wordcloud.add_argument('--min-freq', type=int, default=None, metavar='N', help='最低词频，默认 2')
+    wordcloud.add_argument('--category', action='append', metavar='一级分类', help='只统计指定一级分类的书名，可重复使用')
+    wordcloud.add_argument('--subcategory', action='append', metavar='二级分类', help='只统计指定二级分类的书名，可重复使用')
+    wordcloud.add_argument('--stopwords', metavar='文件', help='停用词文件，每行一个词')
+
+    radar = build.add_argument_group('雷达图选项')
+    radar.add_argument('--min-books', type=int, default=None, metavar='N', help='参与对比的作者至少需要的书籍数量，默认 5')
+    radar.add_argument('--top-authors', type=int, default=None, metavar='N', help='首屏展示的作者数量，默认 10，其余作者分页加载')
+    radar.add_argument('--metric', default=None, metavar='指标',
+                       help='作者排序依据的指标，默认 平均首日鲜花，可选 书籍数量、平均上榜次数、平均最好名次 等')
+
+    sunburst = build.add_argument_group('旭日图选项')
+    sunburst.add_argument('--level', action='append', metavar='列名',
+                          help='旭日图由外到内的层级，可重复使用，默认 一级分类、二级分类，可追加 作者')
+    sunburst.add_argument('--min-share', type=float, default=None, metavar='百分比',
+                          help='同级中占总量低于该百分比的节点合并为"其他"，默认 0.5，0 表示不合并')
+
+    timeline = build.add_argument_group('时间序列选项（折线图、柱状图）')
+    timeline.add_argument('--granularity', choices=['day', 'week', 'month', 'quarter'], default=None,
+                          help='按天、周、月或季度统计，默认 month')
+    timeline.add_argument('--cumulative', action='store_true', help='柱状图统计截至每个时间段的累计书籍数量')
+
+    graph = build.add_argument_group('力导向图选项')
+    graph.add_argument('--graph-category', action='append', metavar='一级分类',
+                       help='为指定一级分类的书籍建图，可重复使用，默认 同人小说')
+    graph.add_argument('--min-weight', type=int, default=None, metavar='N',
+                       help='两本书连线的最低关联权重（同一 IP 前缀 3、同一作者 2、每个相同的书名词语 1），默认 2')
+    graph.add_argument('--max-degree', type=int, default=None, metavar='N', help='每本书最多的连线数量，默认 8')
+
+    dedup = build.add_argument_group('去重选项')
+    dedup.add_argument('--dedup', action='store_true',
+                       help='聚合前合并同一作者下书名近似重复的书籍（重复发布、改名重发），每组只保留书号最小的一本')
+    add_dedup_arguments(dedup)
+
+    bench = subparsers.add_parser('bench', help='用合成数据集测量各步骤的耗时和内存峰值')
+    bench.add_argument('--rows', action='append', type=int, metavar='N',
+                       help='合成数据集的行数，可重复使用，默认 10000、100000、1000000')
+    bench.add_argument('--only', action='append', metavar='阶段', help='只测量指定图表阶段，可重复使用')
+    bench.add_argument('--repeat', type=int, default=1, metavar='N', help='每个步骤计时的次数，取最快的一次，默认 1')
+    bench.add_argument('--seed', type=int, default=0, help='合成数据的随机数种子，默认 0')
+    bench.add_argument('--no-memory', action='store_true', help='不记录内存峰值（省去每个步骤额外的一次运行）')
+    bench.add_argument('--excel-rows', type=int, default=10000, metavar='N',
+                       help='不超过该行数时测量 Excel 加载，默认 10000')
+    bench.add_argument('--output', metavar='文件', help='将测量结果写为 JSON 文件，可作为之后比较的基线')
+    bench.add_argument('--baseline', metavar='文件', help='与之前保存的测量结果比较，出现退化时退出码为 1')
+    bench.add_argument('--threshold', type=float, default=0.2, metavar='比例',
+                       help='耗时或内存比基线增长超过该比例时视为退化，默认 0.2')
+
+    ingest = subparsers.add_parser('ingest', help='将抓取导出的数据按书号合并到 SQLite 书籍数据库')
+    ingest.add_argument('input', nargs='?', default=DATA_FILE, help='导出文件路径，支持 Excel（.xlsx）、CSV 和 Parquet')
+    ingest.add_argument('--store', default=STORE_FILE, help='书籍数据库路径，默认 data/books.sqlite3，不存在时创建')
+    ingest.add_argument('--sheet', default='Sheet1', help='工作表名称，只用于 Excel，默认 Sheet1')
+
+    report = subparsers.add_parser('dedup', help='找出同一作者下书名近似重复的书籍，不修改数据')
+    report.add_argument('--input', default=DATA_FILE,
+                        help='输入数据文件路径，支持 Excel（.xlsx）、CSV、Parquet 和书籍数据库（.sqlite3）')
+    report.add_argument('--no-cache', action='store_true', help='不使用列式数据缓存，直接解析数据源')
+    report.add_argument('--output', metavar='文件', help='将所有重复组写为 CSV 文件')
+    report.add_argument('--show', type=int, default=10, metavar='N', help='打印最大的 N 个重复组，默认 10')
+    add_dedup_arguments(report)
+
+    serve = subparsers.add_parser('serve', help='启动本地查询服务，综合页面可按分类和时间范围筛选图表')
+    serve.add_argument('--input', default=DATA_FILE, help='输入数据文件路径，支持 Excel（.xlsx）、CSV 和 Parquet')
+    serve.add_argument('--root', default=VISUALIZATIONS_DIR, help='静态文件目录，默认 visualizations/')
+    serve.add_argument('--host', default='127.0.0.1', help='监听地址，默认 127.0.0.1')
+    serve.add_argument('--port', type=int, default=8000, help='监听端口，默认 8000')
+    serve.add_argument('--cache-size', type=int, default=256, metavar='N', help='缓存的查询结果数量，默认 256')
+    serve.add_argument('--no-cache', action='store_true', help='不使用列式数据缓存，直接解析数据源')
+    return parser
+
+
+def add_dedup_arguments(group):
+    """
+    近似重复检测的参数，build --dedup 和 dedup 命令共用
+    """
+    group.add_argument('--dedup-threshold', type=float, default=None, metavar='相似度',
+                       help='书名的 Jaccard 相似度达到该值视为近似重复，取值 0 到 1，默认 0.7')
+    group.add_argument('--dedup-ngram', type=int, default=None, metavar='N', help='书名按 N 个字切分后比较，默认 2')
+
+
+def dedup_options(args):
+    """
+    从命令行参数中收集近似重复检测的参数，只包含用户显式指定的项
+    """
+    options = {}
+    if args.dedup_threshold is not None:
+        options['threshold'] = args.dedup_threshold
+    if args.dedup_ngram is not None:
+        options['ngram'] = args.dedup_ngram
+    return options
+
+
+def radar_options(args):
+    """
+    从命令行参数中收集雷达图阶段的参数，只包含用户显式指定的项
+    """
+    options = {}
+    if args.min_books is not None:
+        options['min_books'] = args.min_books
+    if args.top_authors is not None:
+        options['top_n'] = args.top_authors
+    if args.metric is not None:
+        options['metric'] = args.metric
+    return options
+
+
+def sunburst_options(args):
+    """
+    从命令行参数中收集旭日图阶段的参数，只包含用户显式指定的项
+    """
+    options = {}
+    if args.level:
+        options['levels'] = args.level
+    if args.min_share is not None:
+        options['min_share'] = args.min_share
+    return options
+
+
+def trend_options(args):
+    """
+    从命令行参数中收集折线图阶段的参数，只包含用户显式指定的项
+    """
+    options = {}
+    if args.granularity is not None:
+        options['granularity'] = args.granularity
+    return options
+
+
+def bar_race_options(args):
+    """
+    从命令行参数中收集柱状图阶段的参数，只包含用户显式指定的项
+    """
+    options = {}
+    if args.granularity is not None:
+        options['granularity'] = args.granularity
+    if args.cumulative:
+        options['cumulative'] = True
+    return options
+
+
+def graph_options(args):
+    """
+    从命令行参数中收集力导向图阶段的参数，只包含用户显式指定的项
+    """
+    options = {}
+    if args.graph_category:
+        options['categories'] = args.graph_category
+    if args.min_weight is not None:
+        options['min_weight'] = args.min_weight
+    if args.max_degree is not None:
+        options['max_degree'] = args.max_degree
+    return options
+
+
+def wordcloud_options(args):
+    """
+    从命令行参数中收集词云阶段的参数，只包含用户显式指定的项
+
+    停用词文件在这里读入，文件内容的变化会体现在增量构建的阶段参数摘要中。
+    """
+    options = {}
+    if args.top is not None:
+        options['top_k'] = args.top
+    if args.min_freq is not None:
+        options['min_freq'] = args.min_freq
+    if args.category:
+        options['categories'] = args.category
+    if args.subcategory:
+        options['subcategories'] = args.subcategory
+    if args.stopwords:
+        from book_ciyun import load_stopwords
+
+        options['stopwords'] = load_stopwords(args.stopwords)
+    return options
+
+
+def main(argv=None):
+    """
+    解析命令行参数并执行对应的命令
+
+    返回:
+    int - 退出码
+    """
+    args = build_parser().parse_args(argv)
+
+    if args.command == 'build':
+        from .dashboard import default_dashboard_path
+        from .pipeline import run_pipeline, select_stages
+
+        try:
+            if not os.path.exists(args.input):
+                raise FileNotFoundError(f"数据文件不存在：{args.input}")
+            select_stages(args.only)
+            options = {
+                '词云': wordcloud_options(args),
+                '雷达图': radar_options(args),
+                '旭日图': sunburst_options(args),
+                '折线图': trend_options(args),
+                '柱状图': bar_race_options(args),
+                '力图': graph_options(args),
+            }
+            dedup = dedup_options(args)
+            if dedup and not args.dedup:
+                raise ValueError("--dedup-threshold 和 --dedup-ngram 需要与 --dedup 一起使用")
+            if args.dedup and args.chunk_rows:
+                raise ValueError("--dedup 需要整体加载数据集，不能与 --chunk-rows 同时使用")
+        except (ValueError, OSError) as e:
+            print(f"错误：{str(e)}")
+            return 2
+        return run_pipeline(
+            input_file=args.input,
+            output_dir=args.output_dir,
+            only=args.only,
+            use_cache=not args.no_cache,
+            jobs=args.jobs,
+            force=args.force,
+            options=options,
+            compress=args.compress,
+            dashboard=None if args.no_dashboard else args.dashboard or default_dashboard_path(args.output_dir),
+            profile=args.profile or bool(args.profile_dump),
+            profile_dump=args.profile_dump,
+            chunk_rows=args.chunk_rows,
+            dedup=dedup if args.dedup else None,
+        )
+
+    if args.command == 'bench':
+        return run_bench(args)
+
+    if args.command == 'dedup':
+        return run_dedup(args)
+
+    if args.command == 'ingest':
+        from .store import ingest_file
+
+        try:
+            result = ingest_file(args.input, args.store, args.sheet)
+        except (ValueError, OSError) as e:
+            print(f"错误：{str(e)}")
+            return 2
+        print(f"导入完成（批次 {result['version']}）：读取 {result['rows']} 行，新增 {result['inserted']} 本，"
+              f"更新 {result['updated']} 本，未变化 {result['unchanged']} 本，用时 {result['seconds']:.2f}s")
+        if result['skipped']:
+            print(f"警告：{result['skipped']} 行缺少书号，已跳过")
+        return 0
+
+    if args.command == 'serve':
+        from .server import serve
+
+        try:
+            return serve(args.input, args.root, args.host, args.port, args.cache_size, use_cache=not args.no_cache)
+        except (ValueError, OSError) as e:
+            print(f"错误：{str(e)}")
+            return 2
+    return 0
+
+
+def run_dedup(args):
+    """
+    检测近似重复的书籍，打印最大的几组，并按需导出全部重复组
+
+    返回:
+    int - 退出码
+    """
+    import itertools
+    import time
+
+    from .dataset import load_dataset
+    from .dedup import INPUT_COLUMNS, duplicate_groups, duplicate_report
+
+    try:
+        df = load_dataset(args.input, use_cache=not args.no_cache, columns=INPUT_COLUMNS)
+        started = time.perf_counter()
+        report = duplicate_report(df, duplicate_groups(df, **dedup_options(args)))
+    except (ValueError, OSError) as e:
+        print(f"错误：{str(e)}")
+        return 2
+    groups = report.groupby('代表书号', sort=False)
+    print(f"共 {len(df)} 本书，发现 {groups.ngroups} 组近似重复，合并后减少 {len(report) - groups.ngroups} 本，"
+          f"用时 {time.perf_counter() - started:.2f}s")
+    for _, group in itertools.islice(groups, args.show):
+        titles = '、'.join(f"{title}（{book}）" for book, title in zip(group['书号'], group['书名']))
+        print(f"  {group['作者'].iloc[0]}：{titles}")
+    if args.output:
+        report.to_csv(args.output, index=False, encoding='utf-8-sig')
+        print(f"重复组已导出：{args.output}")
+    return 0
+
+
+def run_bench(args):
+    """
+    执行基准测试，并按需保存结果或与基线比较
+
+    返回:
+    int - 退出码，出现退化时为 1
+    """
+    from .bench import compare_results, format_comparison, load_results, run_benchmark, save_results
+    from .pipeline import select_stages
+
+    try:
+        select_stages(args.only)
+        baseline = load_results(args.baseline) if args.baseline else None
+    except (ValueError, OSError) as e:
+        print(f"错误：{str(e)}")
+        return 2
+
+    results = run_benchmark(args.rows, args.only, args.repeat, args.seed, not args.no_memory, args.excel_rows)
+    if args.output:
+        save_results(results, args.output)
+        print(f"测量结果已保存：{args.output}")
+    if baseline is None:
+        return 0
+
+    comparison = compare_results(results, baseline, args.threshold)
+    print(format_comparison(comparison))
+    regressed = [row for row in comparison if row['regressed']]
+    if regressed:
+        print(f"共 {len(regressed)} 个步骤相比基线退化超过 {args.threshold:.0%}")
+        return 1
+    print("与基线相比没有退化")
+    return 0
@@ -0,0 +1,16 @@
+"""
+项目路径配置，所有路径均基于项目根目录计算，与运行时的工作目录无关
+"""
+import os
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_ROOT = os.path.dirname(SCRIPTS_DIR)
+
+DATA_DIR = os.path.join(PROJECT_ROOT, 'data')
+DATA_FILE = os.path.join(DATA_DIR, '飞卢小说数据.xlsx')
+CACHE_DIR = os.path.join(DATA_DIR, '.cache')
+STORE_FILE = os.path.join(DATA_DIR, 'books.sqlite3')
+
+VISUALIZATIONS_DIR = os.path.join(PROJECT_ROOT, 'visualizations')
+CHARTS_DIR = os.path.join(VISUALIZATIONS_DIR, 'charts')
+DASHBOARD_FILE = os.path.join(VISUALIZATIONS_DIR, 'dashboard.html')
@@ -0,0 +1,129 @@
+"""
+聚合立方体
+
+饼图、散点图、旭日图和柱状图都是对同一批书籍按分类（和首次上榜月份）分组后求和或计数。
+这里先按最细的粒度 一级分类 × 二级分类 × 月份 计算一次可加的度量：书籍数量、书名数量、
+首日打赏、首日鲜花和上榜次数的和、平均名次的和与计数（均值在上卷后由和与计数相除得到），
+各图表再从这几千个单元格上卷（合并掉不需要的维度）得到自己的分组结果，不再各自扫描全部书籍。
+
+立方体就是 aggregate 模块中可合并的部分聚合结果，因此同样可以在分块模式下逐块构建和合并。
+分组键中的分类列保存为分类编码，月份保存为整数周期序号（首次上榜日期缺失的书籍为缺失值），
+度量为 int64/float64，每个单元格只占几十个字节。
+
+分组键缺失的书籍保留在单独的单元格中，各图表的结果与直接在原始数据上分组一致。
+"""
+import pandas as pd
+
+from .aggregate import finalize, merge_chunks, merge_partials, partial_aggregate
+from .timeseries import period_codes
+
+# 立方体的维度，由粗到细
+LEVELS = ['一级分类', '二级分类', '月份']
+
+# 月份维度由该日期列按月计算
+DATE_COLUMN = '首次上榜日期(双榜)'
+
+# 立方体的度量：输出列 -> (输入列, 聚合方式)，只使用可合并的聚合方式（见 aggregate.PARTS）
+MEASURES = {
+    '书籍数量': ('书名', 'size'),
+    '书名数量': ('书名', 'count'),
+    '首日打赏': ('首日打赏', 'sum'),
+    '首日鲜花': ('首日鲜花', 'sum'),
+    '总上榜次数': ('总次数(双榜)', 'sum'),
+    '平均名次': ('平均名次', 'mean'),
+}
+
+# 构建立方体需要读取的列
+INPUT_COLUMNS = ['一级分类', '二级分类', DATE_COLUMN, '书名', '首日打赏', '首日鲜花', '总次数(双榜)',
+                 '最好名次(双榜)', '最差名次(双榜)']
+
+
+def _prepare(df):
+    """
+    计算立方体的分组键和派生的度量列，打赏和鲜花按 float64 累加以免丢失精度
+    """
+    return pd.DataFrame({
+        '一级分类': df['一级分类'],
+        '二级分类': df['二级分类'],
+        '月份': period_codes(df[DATE_COLUMN], 'month'),
+        '书名': df['书名'],
+        '首日打赏': df['首日打赏'].astype('float64'),
+        '首日鲜花': df['首日鲜花'].astype('float64'),
+        '总次数(双榜)': df['总次数(双榜)'],
+        '平均名次': (df['最好名次(双榜)'].astype('float64') + df['最差名次(双榜)']) / 2,
+    })
+
+
+def _compact(cube):
+    """
+    分组键转换为紧凑的类型：分类列为分类编码，月份为可缺失的 int32
+    """
+    index = cube.index
+    cube.index = pd.MultiIndex.from_arrays([
+        index.get_level_values('一级分类').astype('category'),
+        index.get_level_values('二级分类').astype('category'),
+        index.get_level_values('月份').astype('Int32'),
+    ], names=LEVELS)
+    return cube
+
+
+def build_cube(df):
+    """
+    由已加载的数据构建立方体
+
+    参数:
+    df: DataFrame - 至少包含 INPUT_COLUMNS 的小说数据
+
+    返回:
+    DataFrame - 以 LEVELS 为多级索引、每项部分聚合结果一列的立方体
+    """
+    cube = partial_aggregate(_prepare(df), LEVELS, MEASURES, dropna=False)
+    return _compact(cube.sort_index())
+
+
+def build_cube_chunks(chunks):
+    """
+    逐块构建立方体，结果与 build_cube 一致，数据集不需要整体载入内存
+
+    参数:
+    chunks: iterable - 至少包含 INPUT_COLUMNS 的数据块
+
+    返回:
+    DataFrame - 同 build_cube
+    """
+    return _compact(merge_chunks(chunks, LEVELS, MEASURES, prepare=_prepare, dropna=False))
+
+
+def rollup(cube, levels, measures=None, granularity='month'):
+    """
+    将立方体上卷到指定的维度，并计算度量的最终值
+
+    参数:
+    cube: DataFrame - build_cube 返回的立方体
+    levels: list - 保留的维度，取自 LEVELS，其余维度被汇总掉
+    measures: list - 需要的度量，默认全部
+    granularity: str - 月份维度上卷的粒度，可选 month、quarter
+
+    返回:
+    DataFrame - 以 levels 为索引的度量；分组键缺失的分组（如没有首次上榜日期的书籍）保留在结果中
+
+    异常:
+    ValueError - 未知的维度或粒度
+    """
+    unknown = [level for level in levels if level not in LEVELS]
+    if unknown:
+        raise ValueError(f"立方体没有维度：{', '.join(unknown)}（可选：{', '.join(LEVELS)}）")
+    if granularity not in ('month', 'quarter'):
+        raise ValueError(f"立方体只能按 month 或 quarter 上卷，不支持：{granularity}")
+    aggs = {name: MEASURES[name] for name in (measures or MEASURES)}
+
+    if granularity == 'quarter':
+        # 月份序号从 1970-01 起计，整除 3 即为季度序号
+        index = cube.index
+        cube = cube.set_axis(pd.MultiIndex.from_arrays([
+            index.get_level_values('一级分类'),
+            index.get_level_values('二级分类'),
+            index.get_level_values('月份') // 3,
+        ], names=LEVELS))
+    merged = merge_partials([cube], levels=levels, dropna=False)
+    return finalize(merged, aggs)
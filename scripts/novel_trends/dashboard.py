@@ -0,0 +1,320 @@
+"""
+综合页面
+
+把各阶段生成的图表合并到一个页面中：各图表的数据文件合并为一个数据包，只请求一次；
+页面只引用一份 ECharts，各图表直接复用构建脚本中的渲染函数（RENDER_JS），不再通过 iframe
+为每个图表各加载一个完整的页面。
+
+图表容器进入可视区域时才初始化（IntersectionObserver），首屏只需要渲染第一个图表。
+
+页面通过查询服务（python -m novel_trends serve，见 server 模块）访问时显示筛选栏，
+声明了查询接口的图表按所选分类和时间范围重新请求数据；以静态文件访问时筛选栏保持隐藏。
+"""
+import importlib
+import json
+import os
+import posixpath
+from string import Template
+
+from .chartdata import data_path, precompress, write_chart_data
+from .config import CHARTS_DIR, DASHBOARD_FILE, VISUALIZATIONS_DIR
+from .templates import ECHARTS, install_scripts, script_tags
+
+DASHBOARD_NAME = 'dashboard.html'
+BUNDLE_NAME = 'dashboard'
+
+# 图表容器的默认高度，个别图表需要更多空间
+DEFAULT_HEIGHT = '600px'
+HEIGHTS = {'散点图': '800px', '力图': '800px'}
+
+# 不由流水线生成的页面（相对于 visualizations/），综合页面位于 visualizations/ 下时在导航栏中以链接的形式给出
+LINKS = [('市场趋势报告', 'report.html')]
+
+PAGE = Template("""<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+    <meta charset="utf-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>综合可视化作品</title>
+$scripts
+    <style>
+        body {
+            margin: 0;
+            font-family: sans-serif;
+        }
+        .nav {
+            position: sticky;
+            top: 0;
+            z-index: 10;
+            display: flex;
+            gap: 12px;
+            padding: 12px 20px;
+            background-color: #f8f9fa;
+            border-bottom: 2px solid #e9ecef;
+            overflow-x: auto; /* 允许水平滚动 */
+            white-space: nowrap; /* 防止按钮换行 */
+        }
+        .nav a {
+            padding: 8px 16px;
+            border: 1px solid #dee2e6;
+            border-radius: 8px;
+            background-color: white;
+            color: #495057;
+            font-size: 14px;
+            text-decoration: none;
+        }
+        .nav a:hover {
+            background-color: #e9ecef;
+        }
+        .filters {
+            display: flex;
+            gap: 8px;
+            align-items: center;
+            margin-left: auto;
+            font-size: 14px;
+        }
+        .filters[hidden] {
+            display: none;
+        }
+        .filters input {
+            width: 150px;
+        }
+        .filters .status {
+            color: #868e96;
+        }
+        section {
+            padding: 20px;
+            border-bottom: 1px solid #e9ecef;
+        }
+        section h2 {
+            margin: 0 0 12px;
+            font-size: 18px;
+            color: #343a40;
+        }
+        .chart {
+            width: 100%;
+        }
+    </style>
+</head>
+<body>
+    <div class="nav">
+$nav
+        <form class="filters" hidden>
+            <select name="category"><option value="">全部分类</option></select>
+            <input name="start" placeholder="起始，如 2022Q1">
+            <input name="end" placeholder="结束，如 2023-06">
+            <button type="submit">筛选</button>
+            <button type="reset">重置</button>
+            <span class="status">筛选作用于：$filterable</span>
+        </form>
+    </div>
+$sections
+    <script>
+        // 各图表的渲染函数，与单独的图表页面共用
+        var renders = {
+$renders
+        };
+
+        // 图表 -> 查询服务中的接口，筛选时这些图表重新请求数据
+        var queries = $queries;
+
+        // 所有图表的数据只请求一次
+        var bundle = fetch('$bundle_url').then(function (response) { return response.json(); });
+        var charts = {};
+        var filters = '';
+
+        function chartData(name) {
+            if (filters && queries[name]) {
+                return fetch('/api/' + queries[name] + '?' + filters).then(function (response) {
+                    return response.json().then(function (data) {
+                        if (!response.ok) throw new Error(data.error);
+                        return data;
+                    });
+                });
+            }
+            return bundle.then(function (data) { return data[name]; });
+        }
+
+        function initChart(container) {
+            var name = container.getAttribute('data-chart');
+            chartData(name).then(function (data) {
+                var chart = echarts.init(container);
+                charts[name] = chart;
+                renders[name](chart, data);
+            });
+        }
+
+        // 筛选栏：只有通过查询服务访问时 /api/meta 才可用
+        var form = document.querySelector('.filters');
+        var filterStatus = form.querySelector('.status');
+        var hint = filterStatus.textContent;
+
+        function applyFilters(params) {
+            filters = params;
+            var pending = Object.keys(charts).filter(function (name) { return queries[name]; });
+            filterStatus.textContent = '加载中…';
+            Promise.all(pending.map(function (name) {
+                return chartData(name).then(function (data) {
+                    charts[name].clear();
+                    renders[name](charts[name], data);
+                });
+            })).then(function () {
+                filterStatus.textContent = hint;
+            }, function (error) {
+                filterStatus.textContent = error.message;
+            });
+        }
+
+        fetch('/api/meta').then(function (response) {
+            if (!response.ok) throw new Error(response.statusText);
+            return response.json();
+        }).then(function (meta) {
+            Object.keys(meta.categories).forEach(function (category) {
+                form.elements.category.add(new Option(category, category));
+            });
+            form.elements.start.title = form.elements.end.title = '上榜日期范围：' + meta.dates.start + ' 至 ' + meta.dates.end;
+            form.hidden = false;
+        }).catch(function () {});
+
+        form.addEventListener('submit', function (event) {
+            event.preventDefault();
+            var params = new URLSearchParams();
+            new FormData(form).forEach(function (value, key) {
+                if (value.trim()) params.append(key, value.trim());
+            });
+            applyFilters(params.toString());
+        });
+        form.addEventListener('reset', function () {
+            applyFilters('');
+        });
+
+        // 图表进入可视区域（提前 200px）时才初始化
+        var containers = document.querySelectorAll('.chart');
+        if ('IntersectionObserver' in window) {
+            var observer = new IntersectionObserver(function (entries) {
+                entries.forEach(function (entry) {
+                    if (!entry.isIntersecting) return;
+                    observer.unobserve(entry.target);
+                    initChart(entry.target);
+                });
+            }, {rootMargin: '200px 0px'});
+            containers.forEach(function (container) { observer.observe(container); });
+        } else {
+            containers.forEach(initChart);
+        }
+
+        window.addEventListener('resize', function () {
+            Object.keys(charts).forEach(function (name) { charts[name].resize(); });
+        });
+    </script>
+</body>
+</html>
+""")
+
+
+def default_dashboard_path(output_dir):
+    """
+    综合页面的默认路径：图表输出到默认目录时为 visualizations/dashboard.html，否则放在输出目录下
+    """
+    if os.path.abspath(output_dir) == os.path.abspath(CHARTS_DIR):
+        return DASHBOARD_FILE
+    return os.path.join(output_dir, DASHBOARD_NAME)
+
+
+def _relative_url(url, prefix):
+    # 以输出目录为基准的相对地址改写为以综合页面为基准；完整的 URL 保持不变
+    if '://' in url or prefix == '.':
+        return url
+    return posixpath.normpath(posixpath.join(prefix, url))
+
+
+def _indent(text, width):
+    return '\n'.join((' ' * width + line) if line else line for line in text.splitlines())
+
+
+def load_sections(stages, output_dir, prefix):
+    """
+    读取各阶段生成的数据文件，没有数据文件的阶段（如尚未构建或构建失败）不出现在综合页面中
+
+    参数:
+    stages: list - 构建阶段，按展示顺序排列
+    output_dir: str - 图表输出目录
+    prefix: str - 综合页面到输出目录的相对路径，用于改写数据中的相对地址
+
+    返回:
+    list - (阶段, 构建脚本模块, 数据) 列表
+    """
+    sections = []
+    for stage in stages:
+        module = importlib.import_module(stage.module)
+        data_file = data_path(os.path.join(output_dir, module.OUTPUT_HTML))[0]
+        if not os.path.exists(data_file):
+            continue
+        with open(data_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        for key in getattr(module, 'DATA_URLS', ()):
+            data[key] = _relative_url(data[key], prefix)
+        sections.append((stage, module, data))
+    return sections
+
+
+def build_dashboard(stages, output_dir, dashboard_html, compress=()):
+    """
+    生成综合页面及其数据包
+
+    参数:
+    stages: list - 构建阶段，按展示顺序排列
+    output_dir: str - 图表输出目录
+    dashboard_html: str - 综合页面路径
+    compress: list - 为数据包写入预压缩副本的方式，可选 gzip、br
+
+    返回:
+    list - 生成的文件路径
+    """
+    dashboard_dir = os.path.dirname(os.path.abspath(dashboard_html))
+    prefix = os.path.relpath(os.path.abspath(output_dir), dashboard_dir).replace(os.sep, '/')
+    sections = load_sections(stages, output_dir, prefix)
+
+    # 各图表的数据合并为一个数据包：阶段名称 -> 该图表的数据
+    bundle_file, bundle_url = data_path(dashboard_html, BUNDLE_NAME)
+    write_chart_data({stage.name: data for stage, _, data in sections}, bundle_file)
+
+    # 共用图表输出目录下的脚本，所有图表只加载一份 ECharts
+    names = []
+    for _, module, _ in sections:
+        names += [name for name in getattr(module, 'PAGE_SCRIPTS', (ECHARTS,)) if name not in names]
+    urls = install_scripts(output_dir, names or (ECHARTS,))[0]
+
+    nav = [f'<a href="#{stage.name}">{stage.description}</a>' for stage, _, _ in sections]
+    for title, path in LINKS:
+        path = os.path.relpath(os.path.join(VISUALIZATIONS_DIR, path), dashboard_dir)
+        if not path.startswith(os.pardir) and os.path.exists(os.path.join(dashboard_dir, path)):
+            nav.append(f'<a href="{path.replace(os.sep, "/")}">{title}</a>')
+    html_sections = [
+        f'<section id="{stage.name}">\n'
+        f'    <h2>{stage.description}</h2>\n'
+        f'    <div class="chart" data-chart="{stage.name}" '
+        f'style="height: {HEIGHTS.get(stage.name, DEFAULT_HEIGHT)};"></div>\n'
+        f'</section>'
+        for stage, _, _ in sections
+    ]
+    renders = [
+        f"{json.dumps(stage.name, ensure_ascii=False)}: {module.RENDER_JS.strip()}"
+        for stage, module, _ in sections
+    ]
+    # 声明了查询接口（QUERY 属性）的图表可以在查询服务中筛选
+    queries = {stage.name: module.QUERY for stage, module, _ in sections if hasattr(module, 'QUERY')}
+    html_content = PAGE.substitute(
+        scripts=script_tags(_relative_url(url, prefix) for url in urls),
+        nav=_indent('\n'.join(nav), 8),
+        sections=_indent('\n'.join(html_sections), 4),
+        renders=_indent(',\n'.join(renders), 12),
+        bundle_url=bundle_url,
+        queries=json.dumps(queries, ensure_ascii=False),
+        filterable='、'.join(queries),
+    )
+    with open(dashboard_html, 'w', encoding='utf-8') as f:
+        f.write(html_content)
+
+    outputs = [dashboard_html, bundle_file]
+    return outputs + precompress(outputs, compress) if compress else outputs
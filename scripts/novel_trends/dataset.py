@@ -0,0 +1,252 @@
+"""
+共享数据加载模块
+
+数据源（Excel、CSV 或 Parquet）只在源文件变化后流式解析一次（见 ingest 模块），
+解析结果按 schema 规范列名和类型后写入 Feather 列式缓存。
+之后的运行直接以内存映射方式读取缓存，不再经过 openpyxl；指定 columns 时只读取需要的列。
+"""
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+from .config import CACHE_DIR, DATA_FILE
+from .ingest import CHUNK_ROWS, iter_source_chunks, read_source
+from .profiling import step
+
+# 缓存格式版本，修改缓存内容的生成方式时需要递增
+CACHE_VERSION = 2
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """
+    计算文件内容的 SHA-256 摘要
+
+    参数:
+    path: str - 文件路径
+    chunk_size: int - 每次读取的字节数
+
+    返回:
+    str - 十六进制摘要
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_fingerprint(path):
+    """
+    获取源文件的指纹（大小、修改时间和内容摘要）
+
+    参数:
+    path: str - 文件路径
+
+    返回:
+    dict - 包含 size、mtime_ns 和 sha256 的字典
+    """
+    stat = os.stat(path)
+    return {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': file_digest(path),
+    }
+
+
+def cache_paths(input_file, sheet_name='Sheet1', cache_dir=CACHE_DIR):
+    """
+    获取某个数据源对应的缓存文件和元数据文件路径
+
+    参数:
+    input_file: str - 输入数据文件路径
+    sheet_name: str - 工作表名称
+    cache_dir: str - 缓存目录
+
+    返回:
+    tuple - (缓存文件路径, 元数据文件路径)
+    """
+    source = os.path.abspath(input_file)
+    key = hashlib.sha1(f"{source}|{sheet_name}".encode('utf-8')).hexdigest()[:12]
+    stem = os.path.splitext(os.path.basename(source))[0]
+    base = os.path.join(cache_dir, f"{stem}-{key}")
+    return base + '.feather', base + '.json'
+
+
+def _is_fresh(meta, input_file, meta_path):
+    """
+    判断缓存是否仍与源文件一致
+
+    大小和修改时间都相同时直接认为有效；只有修改时间变化时再比较内容摘要，
+    内容未变则刷新元数据中的修改时间，避免下次重复计算摘要。
+    """
+    if meta.get('version') != CACHE_VERSION:
+        return False
+
+    stat = os.stat(input_file)
+    if stat.st_size != meta.get('size'):
+        return False
+    if stat.st_mtime_ns == meta.get('mtime_ns'):
+        return True
+
+    if file_digest(input_file) != meta.get('sha256'):
+        return False
+
+    meta['mtime_ns'] = stat.st_mtime_ns
+    _write_json(meta_path, meta)
+    return True
+
+
+def _write_json(path, data):
+    """
+    先写临时文件再替换，防止并发运行时读到写了一半的文件
+    """
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=4)
+    os.replace(tmp_path, path)
+
+
+def _to_columnar(df):
+    """
+    将 schema 之外混合类型的 object 列转换为字符串，使其可以写入列式格式
+
+    缺失值保持为缺失值，后续的 pd.to_numeric(errors='coerce') 结果不受影响。
+    """
+    for col in df.columns:
+        if df[col].dtype != object:
+            continue
+        if pd.api.types.infer_dtype(df[col], skipna=True) in ('string', 'empty'):
+            continue
+        df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+
+def _parse_source(input_file, sheet_name, columns=None):
+    """
+    流式解析数据源，得到规范列名和类型的数据集
+    """
+    with step('解析数据源'):
+        df = read_source(input_file, sheet_name, columns)
+    with step('规范列类型'):
+        return _to_columnar(df)
+
+
+def _read_cache(cache_path, columns=None):
+    """
+    以内存映射方式读取 Feather 缓存，columns 不为空时只读取这些列
+    """
+    from pyarrow import feather
+
+    with step('读取缓存'):
+        return feather.read_table(cache_path, columns=columns, memory_map=True).to_pandas()
+
+
+def _write_cache(df, cache_path):
+    """
+    写入未压缩的 Feather 缓存，未压缩的文件才能被直接内存映射
+    """
+    from pyarrow import feather
+
+    tmp_path = cache_path + '.tmp'
+    with step('写入缓存'):
+        feather.write_feather(df, tmp_path, compression='uncompressed')
+    os.replace(tmp_path, cache_path)
+
+
+def _fresh_cache(input_file, sheet_name, cache_dir):
+    """
+    与源文件一致的缓存文件路径，缓存不存在或已过期时返回 None
+    """
+    cache_path, meta_path = cache_paths(input_file, sheet_name, cache_dir)
+    if not (os.path.exists(cache_path) and os.path.exists(meta_path)):
+        return None
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    return cache_path if _is_fresh(meta, input_file, meta_path) else None
+
+
+def load_dataset(input_file=DATA_FILE, sheet_name='Sheet1', use_cache=True, cache_dir=CACHE_DIR, columns=None):
+    """
+    加载小说数据集，优先读取列式缓存
+
+    参数:
+    input_file: str - 输入数据文件路径，支持 Excel、CSV 和 Parquet
+    sheet_name: str - 工作表名称，只用于 Excel
+    use_cache: bool - 是否使用缓存
+    cache_dir: str - 缓存目录
+    columns: list - 只加载这些规范列名的列，为空时加载全部列；缓存总是包含全部列
+
+    返回:
+    DataFrame - 规范列名和类型的数据集（见 schema 模块），每次调用都返回新的对象，可以直接修改
+    """
+    if not use_cache:
+        return _parse_source(input_file, sheet_name, columns)
+
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        print("提示：未安装 pyarrow，跳过数据缓存")
+        return _parse_source(input_file, sheet_name, columns)
+
+    cache_path = _fresh_cache(input_file, sheet_name, cache_dir)
+    if cache_path is not None:
+        return _read_cache(cache_path, columns)
+
+    # 缓存不存在或已过期，解析数据源并重建缓存
+    cache_path, meta_path = cache_paths(input_file, sheet_name, cache_dir)
+    fingerprint = source_fingerprint(input_file)
+    df = _parse_source(input_file, sheet_name)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    _write_cache(df, cache_path)
+    _write_json(meta_path, {
+        'version': CACHE_VERSION,
+        'source': os.path.abspath(input_file),
+        'sheet_name': sheet_name,
+        **fingerprint,
+    })
+    print(f"已解析数据源并生成数据缓存：{cache_path}")
+    return df[columns] if columns is not None else df
+
+
+def _iter_cache_chunks(cache_path, columns, chunk_rows):
+    """
+    以内存映射方式按批读取 Feather 缓存，每批转换为一个 DataFrame
+    """
+    import pyarrow as pa
+
+    with pa.memory_map(cache_path) as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            if columns is not None:
+                batch = batch.select(columns)
+            for offset in range(0, batch.num_rows, chunk_rows):
+                yield batch.slice(offset, chunk_rows).to_pandas()
+
+
+def iter_dataset_chunks(input_file=DATA_FILE, sheet_name='Sheet1', columns=None, chunk_rows=CHUNK_ROWS,
+                        use_cache=True, cache_dir=CACHE_DIR):
+    """
+    逐块加载小说数据集，数据集不需要整体载入内存，用于分块聚合（见 aggregate 模块）
+
+    有与源文件一致的缓存时按批读取缓存（需要 pyarrow，生成缓存时已经具备），否则流式解析数据源；
+    分块读取时不生成缓存。
+
+    参数:
+    input_file: str - 输入数据文件路径，支持 Excel、CSV 和 Parquet
+    sheet_name: str - 工作表名称，只用于 Excel
+    columns: list - 只加载这些规范列名的列，为空时加载全部列
+    chunk_rows: int - 每块的行数
+    use_cache: bool - 是否读取缓存
+    cache_dir: str - 缓存目录
+
+    返回:
+    iterator - 规范列名和类型的 DataFrame 数据块
+    """
+    cache_path = _fresh_cache(input_file, sheet_name, cache_dir) if use_cache else None
+    if cache_path is not None:
+        return _iter_cache_chunks(cache_path, columns, chunk_rows)
+    return (_to_columnar(chunk) for chunk in iter_source_chunks(input_file, sheet_name, columns, chunk_rows))
@@ -0,0 +1,287 @@
+"""
+近似重复书名检测
+
+抓取的数据中有同一作者重复发布或稍作改名的书籍（如 "原神：开局签到" 与 "原神之开局签到！"），
+它们会重复计入旭日图、柱状图和词云等图表的数量。这里用 MinHash 和局部敏感哈希（LSH）找出
+同一作者下书名相近的书籍，不需要两两比较：
+
+1. 书名规范化（全角转半角、转小写、去掉空白和标点）后切分为字符 n-gram，每个 n-gram 哈希为 32 位整数
+2. 对每本书的 n-gram 集合计算 num_perm 个 MinHash 值：两本书的 MinHash 值相同的比例即 Jaccard 相似度的估计
+3. 签名切分为 bands 段，作者相同且某一段完全相同的书籍落入同一个桶，成为候选对；
+   每本书只与桶内书号最小的一本比较签名，相似度达到阈值才合并
+4. 合并关系的连通分量即一组近似重复，书号最小的书籍作为该组的代表
+
+签名按块计算，全部为 numpy 向量运算；每本书在每段中只进入一个桶、只产生一个候选对，
+耗时和内存都与书籍数量成线性关系。默认参数下相似度 0.7 的书籍对成为候选的概率约为 0.99，
+相似度 0.3 的约为 0.12；候选对再以签名估计的相似度与阈值比较，64 个 MinHash 值的估计误差约为 ±0.06，
+相似度恰好在阈值附近的书籍对可能被漏掉。
+
+合并是传递的：A 与 B 相近、B 与 C 相近时，A、B、C 为同一组。作者或书名缺失的书籍不参与合并。
+"""
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from .profiling import step
+
+# 检测重复需要读取的列
+INPUT_COLUMNS = ['书号', '书名', '作者']
+
+# 中文书名较短，默认按相邻两个字切分
+DEFAULT_NGRAM = 2
+
+# 签名长度和分段数：每段 NUM_PERM // BANDS 个 MinHash 值
+NUM_PERM = 64
+BANDS = 16
+
+# 估计的 Jaccard 相似度达到该值的两本书视为近似重复
+DEFAULT_THRESHOLD = 0.7
+
+# 每块计算签名的书籍数量，一块的中间结果约为 书籍数量 × 每本书的 n-gram 数 × NUM_PERM × 8 字节
+BLOCK_BOOKS = 16384
+
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+# 书名中文字和数字以外的字符
+_SEPARATORS = re.compile(r'[\W_]+')
+
+# 64 位乘法混合（splitmix64 的常数），用于 n-gram 和签名分段的哈希
+_MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_2 = np.uint64(0x94D049BB133111EB)
+
+
+def _mix(values):
+    values = values ^ (values >> np.uint64(30))
+    values = values * _MIX_1
+    values = values ^ (values >> np.uint64(27))
+    values = values * _MIX_2
+    return values ^ (values >> np.uint64(31))
+
+
+def normalize_title(title):
+    """
+    书名规范化：全角转半角、转小写，只保留文字和数字
+    """
+    title = _SEPARATORS.sub('', title.lower())
+    # 去掉标点后大多数书名已经是 NFKC 形式，检查比转换快得多
+    if not unicodedata.is_normalized('NFKC', title):
+        title = _SEPARATORS.sub('', unicodedata.normalize('NFKC', title).lower())
+    return title
+
+
+def shingle_hashes(titles, ngram=DEFAULT_NGRAM):
+    """
+    将书名切分为字符 n-gram 并哈希为 32 位整数
+
+    参数:
+    titles: list - 规范化后的书名，不能为空字符串
+    ngram: int - n-gram 的字符数，短于 ngram 的书名整体作为一个 n-gram
+
+    返回:
+    tuple - (所有书名的 n-gram 哈希按书名依次排列的 uint64 数组, 每个书名第一个 n-gram 的位置)
+    """
+    # 每个书名后补 ngram - 1 个 0，书名之间的 n-gram 不会跨越书名
+    padded = '\0' * (ngram - 1)
+    codes = np.frombuffer(padded.join(titles).encode('utf-32-le') + padded.encode('utf-32-le'),
+                          dtype=np.uint32).astype(np.uint64)
+    lengths = np.fromiter(map(len, titles), dtype=np.int64, count=len(titles))
+    starts = np.concatenate(([0], np.cumsum(lengths + ngram - 1)[:-1]))
+    counts = np.maximum(lengths - ngram + 1, 1)
+
+    # 每个 n-gram 的起始字符位置
+    offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    positions = np.repeat(starts - offsets, counts) + np.arange(counts.sum())
+
+    hashes = codes[positions]
+    for k in range(1, ngram):
+        hashes = _mix(hashes) ^ codes[positions + k]
+    return _mix(hashes) & _MAX_HASH, offsets
+
+
+def _permutations(num_perm, seed):
+    # multiply-shift 哈希 (a * x + b) >> 32，a 为奇数，uint64 运算按 2^64 取模
+    rng = np.random.default_rng(seed)
+    a = rng.integers(0, 1 << 63, size=(num_perm, 1), dtype=np.uint64) << np.uint64(1) | np.uint64(1)
+    b = rng.integers(0, 1 << 63, size=(num_perm, 1), dtype=np.uint64) << np.uint64(1)
+    return a, b
+
+
+def minhash_signatures(titles, ngram=DEFAULT_NGRAM, num_perm=NUM_PERM, seed=0, block=BLOCK_BOOKS):
+    """
+    计算书名的 MinHash 签名
+
+    参数:
+    titles: list - 规范化后的书名，不能为空字符串
+    ngram: int - n-gram 的字符数
+    num_perm: int - 签名长度
+    seed: int - 哈希函数的随机数种子，比较的签名必须使用相同的种子
+    block: int - 每块计算的书名数量
+
+    返回:
+    ndarray - 形状为 (书名数量, num_perm) 的 uint32 签名
+    """
+    a, b = _permutations(num_perm, seed)
+    signatures = np.empty((len(titles), num_perm), dtype=np.uint32)
+    for begin in range(0, len(titles), block):
+        hashes, offsets = shingle_hashes(titles[begin:begin + block], ngram)
+        # 每行对应一个哈希函数，按行连续存放，每本书的 n-gram 在行内相邻
+        values = a * hashes
+        values += b
+        values >>= np.uint64(32)
+        signatures[begin:begin + len(offsets)] = np.minimum.reduceat(values.astype(np.uint32), offsets, axis=1).T
+    return signatures
+
+
+def _band_keys(signatures, groups, bands):
+    """
+    依次生成每段签名与分组（作者）编码一起哈希得到的 64 位桶键
+    """
+    rows = signatures.shape[1] // bands
+    group_keys = _mix(groups.astype(np.uint64))
+    for band in range(bands):
+        values = signatures[:, band * rows:(band + 1) * rows].astype(np.uint64)
+        keys = group_keys
+        # 每两个 32 位的 MinHash 值拼成一个 64 位整数再混合
+        for column in range(0, rows, 2):
+            value = values[:, column]
+            if column + 1 < rows:
+                value = value << np.uint64(32) | values[:, column + 1]
+            keys = _mix(keys ^ value)
+        yield keys
+
+
+def lsh_pairs(signatures, groups, bands=BANDS):
+    """
+    局部敏感哈希：同一分组内某一段签名完全相同的书籍互为候选
+
+    每个桶内的书籍只与桶内下标最小的一本配对，候选对的数量不超过 书籍数量 × bands。
+
+    参数:
+    signatures: ndarray - minhash_signatures 返回的签名
+    groups: ndarray - 每本书的分组编码（如作者），只在同一分组内查找
+    bands: int - 签名的分段数，须整除签名长度
+
+    返回:
+    tuple - (桶内下标最小的书的下标数组, 另一本书的下标数组)
+    """
+    if signatures.shape[1] % bands:
+        raise ValueError(f"签名长度 {signatures.shape[1]} 不能被分段数 {bands} 整除")
+    if not len(signatures):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    firsts, seconds = [], []
+    for keys in _band_keys(signatures, groups, bands):
+        order = np.argsort(keys)
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.concatenate(([True], sorted_keys[1:] != sorted_keys[:-1])))
+        # 每个位置所在桶中下标最小的书
+        heads = np.repeat(np.minimum.reduceat(order, starts), np.diff(np.append(starts, len(order))))
+        others = order != heads
+        firsts.append(heads[others])
+        seconds.append(order[others])
+    return np.concatenate(firsts), np.concatenate(seconds)
+
+
+def _components(count, firsts, seconds):
+    """
+    合并关系的连通分量，每本书的标签为所在分量中最小的下标
+    """
+    labels = np.arange(count)
+    while True:
+        merged = labels.copy()
+        np.minimum.at(merged, firsts, labels[seconds])
+        np.minimum.at(merged, seconds, labels[firsts])
+        # 标签不大于自身下标且在同一分量中，沿标签跳转可以加快收敛
+        merged = merged[merged]
+        if np.array_equal(merged, labels):
+            return labels
+        labels = merged
+
+
+def duplicate_groups(df, threshold=DEFAULT_THRESHOLD, ngram=DEFAULT_NGRAM, num_perm=NUM_PERM, bands=BANDS,
+                     seed=0):
+    """
+    找出同一作者下书名近似重复的书籍
+
+    参数:
+    df: DataFrame - 至少包含 INPUT_COLUMNS 的小说数据
+    threshold: float - 估计的 Jaccard 相似度达到该值视为近似重复，取值 0 到 1
+    ngram: int - 书名切分的字符数
+    num_perm: int - MinHash 签名长度
+    bands: int - LSH 的分段数，须整除 num_perm；分段越多，相似度较低的书籍对越容易成为候选
+    seed: int - 哈希函数的随机数种子
+
+    返回:
+    Series - 与 df 的索引对齐，每本书所在组的代表（组内书号最小的书籍）在 df 中的位置；
+    没有近似重复的书籍为自身的位置
+
+    异常:
+    ValueError - 参数不合法
+    """
+    if not 0 < threshold <= 1:
+        raise ValueError(f"相似度阈值须在 0 到 1 之间：{threshold}")
+    if ngram < 1:
+        raise ValueError(f"n-gram 的字符数至少为 1：{ngram}")
+
+    # 按书号排序后组内下标最小的即书号最小的书籍
+    order = np.argsort(df['书号'].to_numpy(dtype='float64', na_value=np.inf), kind='stable')
+    titles = df['书名'].iloc[order]
+    authors, _ = pd.factorize(df['作者'].iloc[order])
+    with step('规范书名'):
+        normalized = [normalize_title(title) if isinstance(title, str) else '' for title in titles]
+    valid = np.flatnonzero((authors >= 0) & np.fromiter(map(bool, normalized), dtype=bool, count=len(normalized)))
+
+    with step('计算签名'):
+        signatures = minhash_signatures([normalized[i] for i in valid], ngram, num_perm, seed)
+    with step('查找候选'):
+        firsts, seconds = lsh_pairs(signatures, authors[valid], bands)
+        similar = (signatures[firsts] == signatures[seconds]).mean(axis=1) >= threshold
+        labels = valid[_components(len(valid), firsts[similar], seconds[similar])]
+
+    groups = np.arange(len(df))
+    groups[valid] = labels
+    # 排序后的下标换回 df 中的位置
+    positions = np.empty(len(df), dtype=np.int64)
+    positions[order] = order[groups]
+    return pd.Series(positions, index=df.index, name='重复组')
+
+
+def collapse_duplicates(df, **options):
+    """
+    每组近似重复只保留代表书籍，其余书籍从数据中去掉
+
+    参数:
+    df: DataFrame - 至少包含 INPUT_COLUMNS 的小说数据
+    options: dict - 传给 duplicate_groups 的参数
+
+    返回:
+    tuple - (去重后的 DataFrame，保持原有的行顺序和索引, 保留的书籍在 df 中的位置)
+    """
+    groups = duplicate_groups(df, **options).to_numpy()
+    kept = np.flatnonzero(groups == np.arange(len(df)))
+    return df.take(kept), kept
+
+
+def duplicate_report(df, groups):
+    """
+    整理近似重复的书籍组，用于检查和导出
+
+    参数:
+    df: DataFrame - 至少包含 INPUT_COLUMNS 的小说数据
+    groups: Series - duplicate_groups 返回的结果
+
+    返回:
+    DataFrame - 属于某个重复组的书籍，列为 代表书号、书号、作者、书名，按组的大小从大到小、组内按书号排列
+    """
+    positions = groups.to_numpy()
+    sizes = np.bincount(positions, minlength=len(df))[positions]
+    report = pd.DataFrame({
+        '代表书号': df['书号'].to_numpy()[positions],
+        '书号': df['书号'].to_numpy(),
+        '作者': df['作者'].to_numpy(),
+        '书名': df['书名'].to_numpy(),
+        '组大小': sizes,
+    })[sizes > 1]
+    report = report.sort_values(['组大小', '代表书号', '书号'], ascending=[False, True, True], kind='stable')
+    return report.drop(columns='组大小').reset_index(drop=True)
@@ -0,0 +1,200 @@
+"""
+增量构建清单
+
+清单保存在输出目录下，按阶段记录构建脚本的代码摘要、数据源的大小和修改时间、
+阶段读取的各列内容摘要以及生成的文件。重新构建时：
+
+1. 数据源的大小和修改时间都未变化、代码摘要一致且输出文件都存在时，直接跳过，
+   不需要加载数据集；
+2. 数据源有变化时加载数据集，只有阶段读取的列内容发生变化才重新构建。
+
+代码摘要包括构建脚本本身和它直接或间接导入的 novel_trends 模块（如 cube、aggregate、timeseries、
+chartdata、segment），共享模块变化时导入它的阶段同样重新构建。导入关系从源文件的语法树中找出，
+不需要真正导入构建脚本及其依赖。
+"""
+import ast
+import functools
+import hashlib
+import json
+import os
+import time
+
+from .config import SCRIPTS_DIR
+
+MANIFEST_NAME = '.build_manifest.json'
+MANIFEST_VERSION = 1
+
+PACKAGE = 'novel_trends'
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 所有图表页面共用的页面外壳，外壳变化时各阶段都需要重新生成页面
+SHARED_SOURCES = [os.path.join(PACKAGE_DIR, 'templates.py')]
+
+
+def manifest_path(output_dir):
+    return os.path.join(output_dir, MANIFEST_NAME)
+
+
+def load_manifest(output_dir):
+    """
+    读取输出目录下的构建清单，清单不存在、损坏或版本不符时返回空清单
+
+    参数:
+    output_dir: str - 图表输出目录
+
+    返回:
+    dict - 构建清单
+    """
+    empty = {'version': MANIFEST_VERSION, 'stages': {}}
+    try:
+        with open(manifest_path(output_dir), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return empty
+    if manifest.get('version') != MANIFEST_VERSION:
+        return empty
+    return manifest
+
+
+def save_manifest(output_dir, manifest):
+    """
+    写入构建清单，先写临时文件再替换
+    """
+    path = manifest_path(output_dir)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=4)
+    os.replace(tmp_path, path)
+
+
+def source_stat(input_file):
+    """
+    数据源的大小和修改时间，只调用 stat，不读取文件内容
+    """
+    stat = os.stat(input_file)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+@functools.lru_cache(maxsize=None)
+def _imported_modules(path):
+    """
+    源文件中导入的 novel_trends 模块名，包括函数内的导入
+    """
+    with open(path, 'rb') as f:
+        tree = ast.parse(f.read(), path)
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name.split('.')[1] for alias in node.names
+                         if alias.name.startswith(PACKAGE + '.'))
+        elif isinstance(node, ast.ImportFrom):
+            # 包内的相对导入（from .cube import ...）或绝对导入（from novel_trends.cube import ...）
+            if node.level == 1 or node.module == PACKAGE or (node.module or '').startswith(PACKAGE + '.'):
+                parts = (node.module or '').split('.')
+                if node.level == 0:
+                    parts = parts[1:]
+                if parts and parts[0]:
+                    names.add(parts[0])
+                else:
+                    names.update(alias.name for alias in node.names)
+    return names
+
+
+def module_sources(module):
+    """
+    构建脚本及其直接或间接导入的 novel_trends 模块的源文件
+
+    参数:
+    module: str - scripts/ 目录下的模块名
+
+    返回:
+    list - 源文件路径，构建脚本在前，其余按模块名排序
+    """
+    script = os.path.join(SCRIPTS_DIR, module + '.py')
+    found = {}
+    pending = [script]
+    while pending:
+        for name in _imported_modules(pending.pop()):
+            path = os.path.join(PACKAGE_DIR, name + '.py')
+            if name not in found and os.path.exists(path):
+                found[name] = path
+                pending.append(path)
+    return [script] + [found[name] for name in sorted(found)]
+
+
+def code_digest(module, options=None, sources=()):
+    """
+    构建脚本及其导入的共享模块、共享页面外壳和阶段参数的摘要，作为该阶段的代码版本
+
+    参数:
+    module: str - scripts/ 目录下的模块名
+    options: dict - 传给该阶段的参数，参数变化同样需要重新构建
+    sources: list - 同样影响该阶段输出的其他源文件，如聚合前的去重
+
+    返回:
+    str - 十六进制摘要
+    """
+    digest = hashlib.sha256()
+    for path in dict.fromkeys(module_sources(module) + SHARED_SOURCES + list(sources)):
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    if options:
+        digest.update(json.dumps(options, ensure_ascii=False, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def columns_digest(df, columns):
+    """
+    阶段读取的各列的内容摘要，列名、类型和取值任一变化都会改变摘要
+
+    参数:
+    df: DataFrame - 数据集
+    columns: list - 阶段读取的列
+
+    返回:
+    str - 十六进制摘要
+    """
+    import pandas as pd
+
+    digest = hashlib.sha256()
+    for col in columns:
+        digest.update(f"{col}|{df[col].dtype}".encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(df[col], index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def _outputs_exist(entry, output_dir):
+    outputs = entry.get('outputs') or []
+    return bool(outputs) and all(os.path.exists(os.path.join(output_dir, path)) for path in outputs)
+
+
+def is_fresh(entry, output_dir, code, source=None, columns=None):
+    """
+    判断阶段是否无需重新构建
+
+    参数:
+    entry: dict - 清单中该阶段的记录，可以为 None
+    output_dir: str - 图表输出目录
+    code: str - 当前的代码摘要
+    source: dict - 当前数据源的大小和修改时间，与记录一致即视为输入未变化
+    columns: str - 当前读取列的内容摘要，与记录一致即视为输入未变化
+
+    返回:
+    bool - 代码和输入都未变化且输出文件都存在时为 True
+    """
+    if not entry or entry.get('code') != code or not _outputs_exist(entry, output_dir):
+        return False
+    if source is not None and entry.get('source') == source:
+        return True
+    return columns is not None and entry.get('columns') == columns
+
+
+def record_stage(manifest, stage_name, output_dir, code, source, columns, outputs=None):
+    """
+    更新清单中某个阶段的记录，outputs 为空时保留原有的输出列表
+    """
+    entry = manifest['stages'].setdefault(stage_name, {})
+    entry.update({'code': code, 'source': source, 'columns': columns})
+    if outputs is not None:
+        entry['outputs'] = [os.path.relpath(path, output_dir) for path in outputs]
+        entry['built_at'] = time.strftime('%Y-%m-%d %H:%M:%S')
@@ -0,0 +1,492 @@
+"""
+图表构建流水线
+
+数据只加载一次，随后调用各脚本的 build(df, output_dir) 阶段，
+避免每个脚本各自启动解释器、导入依赖并重新读取数据。
+
+jobs 大于 1 时各阶段分发到进程池并行执行。工作进程通过内存映射读取
+磁盘上的 Feather 缓存获得数据，不需要为每个进程序列化一份 DataFrame。
+
+默认增量构建：输入列和构建脚本都未变化的阶段会被跳过，见 manifest 模块。
+有阶段重新构建时，随后把所有图表合并生成综合页面，见 dashboard 模块。
+profile 为 True 时剖析数据加载和每个阶段的用时、内存和输出，见 profiling 模块。
+
+提供 build_from_cube 的阶段（饼图、散点图、旭日图、柱状图）共用一个聚合立方体（见 cube 模块）：
+数据只按 一级分类 × 二级分类 × 月份 分组一次，各阶段从立方体上卷得到自己的结果。
+
+数据源为 SQLite 书籍数据库（见 store 模块）且待构建的阶段都可以由立方体构建时，
+直接读取数据库中随导入增量维护的立方体，不读取书籍。
+
+指定 dedup 时，数据加载后先合并同一作者下书名近似重复的书籍（见 dedup 模块），各阶段只统计每组的代表，
+重复发布或改名重发的书籍不再重复计入数量。
+
+指定 chunk_rows 时进入分块模式：不整体加载数据集，提供 build_chunked 的阶段逐块读取数据并分块聚合
+（见 aggregate 模块），立方体同样逐块构建，内存占用与数据集的行数无关；其余阶段被跳过。
+
+pandas 以及各阶段依赖的 jieba 等都只在确实需要时才导入，
+无需构建时不会加载这些依赖，--only 也只会导入所选阶段的构建脚本。
+"""
+import importlib
+import os
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .chartdata import available_compressions, precompress
+from .config import CHARTS_DIR, DATA_FILE, SCRIPTS_DIR
+from .dashboard import build_dashboard
+from .manifest import (code_digest, columns_digest, is_fresh, load_manifest, record_stage,
+                       save_manifest, source_stat)
+from .profiling import format_report, profile_stage, write_report
+
+# 剖析报告的文件名，保存在输出目录下
+PROFILE_NAME = 'profile.json'
+
+# 去重的实现，去重时它的变化同样需要重新构建各阶段
+DEDUP_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dedup.py')
+
+# 各构建脚本位于 scripts/ 目录下，保证从任意工作目录都能导入
+if SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR)
+
+Stage = namedtuple('Stage', ['name', 'module', 'description'])
+
+# 构建阶段，按 dashboard 中的展示顺序排列
+STAGES = [
+    Stage('饼图', 'book_bin1', '不同类别打赏饼图'),
+    Stage('词云', 'book_ciyun', '书名词云图'),
+    Stage('雷达图', 'book_lei', '多作者雷达图'),
+    Stage('散点图', 'book_san_1', '二级分类散点图'),
+    Stage('旭日图', 'book_xuri', '分类旭日图'),
+    Stage('折线图', 'book_zhe', '书籍动态趋势折线图'),
+    Stage('柱状图', 'book_zhu', '动态排序柱状图'),
+    Stage('力图', 'book_li', '同人小说力导向图'),
+]
+
+
+def select_stages(names=None):
+    """
+    按名称筛选构建阶段
+
+    参数:
+    names: list - 阶段名称列表，为空时返回全部阶段
+
+    返回:
+    list - 按 STAGES 顺序排列的阶段
+
+    异常:
+    ValueError - 存在未知的阶段名称
+    """
+    if not names:
+        return list(STAGES)
+
+    known = {stage.name for stage in STAGES}
+    unknown = [name for name in names if name not in known]
+    if unknown:
+        raise ValueError(f"未知的构建阶段：{', '.join(unknown)}（可选：{', '.join(s.name for s in STAGES)}）")
+    return [stage for stage in STAGES if stage.name in names]
+
+
+def stage_columns(stage):
+    """
+    构建阶段读取的列，由构建脚本中的 INPUT_COLUMNS 声明
+    """
+    return importlib.import_module(stage.module).INPUT_COLUMNS
+
+
+def supports_chunks(stage):
+    """
+    构建脚本是否提供分块模式的 build_chunked
+    """
+    return hasattr(importlib.import_module(stage.module), 'build_chunked')
+
+
+def supports_cube(stage, options=None):
+    """
+    构建脚本是否提供 build_from_cube，且在给定的参数下可以由聚合立方体构建（由 cube_supports 判断）
+    """
+    module = importlib.import_module(stage.module)
+    if not hasattr(module, 'build_from_cube'):
+        return False
+    return getattr(module, 'cube_supports', lambda **_: True)(**(options or {}))
+
+
+def run_stage(stage, df, output_dir, options=None, compress=(), cube=None):
+    """
+    执行单个构建阶段，构建脚本只在阶段实际运行时导入
+
+    阶段只会拿到 INPUT_COLUMNS 中声明的列，保证增量构建时的输入摘要覆盖了它读取的全部数据。
+    由立方体构建的结果与直接由这些列构建的结果相同。
+
+    参数:
+    stage: Stage - 构建阶段
+    df: DataFrame - 已加载的数据集；分块模式下为函数，传入列名返回数据块的迭代器
+    output_dir: str - 输出目录
+    options: dict - 传给该阶段 build 函数的关键字参数
+    compress: list - 为生成的 JSON 数据文件写入预压缩副本的方式，可选 gzip、br
+    cube: DataFrame - 聚合立方体，不为空且阶段支持时由立方体构建
+
+    返回:
+    list - 生成的文件路径，包括预压缩副本
+    """
+    module = importlib.import_module(stage.module)
+    if cube is not None and supports_cube(stage, options):
+        outputs = module.build_from_cube(cube, output_dir, **(options or {}))
+    elif callable(df):
+        outputs = module.build_chunked(df(module.INPUT_COLUMNS), output_dir, **(options or {}))
+    else:
+        outputs = module.build(df[module.INPUT_COLUMNS], output_dir, **(options or {}))
+    return outputs + precompress(outputs, compress) if compress else outputs
+
+
+def _describe_outputs(outputs, limit=3):
+    """
+    输出文件较多（如分页数据）时只列出前几个
+    """
+    if len(outputs) <= limit:
+        return ', '.join(outputs)
+    return f"{', '.join(outputs[:limit])} 等 {len(outputs)} 个文件"
+
+
+def _timed_stage(stage, df, output_dir, options=None, compress=(), profile=False, profile_dump=None, cube=None):
+    """
+    执行单个阶段并计时，异常作为结果返回，便于在进程间传递
+
+    返回:
+    tuple - (阶段, 生成的文件路径, 用时, 错误信息, 剖析记录)，未剖析时剖析记录为 None
+    """
+    started = time.perf_counter()
+    record = None
+    try:
+        if profile:
+            outputs, record = profile_stage(stage.name,
+                                            lambda: run_stage(stage, df, output_dir, options, compress, cube),
+                                            rows_in=None if df is None or callable(df) else len(df),
+                                            dump_dir=profile_dump)
+        else:
+            outputs = run_stage(stage, df, output_dir, options, compress, cube)
+    except Exception as e:
+        return stage, [], time.perf_counter() - started, str(e), None
+    return stage, outputs, time.perf_counter() - started, None, record
+
+
+# 工作进程内的数据集和聚合立方体，由 _init_worker 在进程启动时加载一次
+_worker_df = None
+_worker_cube = None
+
+
+def _init_worker(source, columns=None, cube=None, rows=None):
+    """
+    工作进程初始化：source 为缓存对应的数据文件路径时从缓存内存映射读取需要的列，
+    否则为父进程传入的 DataFrame（仅在没有缓存可用时发生）；立方体只有几千行，直接由父进程传入。
+    rows 为去重后保留的行在缓存数据中的位置，不为 None 时工作进程同样只保留这些行
+    """
+    from .dataset import load_dataset
+
+    global _worker_df, _worker_cube
+    if isinstance(source, str):
+        _worker_df = load_dataset(source, columns=columns)
+        if rows is not None:
+            _worker_df = _worker_df.take(rows)
+    else:
+        _worker_df = source
+    _worker_cube = cube
+
+
+def _run_in_worker(stage, output_dir, options, compress, profile, profile_dump):
+    return _timed_stage(stage, _worker_df, output_dir, options, compress, profile, profile_dump, _worker_cube)
+
+
+def _iter_parallel(stages, df, input_file, output_dir, use_cache, jobs, options, compress, profile, profile_dump,
+                   cube=None, rows=None):
+    """
+    在进程池中执行各阶段，按完成顺序返回结果；rows 见 _init_worker
+    """
+    from .dataset import cache_paths
+
+    cache_file = cache_paths(input_file)[0]
+    source = input_file if use_cache and os.path.exists(cache_file) else df
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                             initargs=(source, list(df.columns), cube, rows)) as executor:
+        futures = [
+            executor.submit(_run_in_worker, stage, output_dir, options.get(stage.name), compress, profile, profile_dump)
+            for stage in stages
+        ]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def _run_dashboard(output_dir, dashboard, compress=(), records=None, profile_dump=None):
+    """
+    合并所有阶段已生成的图表，生成综合页面
+
+    参数:
+    records: list - 剖析记录列表，不为 None 时剖析综合页面的生成并追加记录
+
+    返回:
+    bool - 是否成功
+    """
+    started = time.perf_counter()
+    try:
+        if records is not None:
+            outputs, record = profile_stage('综合页面', lambda: build_dashboard(STAGES, output_dir, dashboard, compress),
+                                            dump_dir=profile_dump)
+            records.append(record)
+        else:
+            outputs = build_dashboard(STAGES, output_dir, dashboard, compress)
+    except Exception as e:
+        print(f"[综合页面] 构建失败：{str(e)}")
+        return False
+    print(f"[综合页面] 完成，用时 {time.perf_counter() - started:.2f}s：{_describe_outputs(outputs)}")
+    return True
+
+
+def _uses_store_cube(input_file, stages, options):
+    """
+    数据源是书籍数据库，且各阶段都可以由立方体构建
+    """
+    from .store import is_store
+
+    return is_store(input_file) and all(supports_cube(stage, options.get(stage.name)) for stage in stages)
+
+
+def _collapse_duplicates(df, dedup, profile=False, profile_dump=None):
+    """
+    合并近似重复的书籍，每组只保留代表
+
+    返回:
+    tuple - (去重后的数据, 保留的行在 df 中的位置, 剖析记录)，未剖析时剖析记录为 None
+    """
+    from .dedup import collapse_duplicates
+
+    kept = {}
+
+    def collapse():
+        collapsed, kept['rows'] = collapse_duplicates(df, **dedup)
+        return collapsed
+
+    started = time.perf_counter()
+    record = None
+    if profile:
+        collapsed, record = profile_stage('去重', collapse, rows_in=len(df), dump_dir=profile_dump)
+    else:
+        collapsed = collapse()
+    print(f"合并近似重复的书籍：去掉 {len(df) - len(collapsed)} 本，剩余 {len(collapsed)} 本，"
+          f"用时 {time.perf_counter() - started:.2f}s")
+    return collapsed, kept['rows'], record
+
+
+def _build_cube(df, profile=False, profile_dump=None):
+    """
+    由已加载的数据构建聚合立方体；分块模式下 df 为函数，立方体逐块构建
+
+    返回:
+    tuple - (立方体, 剖析记录)，未剖析时剖析记录为 None
+    """
+    from .cube import INPUT_COLUMNS as CUBE_COLUMNS, build_cube, build_cube_chunks
+
+    def build():
+        return build_cube_chunks(df(CUBE_COLUMNS)) if callable(df) else build_cube(df)
+
+    started = time.perf_counter()
+    record = None
+    if profile:
+        cube, record = profile_stage('立方体', build, rows_in=None if callable(df) else len(df), dump_dir=profile_dump)
+    else:
+        cube = build()
+    print(f"聚合立方体构建完成：{len(cube)} 个单元格，用时 {time.perf_counter() - started:.2f}s")
+    return cube, record
+
+
+def _report_profile(records, output_dir):
+    """
+    打印剖析表格并写入 JSON 报告
+    """
+    path = os.path.join(output_dir, PROFILE_NAME)
+    write_report(records, path)
+    print(format_report(records))
+    print(f"剖析报告已保存：{path}")
+
+
+def run_pipeline(input_file=DATA_FILE, output_dir=CHARTS_DIR, only=None, use_cache=True, jobs=1,
+                 force=False, options=None, compress=(), dashboard=None, profile=False, profile_dump=None,
+                 chunk_rows=None, dedup=None):
+    """
+    加载一次数据并执行所有选中的构建阶段
+
+    单个阶段失败不会中断其余阶段，失败信息会被打印出来。
+    输入和代码都未变化的阶段会被跳过；如果所有阶段都无需构建，连数据集都不会加载。
+
+    参数:
+    input_file: str - 输入数据文件路径，支持 Excel、CSV 和 Parquet
+    output_dir: str - 输出目录
+    only: list - 只执行这些名称的阶段，为空时执行全部阶段
+    use_cache: bool - 是否使用列式数据缓存
+    jobs: int - 并行进程数，1 表示在当前进程中依次执行，小于 1 时使用全部 CPU 核心
+    force: bool - 忽略构建清单，重新构建所有选中的阶段
+    options: dict - 阶段名称 -> 传给该阶段 build 函数的关键字参数
+    compress: list - 为图表数据文件写入预压缩副本的方式，可选 gzip、br
+    dashboard: str - 综合页面路径，为空时不生成；有阶段重新构建或页面不存在时才重新生成
+    profile: bool - 剖析数据加载和实际构建的各阶段，报告写入输出目录下的 profile.json
+    profile_dump: str - 剖析时为每个阶段保存 cProfile 结果的目录
+    chunk_rows: int - 不为空时进入分块模式，每块读取的行数；只构建支持分块聚合或可以由立方体构建的阶段，
+                且在当前进程中依次执行
+    dedup: dict - 不为 None 时在聚合前合并近似重复的书籍，为传给 dedup.collapse_duplicates 的参数；
+           需要整体加载数据集，不能与 chunk_rows 同时使用
+
+    返回:
+    int - 退出码，全部成功时为 0
+
+    异常:
+    ValueError - 同时指定了 dedup 和 chunk_rows
+    """
+    if dedup is not None and chunk_rows:
+        raise ValueError("去重需要整体加载数据集，不能与分块模式同时使用")
+    options = options or {}
+    stages = select_stages(only)
+    if chunk_rows:
+        chunked = [stage for stage in stages if supports_chunks(stage) or supports_cube(stage, options.get(stage.name))]
+        for stage in stages:
+            if stage not in chunked:
+                print(f"[{stage.name}] 不支持分块聚合，跳过")
+        stages = chunked
+    os.makedirs(output_dir, exist_ok=True)
+    started = time.perf_counter()
+
+    manifest = load_manifest(output_dir)
+    source = source_stat(input_file)
+    compress = available_compressions(compress)
+    records = [] if profile else None
+    # 预压缩方式和去重参数变化时同样需要重新构建
+    shared = {}
+    if compress:
+        shared['预压缩'] = compress
+    if dedup is not None:
+        shared['去重'] = dedup
+    codes = {
+        stage.name: code_digest(stage.module, {**options.get(stage.name, {}), **shared} if shared
+                                else options.get(stage.name), [DEDUP_SOURCE] if dedup is not None else ())
+        for stage in stages
+    }
+
+    cube = None
+    rows = None
+
+    # 第一轮：数据源未变化的阶段直接跳过，不需要加载数据
+    pending = []
+    for stage in stages:
+        entry = manifest['stages'].get(stage.name)
+        if not force and is_fresh(entry, output_dir, codes[stage.name], source=source):
+            print(f"[{stage.name}] 数据源和代码均未变化，跳过")
+        else:
+            pending.append(stage)
+    if not pending:
+        if dashboard and not os.path.exists(dashboard) and not _run_dashboard(output_dir, dashboard, compress):
+            return 1
+        print(f"所有图表均为最新，用时 {time.perf_counter() - started:.2f}s")
+        if profile:
+            print("所有阶段均被跳过，没有可剖析的内容；使用 --force 剖析全部阶段")
+        return 0
+
+    if chunk_rows:
+        from .dataset import iter_dataset_chunks
+
+        # 分块模式：各阶段逐块读取数据，不整体加载数据集；不计算列内容摘要，待构建的阶段都会重新构建
+        def df(columns):
+            return iter_dataset_chunks(input_file, columns=columns, chunk_rows=chunk_rows, use_cache=use_cache)
+
+        print(f"分块模式：每块 {chunk_rows} 行，依次构建各阶段")
+        digests = {stage.name: None for stage in pending}
+        to_build = pending
+        jobs = 1
+    elif dedup is None and _uses_store_cube(input_file, pending, options):
+        from .store import read_cube
+
+        # 数据库中的立方体随导入增量维护，读取它不需要扫描书籍；不计算列内容摘要，待构建的阶段都会重新构建
+        cube = read_cube(input_file)
+        print(f"从数据库读取聚合立方体：{len(cube)} 个单元格，用时 {time.perf_counter() - started:.2f}s")
+        df = None
+        digests = {stage.name: None for stage in pending}
+        to_build = pending
+        jobs = 1
+    else:
+        from .cube import INPUT_COLUMNS as CUBE_COLUMNS
+        from .dataset import load_dataset
+
+        # 只加载待构建阶段读取的列，以及构建立方体需要的列
+        columns = list(dict.fromkeys(col for stage in pending for col in stage_columns(stage)))
+        if any(supports_cube(stage, options.get(stage.name)) for stage in pending):
+            columns = list(dict.fromkeys(columns + CUBE_COLUMNS))
+        if dedup is not None:
+            from .dedup import INPUT_COLUMNS as DEDUP_COLUMNS
+
+            columns = list(dict.fromkeys(columns + DEDUP_COLUMNS))
+        if profile:
+            df, record = profile_stage('加载', lambda: load_dataset(input_file, use_cache=use_cache, columns=columns),
+                                       dump_dir=profile_dump)
+            records.append(record)
+        else:
+            df = load_dataset(input_file, use_cache=use_cache, columns=columns)
+        print(f"数据加载完成：{len(df)} 行，用时 {time.perf_counter() - started:.2f}s")
+        if dedup is not None:
+            df, rows, dedup_record = _collapse_duplicates(df, dedup, profile, profile_dump)
+            if dedup_record is not None:
+                records.append(dedup_record)
+
+        # 第二轮：数据源有变化，但阶段读取的列内容未变化时同样跳过
+        digests = {}
+        to_build = []
+        for stage in pending:
+            digests[stage.name] = columns_digest(df, stage_columns(stage))
+            entry = manifest['stages'].get(stage.name)
+            if not force and is_fresh(entry, output_dir, codes[stage.name], columns=digests[stage.name]):
+                print(f"[{stage.name}] 读取的列未变化，跳过")
+                record_stage(manifest, stage.name, output_dir, codes[stage.name], source, digests[stage.name])
+            else:
+                to_build.append(stage)
+
+    # 可以由立方体构建的阶段共用一个立方体，数据只分组一次
+    if cube is None and any(supports_cube(stage, options.get(stage.name)) for stage in to_build):
+        cube, cube_record = _build_cube(df, profile, profile_dump)
+        if cube_record is not None:
+            records.append(cube_record)
+
+    if jobs < 1:
+        jobs = os.cpu_count() or 1
+    jobs = min(jobs, len(to_build))
+
+    if jobs > 1:
+        print(f"使用 {jobs} 个进程并行构建")
+        results = _iter_parallel(to_build, df, input_file, output_dir, use_cache, jobs, options, compress,
+                                 profile, profile_dump, cube, rows)
+    else:
+        results = (_timed_stage(stage, df, output_dir, options.get(stage.name), compress, profile, profile_dump,
+                                cube)
+                   for stage in to_build)
+
+    failed = []
+    for stage, outputs, elapsed, error, record in results:
+        if record is not None:
+            records.append(record)
+        if error is not None:
+            failed.append(stage.name)
+            manifest['stages'].pop(stage.name, None)
+            print(f"[{stage.name}] 构建失败：{error}")
+            continue
+        record_stage(manifest, stage.name, output_dir, codes[stage.name], source, digests[stage.name], outputs)
+        print(f"[{stage.name}] 完成，用时 {elapsed:.2f}s：{_describe_outputs(outputs)}")
+
+    save_manifest(output_dir, manifest)
+    if (dashboard and (to_build or not os.path.exists(dashboard))
+            and not _run_dashboard(output_dir, dashboard, compress, records, profile_dump)):
+        failed.append('综合页面')
+    if profile:
+        _report_profile(records, output_dir)
+    print(f"构建结束，共构建 {len(to_build)} 个阶段，跳过 {len(stages) - len(to_build)} 个，"
+          f"总用时 {time.perf_counter() - started:.2f}s")
+    if failed:
+        print(f"以下阶段构建失败：{', '.join(failed)}")
+        return 1
+    return 0
@@ -0,0 +1,194 @@
+"""
+构建过程的性能剖析
+
+使用 --profile 构建时，数据加载和每个图表阶段都由 profile_stage 包裹，记录：
+
+- 用时和 tracemalloc 内存峰值（tracemalloc 会让构建变慢，只在剖析时开启）
+- 输入行数和输出的数据项数（输出 JSON 中最长数组的长度）
+- 阶段中实际写入的文件数和字节数，内容未变化而跳过复制的文件（如 assets/ 下的 ECharts）不计入
+- 子步骤用时：解析数据源、读取缓存、分词、写数据文件、写页面等由 step() 标记的步骤，
+  阶段用时中未被子步骤覆盖的部分主要是 pandas 的聚合计算
+
+可以为每个阶段额外保存一份 cProfile 结果（.pstats），用 python -m pstats 或 snakeviz 查看。
+"""
+import contextlib
+import json
+import os
+import time
+import tracemalloc
+import unicodedata
+
+# 当前正在剖析的阶段记录，step() 把子步骤用时记入其中；未在剖析时为 None
+_active = None
+
+
+@contextlib.contextmanager
+def step(name):
+    """
+    标记阶段中的一个子步骤，只在剖析时记录用时，同名子步骤的用时累加
+
+    参数:
+    name: str - 子步骤名称
+    """
+    record = _active
+    if record is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        steps = record['steps']
+        steps[name] = steps.get(name, 0.0) + time.perf_counter() - started
+
+
+def skipped(path):
+    """
+    记录内容未变化、没有改写的输出文件，剖析时不计入阶段的写入量
+
+    参数:
+    path: str - 文件路径
+    """
+    if _active is not None:
+        _active['skipped'].add(path)
+
+
+def _longest_array(value):
+    if isinstance(value, list):
+        return max([len(value)] + [_longest_array(item) for item in value if isinstance(item, (list, dict))])
+    if isinstance(value, dict):
+        return max([_longest_array(item) for item in value.values()] or [0])
+    return 0
+
+
+def output_rows(paths):
+    """
+    输出 JSON 数据文件中的数据项数，各文件取最长数组的长度后相加
+    """
+    total = 0
+    for path in paths:
+        if not path.endswith('.json'):
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            total += _longest_array(json.load(f))
+    return total
+
+
+def profile_stage(name, fn, rows_in=None, dump_dir=None):
+    """
+    执行并剖析一个阶段
+
+    参数:
+    name: str - 阶段名称
+    fn: callable - 无参数的函数，返回生成的文件路径列表或 DataFrame
+    rows_in: int - 输入行数
+    dump_dir: str - 保存 cProfile 结果的目录，为空时不启用 cProfile
+
+    返回:
+    tuple - (fn 的返回值, 剖析记录)
+    """
+    global _active
+
+    record = {'stage': name, 'rows_in': rows_in, 'steps': {}, 'skipped': set()}
+    profiler = None
+    if dump_dir:
+        import cProfile
+
+        profiler = cProfile.Profile()
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    _active = record
+    started = time.perf_counter()
+    try:
+        if profiler is not None:
+            profiler.enable()
+        result = fn()
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        record['seconds'] = round(time.perf_counter() - started, 4)
+        record['peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 2)
+        if not tracing:
+            tracemalloc.stop()
+        _active = None
+    record['steps'] = {key: round(value, 4) for key, value in record['steps'].items()}
+    skipped_paths = record.pop('skipped')
+
+    if isinstance(result, list):
+        paths = [path for path in result if os.path.exists(path)]
+        # 构建脚本返回的文件包括未被改写的共享脚本，由 skipped() 记录，不计入写入量
+        written = [path for path in paths if path not in skipped_paths]
+        record['files'] = len(written)
+        record['bytes_written'] = sum(os.path.getsize(path) for path in written)
+        record['rows_out'] = output_rows(paths)
+    else:
+        record['rows_out'] = len(result)
+
+    if profiler is not None:
+        os.makedirs(dump_dir, exist_ok=True)
+        record['pstats'] = os.path.join(dump_dir, f'{name}.pstats')
+        profiler.dump_stats(record['pstats'])
+    return result, record
+
+
+def write_report(records, path):
+    """
+    将剖析记录写为 JSON 报告
+
+    参数:
+    records: list - profile_stage 返回的剖析记录
+    path: str - 报告路径
+    """
+    report = {
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'total_seconds': round(sum(record['seconds'] for record in records), 4),
+        'stages': records,
+    }
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=4)
+    os.replace(tmp_path, path)
+
+
+def _format_bytes(size):
+    if size is None:
+        return '-'
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024 or unit == 'MB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def pad(text, width, right=False):
+    """
+    按终端中的显示宽度补齐空格，中文字符占两列
+
+    参数:
+    text: object - 单元格内容
+    width: int - 显示宽度
+    right: bool - 是否右对齐
+    """
+    text = str(text)
+    padding = ' ' * max(0, width - sum(2 if unicodedata.east_asian_width(ch) in 'WF' else 1 for ch in text))
+    return padding + text if right else text + padding
+
+
+def format_report(records):
+    """
+    将剖析记录格式化为文本表格，子步骤按用时从高到低列出
+    """
+    widths = [10, 10, 10, 10, 10, 11]
+    header = ['阶段', '用时(s)', '峰值(MB)', '输入行数', '输出项数', '写入']
+    lines = [''.join(pad(text, width, i > 0) for i, (text, width) in enumerate(zip(header, widths))) + '  子步骤']
+    for record in records:
+        steps = sorted(record['steps'].items(), key=lambda item: item[1], reverse=True)
+        cells = [
+            record['stage'], f"{record['seconds']:.3f}", f"{record['peak_mb']:.1f}",
+            '-' if record['rows_in'] is None else record['rows_in'], record['rows_out'],
+            _format_bytes(record.get('bytes_written')),
+        ]
+        line = ''.join(pad(cell, width, i > 0) for i, (cell, width) in enumerate(zip(cells, widths)))
+        lines.append(line + '  ' + '，'.join(f"{name} {seconds:.3f}s" for name, seconds in steps))
+    return '\n'.join(lines)
@@ -0,0 +1,108 @@
+"""
+数据集的规范列名和列类型
+
+原始表头带有换行和对齐用的空格（如 '最好名次\\n(双榜           )'），
+这里统一去掉所有空白字符作为规范列名，并按 SCHEMA 转换列类型：
+
+- 日期列解析为 datetime64
+- 不含缺失值的整数列降为 int32，求和时 pandas 会自动提升为 int64
+- 含“未统计”等非数值内容的列转换为 float32，缺失处为 NaN；
+  对这些列求和或求均值时应先转换为 float64，float32 累加超过 2^24 后会丢失精度
+- 分类和作者列转换为 category，分组时需要传入 observed=True
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+# 规范列名 -> 列类型，顺序与原始表头一致
+SCHEMA = {
+    '书号': 'int64',
+    '书名': 'string',
+    '链接': 'string',
+    '一级分类': 'category',
+    '二级分类': 'category',
+    '作者': 'category',
+    '入库时间': 'datetime',
+    '上榜历时(日)': 'int32',
+    '首次上榜日期(双榜)': 'datetime',
+    '首次上榜字数(双榜)': 'int32',
+    '首次上榜打赏额(双榜)': 'float32',
+    '末次上榜日期(双榜)': 'datetime',
+    '最好名次(双榜)': 'int32',
+    '最差名次(双榜)': 'int32',
+    '总次数(双榜)': 'int32',
+    '首日v收': 'float32',
+    '首日鲜花': 'float32',
+    '首日打赏': 'float32',
+    '首日评价': 'float32',
+    '首日书评数': 'float32',
+    '首日字数(千)': 'float32',
+}
+
+DATE_COLUMNS = [col for col, kind in SCHEMA.items() if kind == 'datetime']
+NUMERIC_COLUMNS = [col for col, kind in SCHEMA.items() if kind in ('int32', 'float32')]
+CATEGORY_COLUMNS = [col for col, kind in SCHEMA.items() if kind == 'category']
+
+_WHITESPACE = re.compile(r'\s+')
+_INT32 = np.iinfo(np.int32)
+
+
+def canonical_name(column):
+    """
+    将原始表头转换为规范列名，去掉其中所有的换行和空格
+
+    参数:
+    column: str - 原始表头
+
+    返回:
+    str - 规范列名
+    """
+    return _WHITESPACE.sub('', str(column))
+
+
+def _to_int32(values):
+    """
+    整数列在没有缺失值且不超出范围时降为 int32，否则退化为 float32
+    """
+    numeric = pd.to_numeric(values, errors='coerce')
+    if numeric.notna().all():
+        as_float = numeric.astype('float64')
+        if (as_float % 1 == 0).all() and as_float.between(_INT32.min, _INT32.max).all():
+            return numeric.astype('int32')
+    return numeric.astype('float32')
+
+
+def _convert(values, kind):
+    """
+    按 SCHEMA 中的类型转换单列
+    """
+    if kind == 'datetime':
+        return pd.to_datetime(values, errors='coerce')
+    if kind == 'int32':
+        return _to_int32(values)
+    if kind == 'float32':
+        return pd.to_numeric(values, errors='coerce').astype('float32')
+    if kind == 'int64':
+        return pd.to_numeric(values, errors='coerce')
+    if kind == 'category':
+        return values.where(values.isna(), values.astype(str)).astype('category')
+    return values.where(values.isna(), values.astype(str))
+
+
+def normalize_dataset(df):
+    """
+    统一列名并转换列类型
+
+    参数:
+    df: DataFrame - 原始表头的数据集
+
+    返回:
+    DataFrame - 规范列名和类型的新数据集，不在 SCHEMA 中的列原样保留
+    """
+    df = df.rename(columns=canonical_name)
+    return df.assign(**{
+        col: _convert(df[col], kind)
+        for col, kind in SCHEMA.items()
+        if col in df.columns
+    })
@@ -0,0 +1,203 @@
+"""
+书名分词
+
+每个书名单独分词，书名之间不会在拼接处粘连成新词。分词结果按书号缓存，
+书名未变化的书籍不会被重复分词；待分词的书名较多时分发到进程池并行处理。
+词云和力导向图共用分词缓存，写入时把新的分词结果合并到磁盘上的缓存中，并行构建时互不覆盖。
+
+jieba 只在确实有书名需要分词时才导入。它的前缀词典预先序列化为 pickle 保存在
+数据缓存目录中，读取速度约为 jieba 自带 marshal 缓存的四倍。
+"""
+import contextlib
+import json
+import logging
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from importlib.metadata import version
+
+from .config import CACHE_DIR
+from .profiling import step
+
+TOKEN_CACHE = os.path.join(CACHE_DIR, 'title_tokens.json')
+PREFIX_DICT_CACHE = os.path.join(CACHE_DIR, 'jieba_prefix_dict.pkl')
+
+# 待分词书名少于该数量时串行处理，每个工作进程都要加载一次词典，书名太少时并行反而更慢
+PARALLEL_THRESHOLD = 20000
+
+
+def _cache_version():
+    # 从安装信息读取版本号，缓存全部命中时不需要导入 jieba
+    return f"jieba-{version('jieba')}"
+
+
+def _prefix_dict_key(tokenizer):
+    """
+    前缀词典缓存的校验键：jieba 版本、词典路径以及自定义词典的修改时间
+    """
+    dictionary = tokenizer.dictionary
+    mtime = os.path.getmtime(dictionary) if dictionary else None
+    return [_cache_version(), dictionary, mtime]
+
+
+def load_jieba(cache_file=PREFIX_DICT_CACHE):
+    """
+    导入 jieba 并加载前缀词典，优先读取预序列化的前缀词典
+
+    参数:
+    cache_file: str - 前缀词典缓存文件
+
+    返回:
+    module - 已完成初始化的 jieba 模块
+    """
+    import jieba
+
+    tokenizer = jieba.dt
+    if tokenizer.initialized:
+        return jieba
+    jieba.setLogLevel(logging.WARNING)
+
+    key = _prefix_dict_key(tokenizer)
+    try:
+        with open(cache_file, 'rb') as f:
+            cached_key, freq, total = pickle.load(f)
+    except (OSError, EOFError, TypeError, ValueError, pickle.UnpicklingError):
+        cached_key = None
+    if cached_key == key:
+        tokenizer.FREQ, tokenizer.total = freq, total
+        tokenizer.initialized = True
+        return jieba
+
+    # 没有可用的缓存，由 jieba 构建前缀词典后写入缓存；jieba 自己的缓存也放在数据缓存目录中
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    tokenizer.tmp_dir = os.path.dirname(cache_file)
+    tokenizer.initialize()
+    tmp_path = cache_file + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump((key, tokenizer.FREQ, tokenizer.total), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, cache_file)
+    return jieba
+
+
+def _load_token_cache(cache_file):
+    """
+    读取分词缓存，缓存不存在、损坏或分词器版本不同时返回空缓存
+
+    返回:
+    dict - 书号 -> [书名, 分词结果]
+    """
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if cache.get('version') != _cache_version():
+        return {}
+    return cache.get('tokens', {})
+
+
+@contextlib.contextmanager
+def _cache_lock(cache_file):
+    """
+    分词缓存的文件锁，读取、合并和替换缓存文件在锁内完成；没有 fcntl 的平台（Windows）不加锁
+    """
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    with open(cache_file + '.lock', 'w') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _save_token_cache(cache_file, updates):
+    """
+    将新的分词结果合并到磁盘上的缓存中
+
+    词云和力导向图共用分词缓存，并行构建时两个进程可能同时写入：每个进程只写入自己新分词的书名，
+    写入前重新读取缓存文件，不会覆盖另一个进程刚写入的结果
+
+    参数:
+    cache_file: str - 分词缓存文件
+    updates: dict - 书号 -> [书名, 分词结果]
+    """
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    with _cache_lock(cache_file):
+        tokens = _load_token_cache(cache_file)
+        tokens.update(updates)
+        tmp_path = f"{cache_file}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': _cache_version(), 'tokens': tokens}, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, cache_file)
+
+
+def cut_titles(titles):
+    """
+    逐个书名分词
+
+    参数:
+    titles: list - 书名列表
+
+    返回:
+    list - 与 titles 对齐的分词结果列表
+    """
+    jieba = load_jieba()
+    return [jieba.lcut(title) for title in titles]
+
+
+def _cut_parallel(titles, jobs):
+    """
+    将书名分块后在进程池中分词，保持原有顺序
+    """
+    chunk_size = -(-len(titles) // (jobs * 4))
+    chunks = [titles[i:i + chunk_size] for i in range(0, len(titles), chunk_size)]
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        return [tokens for chunk in executor.map(cut_titles, chunks) for tokens in chunk]
+
+
+def segment_titles(book_ids, titles, cache_file=TOKEN_CACHE, jobs=None):
+    """
+    对书名分词，优先使用按书号缓存的结果
+
+    参数:
+    book_ids: iterable - 书号
+    titles: iterable - 与书号对齐的书名
+    cache_file: str - 分词缓存文件，为 None 时不使用缓存
+    jobs: int - 并行进程数，为 None 时在待分词书名达到 PARALLEL_THRESHOLD 后使用全部 CPU 核心
+
+    返回:
+    list - 与 titles 对齐的分词结果列表
+    """
+    keys = [str(book_id) for book_id in book_ids]
+    titles = [str(title) for title in titles]
+    cache = _load_token_cache(cache_file) if cache_file else {}
+
+    results = [None] * len(titles)
+    missing = []
+    for i, (key, title) in enumerate(zip(keys, titles)):
+        hit = cache.get(key)
+        if hit is not None and hit[0] == title:
+            results[i] = hit[1]
+        else:
+            missing.append(i)
+
+    if not missing:
+        return results
+
+    pending = [titles[i] for i in missing]
+    if jobs is None:
+        jobs = (os.cpu_count() or 1) if len(pending) >= PARALLEL_THRESHOLD else 1
+    with step('分词'):
+        tokens = _cut_parallel(pending, jobs) if jobs > 1 else cut_titles(pending)
+
+    updates = {}
+    for i, title_tokens in zip(missing, tokens):
+        results[i] = title_tokens
+        updates[keys[i]] = [titles[i], title_tokens]
+    if cache_file:
+        _save_token_cache(cache_file, updates)
+    return results
@@ -0,0 +1,303 @@
+"""
+图表数据查询服务
+
+构建生成的是全量数据的静态图表；综合页面需要按分类或时间范围交互筛选时，由本地查询服务
+在内存中的数据集上重新聚合。服务启动时只加载一次数据（与构建共用列式缓存），之后：
+
+- /api/meta 返回可选的一级分类及其二级分类、上榜日期范围和各图表对应的查询接口
+- /api/<接口> 返回筛选后的图表数据，结构与构建写出的数据文件相同，页面直接复用渲染函数。
+  接口由构建脚本的 QUERY 属性声明，聚合由构建脚本的 query(df, **参数) 完成，与构建共用同一份逻辑
+
+筛选参数：category（一级分类）和 subcategory（二级分类）可重复；start、end 按首次上榜日期筛选，
+取值为 2023、2023Q2、2023-05 或 2023-05-01，分别表示整年、整季度、整月或当天，两端都包含在内。
+其余参数原样传给 query，如折线图的 granularity。
+
+参数错误返回 400，未知的接口返回 404，查询本身出错时返回 500，错误信息都以 JSON 返回。
+
+相同的查询（参数顺序无关）命中 LRU 缓存，直接返回已序列化和压缩的响应；响应带 ETag，
+浏览器再次请求时返回 304。客户端接受 gzip 时返回压缩后的内容。
+
+其余路径作为静态文件由 visualizations/ 目录提供，综合页面通过同一服务访问即可使用筛选。
+"""
+import functools
+import gzip
+import hashlib
+import importlib
+import inspect
+import json
+import sys
+import time
+import traceback
+from collections import namedtuple
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from .config import DATA_FILE, SCRIPTS_DIR, VISUALIZATIONS_DIR
+
+# 各构建脚本位于 scripts/ 目录下
+if SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR)
+
+API_PREFIX = '/api/'
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8000
+DEFAULT_CACHE_SIZE = 256
+
+# 筛选条件使用的列
+CATEGORY_COLUMN = '一级分类'
+SUBCATEGORY_COLUMN = '二级分类'
+DATE_COLUMN = '首次上榜日期(双榜)'
+FILTER_COLUMNS = [CATEGORY_COLUMN, SUBCATEGORY_COLUMN, DATE_COLUMN]
+
+# 可重复的筛选参数 -> 列
+LIST_FILTERS = {'category': CATEGORY_COLUMN, 'subcategory': SUBCATEGORY_COLUMN}
+
+# 小于该字节数的响应不压缩
+MIN_GZIP_BYTES = 1024
+
+Response = namedtuple('Response', ['body', 'gzipped', 'etag'])
+
+
+class QueryError(ValueError):
+    """
+    查询参数错误，返回 400
+    """
+
+
+def query_modules(stages=None):
+    """
+    声明了查询接口（QUERY 属性）的构建阶段
+
+    参数:
+    stages: list - 构建阶段，默认流水线的全部阶段
+
+    返回:
+    list - (阶段, 构建脚本模块) 列表
+    """
+    from .pipeline import STAGES
+
+    modules = []
+    for stage in stages or STAGES:
+        module = importlib.import_module(stage.module)
+        if hasattr(module, 'QUERY'):
+            modules.append((stage, module))
+    return modules
+
+
+def encode_response(payload):
+    """
+    序列化响应，并计算 ETag 和 gzip 压缩后的内容
+    """
+    body = json.dumps(payload, ensure_ascii=False, separators=(',', ':'), allow_nan=False).encode('utf-8')
+    gzipped = gzip.compress(body, compresslevel=6, mtime=0) if len(body) >= MIN_GZIP_BYTES else None
+    return Response(body, gzipped, f'"{hashlib.sha1(body).hexdigest()}"')
+
+
+def _period_bounds(value, name):
+    import pandas as pd
+
+    try:
+        period = pd.Period(value)
+    except (ValueError, TypeError):
+        raise QueryError(f"无法识别的日期：{name}={value}（如 2023、2023Q2、2023-05、2023-05-01）") from None
+    return period.start_time, period.end_time
+
+
+def normalize_params(query_string):
+    """
+    将查询字符串规范为可哈希、与参数顺序无关的缓存键
+
+    参数:
+    query_string: str - URL 中的查询字符串
+
+    返回:
+    tuple - ((参数名, 取值元组), ...)，按参数名排序；可重复的筛选参数的取值也排序
+    """
+    params = parse_qs(query_string, keep_blank_values=False)
+    normalized = []
+    for name, values in sorted(params.items()):
+        if name in LIST_FILTERS:
+            values = sorted({value for item in values for value in item.split(',') if value})
+        elif len(values) > 1:
+            raise QueryError(f"参数不能重复：{name}")
+        normalized.append((name, tuple(values)))
+    return tuple(normalized)
+
+
+class QueryService:
+    """
+    在内存中的数据集上执行各图表的查询，缓存序列化后的响应
+
+    参数:
+    df: DataFrame - 数据集，至少包含筛选列和各查询读取的列
+    modules: list - query_modules 返回的 (阶段, 构建脚本模块) 列表
+    cache_size: int - LRU 缓存的响应数量
+    """
+
+    def __init__(self, df, modules, cache_size=DEFAULT_CACHE_SIZE):
+        self.df = df
+        self.modules = {module.QUERY: module for _, module in modules}
+        self.stages = {stage.name: module.QUERY for stage, module in modules}
+        self.response = functools.lru_cache(maxsize=cache_size)(self._response)
+
+    def meta(self):
+        """
+        可选的筛选取值和查询接口
+        """
+        pairs = self.df[[CATEGORY_COLUMN, SUBCATEGORY_COLUMN]].dropna().drop_duplicates()
+        categories = {
+            str(category): sorted(str(value) for value in group[SUBCATEGORY_COLUMN])
+            for category, group in pairs.groupby(CATEGORY_COLUMN, observed=True)
+        }
+        dates = self.df[DATE_COLUMN].dropna()
+        return {
+            'categories': categories,
+            'dates': {
+                'start': dates.min().strftime('%Y-%m-%d') if len(dates) else None,
+                'end': dates.max().strftime('%Y-%m-%d') if len(dates) else None,
+            },
+            'endpoints': self.stages,
+        }
+
+    def select(self, params):
+        """
+        按筛选参数选出数据行
+
+        参数:
+        params: tuple - normalize_params 返回的参数
+
+        返回:
+        tuple - (筛选后的 DataFrame, 传给 query 的其余参数)
+        """
+        df = self.df
+        mask = None
+        options = {}
+        for name, values in params:
+            if name in LIST_FILTERS:
+                condition = df[LIST_FILTERS[name]].isin(values)
+            elif name == 'start':
+                condition = df[DATE_COLUMN] >= _period_bounds(values[0], name)[0]
+            elif name == 'end':
+                condition = df[DATE_COLUMN] <= _period_bounds(values[0], name)[1]
+            else:
+                options[name] = values[0]
+                continue
+            mask = condition if mask is None else mask & condition
+        return (df if mask is None else df[mask]), options
+
+    def _response(self, endpoint, params):
+        if endpoint == 'meta':
+            return encode_response(self.meta())
+        module = self.modules.get(endpoint)
+        if module is None:
+            raise LookupError(endpoint)
+        df, options = self.select(params)
+        try:
+            inspect.signature(module.query).bind(df, **options)
+        except TypeError:
+            raise QueryError(f"接口 {endpoint} 不支持参数：{', '.join(options)}") from None
+        return encode_response(module.query(df, **options))
+
+
+class QueryHandler(SimpleHTTPRequestHandler):
+    """
+    /api/ 下的请求交给查询服务，其余路径作为静态文件
+    """
+
+    service = None
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if not url.path.startswith(API_PREFIX):
+            return super().do_GET()
+
+        started = time.perf_counter()
+        endpoint = url.path[len(API_PREFIX):].strip('/')
+        try:
+            response = self.service.response(endpoint, normalize_params(url.query))
+        except LookupError:
+            return self._send_error(404, f"未知的接口：{endpoint}（可选：meta、{'、'.join(self.service.modules)}）")
+        except ValueError as e:
+            return self._send_error(400, str(e))
+        except Exception as e:
+            # 构建脚本的 query 出错时同样返回响应，不直接断开连接
+            self.log_error("查询 %s 失败：%s", self.path, traceback.format_exc())
+            return self._send_error(500, f"查询失败：{e}")
+
+        if self.headers.get('If-None-Match') == response.etag:
+            self.send_response(304)
+            self._send_cache_headers(response.etag)
+            self.end_headers()
+            return
+
+        body = response.body
+        use_gzip = response.gzipped is not None and 'gzip' in self.headers.get('Accept-Encoding', '')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        if use_gzip:
+            body = response.gzipped
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Server-Timing', f'query;dur={(time.perf_counter() - started) * 1000:.1f}')
+        self._send_cache_headers(response.etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_cache_headers(self, etag):
+        # 每次都向服务验证，数据未变化时由 ETag 得到 304
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Vary', 'Accept-Encoding')
+
+    def _send_error(self, status, message):
+        body = json.dumps({'error': message}, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def query_columns(modules):
+    """
+    查询服务需要加载的列：筛选列和各查询读取的列
+    """
+    names = list(FILTER_COLUMNS)
+    for _, module in modules:
+        names += [col for col in module.INPUT_COLUMNS if col not in names]
+    return names
+
+
+def serve(input_file=DATA_FILE, root=VISUALIZATIONS_DIR, host=DEFAULT_HOST, port=DEFAULT_PORT,
+          cache_size=DEFAULT_CACHE_SIZE, use_cache=True):
+    """
+    加载数据集并启动查询服务，直到按 Ctrl+C 退出
+
+    参数:
+    input_file: str - 输入数据文件路径
+    root: str - 静态文件目录
+    host: str - 监听地址
+    port: int - 监听端口
+    cache_size: int - LRU 缓存的响应数量
+    use_cache: bool - 是否使用列式数据缓存
+
+    返回:
+    int - 退出码
+    """
+    from .dataset import load_dataset
+
+    modules = query_modules()
+    started = time.perf_counter()
+    df = load_dataset(input_file, use_cache=use_cache, columns=query_columns(modules))
+    print(f"数据加载完成：{len(df)} 行，用时 {time.perf_counter() - started:.2f}s")
+
+    handler = type('Handler', (QueryHandler,), {'service': QueryService(df, modules, cache_size)})
+    server = ThreadingHTTPServer((host, port), functools.partial(handler, directory=root))
+    print(f"查询服务已启动：http://{host}:{server.server_address[1]}/（静态文件目录 {root}）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("查询服务已停止")
+    finally:
+        server.server_close()
+    return 0
@@ -0,0 +1,271 @@
+"""
+SQLite 书籍数据库
+
+每次抓取导出的都是完整的工作簿，直接作为数据源时任何变化都要重新处理全部书籍。
+书籍数据库按书号合并各次导出（python -m novel_trends ingest 导出文件）：
+
+- 新书插入，内容有变化的书更新，未变化的书不写入；导出中没有出现的书保留在数据库中
+- 每次导入是一个批次，新增或变化的行记录所在的批次号（_version），
+  read_changes 只读取某个批次之后变化的行
+- 导出文件流式读取（见 ingest 模块），每个分块用 executemany 写入，整次导入在同一个事务中完成
+- 作者、一级分类/二级分类和上榜日期建有索引
+
+数据库同时维护聚合立方体（见 cube 模块）：书籍表上的触发器在插入、更新和删除时
+对 一级分类 × 二级分类 × 月份 的单元格增减相应的计数和求和，导入的开销只与变化的行数有关。
+以数据库为数据源构建时，可以由立方体构建的图表直接读取这几千个单元格，不需要读取书籍。
+
+数据库文件（.sqlite3、.sqlite、.db）也可以像 Excel 一样作为 --input 数据源，按导入顺序读取全部书籍。
+立方体表中缺失的分类记为空字符串、缺失的月份记为 MISSING_MONTH，读取时还原为缺失值。
+"""
+import os
+import sqlite3
+import time
+
+import pandas as pd
+
+from .config import STORE_FILE
+from .cube import LEVELS
+from .ingest import CHUNK_ROWS, SQLITE_TABLE, _append_chunk, _finish, _quote, iter_source_chunks, sqlite_chunks
+from .schema import SCHEMA
+
+# 数据库结构版本，修改表、索引或触发器时需要递增
+STORE_VERSION = 1
+
+# 各列类型对应的 SQLite 类型，日期保存为 'YYYY-MM-DD HH:MM:SS' 文本
+SQL_TYPES = {'int64': 'INTEGER', 'int32': 'INTEGER', 'float32': 'REAL', 'datetime': 'TEXT'}
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+KEY_COLUMN = '书号'
+CUBE_TABLE = 'cube'
+MISSING_MONTH = -2 ** 31
+
+# 书籍表上的索引：索引名 -> 列
+INDEXES = {
+    'books_author': ['作者'],
+    'books_category': ['一级分类', '二级分类'],
+    'books_first_listed': ['首次上榜日期(双榜)'],
+    'books_last_listed': ['末次上榜日期(双榜)'],
+    'books_version': ['_version'],
+}
+
+# 立方体单元格的键：维度 -> 书籍行上的 SQL 表达式，{row} 为 NEW 或 OLD；月份为从 1970-01 起计的月份序号
+_DATE = '{row}."首次上榜日期(双榜)"'
+CUBE_KEYS = {
+    '一级分类': "COALESCE({row}.\"一级分类\", '')",
+    '二级分类': "COALESCE({row}.\"二级分类\", '')",
+    '月份': (f"COALESCE((CAST(strftime('%Y', {_DATE}) AS INTEGER) - 1970) * 12"
+           f" + CAST(strftime('%m', {_DATE}) AS INTEGER) - 1, {MISSING_MONTH})"),
+}
+
+# 立方体的部分结果列（与 cube.build_cube 的列相同）-> (SQLite 类型, 一本书贡献的值)
+_RANK = '({row}."最好名次(双榜)" + {row}."最差名次(双榜)") / 2.0'
+CUBE_PARTS = {
+    '书籍数量|size': ('INTEGER', '1'),
+    '书名数量|count': ('INTEGER', '{row}."书名" IS NOT NULL'),
+    '首日打赏|sum': ('REAL', 'COALESCE({row}."首日打赏", 0)'),
+    '首日鲜花|sum': ('REAL', 'COALESCE({row}."首日鲜花", 0)'),
+    '总上榜次数|sum': ('INTEGER', 'COALESCE({row}."总次数(双榜)", 0)'),
+    '平均名次|sum': ('REAL', f'COALESCE({_RANK}, 0)'),
+    '平均名次|count': ('INTEGER', f'{_RANK} IS NOT NULL'),
+}
+
+
+def is_store(path):
+    """
+    按扩展名判断数据源是否为 SQLite 书籍数据库
+    """
+    from .ingest import SQLITE_EXTENSIONS
+
+    return os.path.splitext(path)[1].lower() in SQLITE_EXTENSIONS
+
+
+def _cube_change(row, sign):
+    # 把一本书（NEW 或 OLD）的贡献加到（sign 为 +）或减出（sign 为 -）所在的单元格
+    keys = [expr.format(row=row) for expr in CUBE_KEYS.values()]
+    values = [f"{sign}({expr.format(row=row)})" for _, expr in CUBE_PARTS.values()]
+    parts = [_quote(name) for name in CUBE_PARTS]
+    updates = ', '.join(f"{part} = {part} + excluded.{part}" for part in parts)
+    return (f"INSERT INTO {CUBE_TABLE} ({', '.join([_quote(key) for key in CUBE_KEYS] + parts)}) "
+            f"VALUES ({', '.join(keys + values)}) "
+            f"ON CONFLICT ({', '.join(_quote(key) for key in CUBE_KEYS)}) DO UPDATE SET {updates};")
+
+
+def _cube_cleanup(row):
+    # 单元格中已经没有书时删除
+    match = ' AND '.join(f"{_quote(key)} = {expr.format(row=row)}" for key, expr in CUBE_KEYS.items())
+    return f"DELETE FROM {CUBE_TABLE} WHERE {match} AND {_quote('书籍数量|size')} = 0;"
+
+
+def _schema_statements():
+    columns = [f"{_quote(col)} {SQL_TYPES.get(kind, 'TEXT')}" for col, kind in SCHEMA.items()]
+    columns[list(SCHEMA).index(KEY_COLUMN)] = f"{_quote(KEY_COLUMN)} INTEGER NOT NULL UNIQUE"
+    cube_columns = [f"{_quote(key)} {'INTEGER' if key == '月份' else 'TEXT'} NOT NULL" for key in CUBE_KEYS]
+    cube_columns += [f"{_quote(name)} {kind} NOT NULL DEFAULT 0" for name, (kind, _) in CUBE_PARTS.items()]
+    return [
+        # 书号不作为 rowid，rowid 保持首次导入的顺序，读取时与导出文件中的顺序一致
+        f"CREATE TABLE {SQLITE_TABLE} ({', '.join(columns)}, _version INTEGER NOT NULL)",
+        "CREATE TABLE ingests (id INTEGER PRIMARY KEY AUTOINCREMENT, source TEXT, created TEXT, "
+        "rows INTEGER, inserted INTEGER, updated INTEGER)",
+        f"CREATE TABLE {CUBE_TABLE} ({', '.join(cube_columns)}, "
+        f"PRIMARY KEY ({', '.join(_quote(key) for key in CUBE_KEYS)}))",
+        *(f"CREATE INDEX {name} ON {SQLITE_TABLE} ({', '.join(_quote(col) for col in cols)})"
+          for name, cols in INDEXES.items()),
+        f"CREATE TRIGGER books_cube_insert AFTER INSERT ON {SQLITE_TABLE} BEGIN {_cube_change('NEW', '+')} END",
+        f"CREATE TRIGGER books_cube_update AFTER UPDATE ON {SQLITE_TABLE} BEGIN "
+        f"{_cube_change('OLD', '-')} {_cube_cleanup('OLD')} {_cube_change('NEW', '+')} END",
+        f"CREATE TRIGGER books_cube_delete AFTER DELETE ON {SQLITE_TABLE} BEGIN "
+        f"{_cube_change('OLD', '-')} {_cube_cleanup('OLD')} END",
+    ]
+
+
+def connect(store_file=STORE_FILE):
+    """
+    打开书籍数据库，数据库不存在时创建表、索引和触发器
+
+    异常:
+    ValueError - 数据库由其他版本创建
+    """
+    directory = os.path.dirname(store_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    connection = sqlite3.connect(store_file)
+    version = connection.execute("PRAGMA user_version").fetchone()[0]
+    if version == 0:
+        with connection:
+            for statement in _schema_statements():
+                connection.execute(statement)
+            connection.execute(f"PRAGMA user_version = {STORE_VERSION}")
+    elif version != STORE_VERSION:
+        connection.close()
+        raise ValueError(f"数据库版本不符：{store_file}（版本 {version}，需要 {STORE_VERSION}），请删除后重新导入")
+    return connection
+
+
+def _upsert_statement():
+    names = list(SCHEMA) + ['_version']
+    updates = [name for name in names if name != KEY_COLUMN]
+    return (
+        f"INSERT INTO {SQLITE_TABLE} ({', '.join(_quote(name) for name in names)}) "
+        f"VALUES ({', '.join('?' * len(names))}) "
+        f"ON CONFLICT ({_quote(KEY_COLUMN)}) DO UPDATE SET "
+        + ', '.join(f"{_quote(name)} = excluded.{_quote(name)}" for name in updates)
+        # 内容未变化的书不更新，批次号保持不变，也不会触发立方体的增减
+        + " WHERE " + ' OR '.join(f"{SQLITE_TABLE}.{_quote(col)} IS NOT excluded.{_quote(col)}"
+                                   for col in SCHEMA if col != KEY_COLUMN)
+    )
+
+
+def _column_values(values, kind):
+    """
+    将一列转换为 SQLite 可以绑定的 Python 值，缺失值为 None
+    """
+    missing = values.isna().tolist()
+    if kind == 'datetime':
+        values = values.dt.strftime(DATE_FORMAT)
+    return [None if is_missing else value for value, is_missing in zip(values.tolist(), missing)]
+
+
+def ingest_file(input_file, store_file=STORE_FILE, sheet_name='Sheet1', chunk_rows=CHUNK_ROWS):
+    """
+    将一次抓取的导出文件按书号合并到书籍数据库
+
+    参数:
+    input_file: str - 导出文件路径，支持 Excel、CSV 和 Parquet，需要包含 SCHEMA 中的全部列
+    store_file: str - 数据库路径，不存在时创建
+    sheet_name: str - 工作表名称，只用于 Excel
+    chunk_rows: int - 每次读取和写入的行数
+
+    返回:
+    dict - version（本次的批次号）、rows（读取的行数）、inserted、updated、unchanged、skipped（缺少书号）、seconds
+
+    异常:
+    ValueError - 数据源缺少列或数据库版本不符
+    """
+    started = time.perf_counter()
+    connection = connect(store_file)
+    statement = _upsert_statement()
+    rows = skipped = 0
+    try:
+        # 整次导入在一个事务中完成，失败时数据库保持导入前的状态
+        with connection:
+            before = connection.execute(f"SELECT COUNT(*) FROM {SQLITE_TABLE}").fetchone()[0]
+            cursor = connection.execute(
+                "INSERT INTO ingests (source, created) VALUES (?, ?)",
+                (os.path.abspath(input_file), time.strftime('%Y-%m-%d %H:%M:%S')),
+            )
+            version = cursor.lastrowid
+            for chunk in iter_source_chunks(input_file, sheet_name, list(SCHEMA), chunk_rows):
+                valid = chunk[KEY_COLUMN].notna()
+                skipped += int((~valid).sum())
+                chunk = chunk[valid]
+                columns = [_column_values(chunk[col], kind) for col, kind in SCHEMA.items()]
+                connection.executemany(statement, [row + (version,) for row in zip(*columns)])
+                rows += len(chunk)
+            after = connection.execute(f"SELECT COUNT(*) FROM {SQLITE_TABLE}").fetchone()[0]
+            changed = connection.execute(
+                f"SELECT COUNT(*) FROM {SQLITE_TABLE} WHERE _version = ?", (version,)).fetchone()[0]
+            inserted = after - before
+            connection.execute("UPDATE ingests SET rows = ?, inserted = ?, updated = ? WHERE id = ?",
+                               (rows, inserted, changed - inserted, version))
+    finally:
+        connection.close()
+    return {
+        'version': version,
+        'rows': rows,
+        'inserted': inserted,
+        'updated': changed - inserted,
+        'unchanged': rows - changed,
+        'skipped': skipped,
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+
+
+def store_version(store_file=STORE_FILE):
+    """
+    数据库最近一次导入的批次号，没有导入过时为 0
+    """
+    connection = connect(store_file)
+    try:
+        return connection.execute("SELECT COALESCE(MAX(id), 0) FROM ingests").fetchone()[0]
+    finally:
+        connection.close()
+
+
+def read_changes(store_file=STORE_FILE, since=0, columns=None, chunk_rows=CHUNK_ROWS):
+    """
+    读取某个批次之后新增或变化的书籍，通过批次号上的索引查询，读取量只与变化的行数有关
+
+    参数:
+    store_file: str - 数据库路径
+    since: int - 批次号，如上次构建时的 store_version()
+    columns: list - 只读取这些规范列名的列，为空时读取全部列
+    chunk_rows: int - 每批查询的行数
+
+    返回:
+    DataFrame - 规范列名和类型的数据集（见 schema 模块）
+    """
+    parts = {}
+    lookups = {}
+    for chunk in sqlite_chunks(store_file, columns, chunk_rows, since=since):
+        _append_chunk(parts, lookups, chunk)
+    return _finish(parts, lookups)
+
+
+def read_cube(store_file=STORE_FILE):
+    """
+    读取数据库中由触发器维护的聚合立方体
+
+    返回:
+    DataFrame - 与 cube.build_cube 相同结构的立方体
+    """
+    connection = sqlite3.connect(store_file)
+    try:
+        cube = pd.read_sql_query(f"SELECT * FROM {CUBE_TABLE} WHERE {_quote('书籍数量|size')} > 0", connection)
+    finally:
+        connection.close()
+    index = pd.MultiIndex.from_arrays([
+        cube['一级分类'].replace('', None).astype('category'),
+        cube['二级分类'].replace('', None).astype('category'),
+        cube['月份'].astype('Int32').replace(MISSING_MONTH, None),
+    ], names=LEVELS)
+    return cube[list(CUBE_PARTS)].set_axis(index).sort_index()
@@ -0,0 +1,134 @@
+"""
+合成数据集
+
+按真实数据（飞卢小说数据.xlsx）的列和分布生成任意行数的数据，用于基准测试：
+
+- 一级分类、二级分类按真实数据中各分类的书籍数量加权抽样
+- 作者数量约为行数的 80%，少数作者写了多本书（长尾分布）
+- 书名由常见的题材前缀和短语拼接而成，保证分词和词频统计有真实的工作量
+- 日期范围与真实数据一致，首次上榜晚于入库时间，末次上榜晚于首次上榜
+- 首日数据中有一部分为 "未统计"，与 Excel 中的原始内容一致
+
+生成的是 Excel 解析后、schema 规范之前的原始数据，需要经过 normalize_dataset 才能交给各构建阶段。
+"""
+import numpy as np
+import pandas as pd
+
+# 真实数据中各二级分类的书籍数量，作为抽样权重
+CATEGORY_WEIGHTS = {
+    '军事历史': {'三国梦想': 87, '人文历史': 8, '历史传记': 9, '战争幻想': 58, '架空历史': 361,
+                 '特种军旅': 86, '现代战争': 28, '穿越时空': 154},
+    '同人小说': {'动漫同人': 575, '小说同人': 38, '影视同人': 542, '都市同人': 9},
+    '恐怖灵异': {'恐怖惊悚': 99, '推理悬念': 12, '灵异神怪': 51, '神秘时空': 11},
+    '武侠仙侠': {'传统武侠': 53, '古典仙侠': 105, '星际修真': 3, '武侠修真': 117, '浪子异侠': 1, '现代修真': 9},
+    '玄幻奇幻': {'上古神话': 64, '东方玄幻': 308, '异世大陆': 168, '王朝争霸': 36, '神话传说': 275,
+                 '穿越附身': 7, '转世重生': 20},
+    '科幻网游': {'其它竞技': 2, '星际科幻': 28, '电子竞技': 133, '篮球运动': 29, '虚拟网游': 203,
+                 '超黑科技': 29, '足球运动': 19},
+    '轻小说': {'日常类': 7, '轻幻想': 4},
+    '都市言情': {'商海沉浮': 94, '宦海风云': 1, '浪漫言情': 97, '职场生涯': 19, '豪门恩怨': 3,
+                 '都市异能': 484, '都市生活': 1131},
+    '青春校园': {'另类校园': 1, '校园言情': 2},
+}
+
+# 书名的组成部分
+TITLE_PREFIXES = ['原神', '综漫', '综武', '四合院', '星穹铁道', '三国', '斗罗', '火影', '海贼', '末日',
+                  '重生', '穿越', '都市', '全民', '诸天', '美漫', '洪荒', '大明', '龙族', '网游']
+TITLE_PHRASES = ['开局签到', '加入聊天群', '我有一个系统', '反派', '直播', '无敌', '神级选择', '震惊全网',
+                 '肝出武道神通', '从零开始', '变强', '女帝', '家族', '科技', '修仙', '世界', '主角',
+                 '模拟器', '老祖', '求生', '召唤', '剑仙', '天赋', '觉醒', '崛起']
+
+# 各日期列的范围
+FIRST_DATE = pd.Timestamp('2018-06-10')
+LAST_DATE = pd.Timestamp('2024-05-02')
+
+# 首日数据中 "未统计" 的比例
+MISSING_SHARE = {'首次上榜打赏额(双榜)': 0.18, '首日v收': 0.22}
+DEFAULT_MISSING_SHARE = 0.03
+
+
+def _categories(rng, rows):
+    pairs = [(first, second) for first, children in CATEGORY_WEIGHTS.items() for second in children]
+    weights = np.array([CATEGORY_WEIGHTS[first][second] for first, second in pairs], dtype='float64')
+    picked = rng.choice(len(pairs), size=rows, p=weights / weights.sum())
+    first = np.array([pair[0] for pair in pairs], dtype=object)[picked]
+    second = np.array([pair[1] for pair in pairs], dtype=object)[picked]
+    return first, second
+
+
+def _authors(rng, rows):
+    # 15% 的书出自一小批高产作者（人数为行数的 8%，排名越靠前书越多），其余书籍的作者从很大的作者池中随机抽取，
+    # 与真实数据一样约 80% 的书籍作者互不相同，书籍达到 5 本的作者约占 0.5%
+    prolific_count = max(1, int(rows * 0.08))
+    weights = 1.0 / (np.arange(prolific_count) + prolific_count / 4)
+    prolific = rng.random(rows) < 0.15
+    ids = rng.integers(prolific_count, prolific_count + rows * 3, size=rows)
+    ids[prolific] = rng.choice(prolific_count, size=int(prolific.sum()), p=weights / weights.sum())
+    return pd.Series(ids).map('作者{:07d}'.format).to_numpy(dtype=object)
+
+
+def _titles(rng, rows):
+    prefixes = pd.Series(np.array(TITLE_PREFIXES, dtype=object)[rng.integers(len(TITLE_PREFIXES), size=rows)])
+    first = pd.Series(np.array(TITLE_PHRASES, dtype=object)[rng.integers(len(TITLE_PHRASES), size=rows)])
+    second = pd.Series(np.array(TITLE_PHRASES, dtype=object)[rng.integers(len(TITLE_PHRASES), size=rows)])
+    return (prefixes + '：' + first + '，' + second).to_numpy(dtype=object)
+
+
+def _with_missing(rng, values, share):
+    # 按比例把数值替换为 "未统计"，得到与 Excel 原始内容一样的混合类型列
+    values = values.astype(object)
+    values[rng.random(len(values)) < share] = '未统计'
+    return values
+
+
+def synthetic_dataset(rows, seed=0):
+    """
+    生成指定行数的合成数据集
+
+    参数:
+    rows: int - 行数
+    seed: int - 随机数种子，相同的种子生成相同的数据
+
+    返回:
+    DataFrame - 规范列名、原始内容的数据集，见模块说明
+    """
+    rng = np.random.default_rng(seed)
+    first, second = _categories(rng, rows)
+
+    # 入库时间均匀分布；首次上榜在入库后若干天，末次上榜在首次上榜后若干天，都不晚于 LAST_DATE
+    span = (LAST_DATE - FIRST_DATE).days
+    stored = pd.Series(FIRST_DATE + pd.to_timedelta(rng.integers(0, span - 30, size=rows), unit='D'))
+    delay = rng.exponential(30, size=rows).astype('int64')
+    first_listed = (stored + pd.to_timedelta(delay, unit='D')).clip(upper=LAST_DATE)
+    duration = rng.geometric(1 / 28, size=rows) - 1
+    last_listed = (first_listed + pd.to_timedelta(duration, unit='D')).clip(upper=LAST_DATE)
+
+    best = rng.integers(1, 51, size=rows)
+    worst = np.maximum(best, rng.integers(30, 51, size=rows))
+
+    data = {
+        '书号': 1_000_000 + rng.permutation(rows),
+        '书名': _titles(rng, rows),
+        '链接': np.full(rows, '链接', dtype=object),
+        '一级分类': first,
+        '二级分类': second,
+        '作者': _authors(rng, rows),
+        '入库时间': stored,
+        '上榜历时(日)': duration,
+        '首次上榜日期(双榜)': first_listed,
+        '首次上榜字数(双榜)': rng.integers(5, 120, size=rows),
+        '首次上榜打赏额(双榜)': np.round(rng.lognormal(10, 1.5, size=rows)),
+        '末次上榜日期(双榜)': last_listed,
+        '最好名次(双榜)': best,
+        '最差名次(双榜)': worst,
+        '总次数(双榜)': rng.geometric(1 / 26, size=rows),
+        '首日v收': np.round(rng.lognormal(6.5, 1.2, size=rows)),
+        '首日鲜花': np.round(rng.lognormal(7, 1.3, size=rows)),
+        '首日打赏': np.round(rng.lognormal(6, 1.5, size=rows)),
+        '首日评价': np.round(rng.lognormal(4.5, 1.1, size=rows)),
+        '首日书评数': np.round(rng.lognormal(1.8, 1.0, size=rows)),
+        '首日字数(千)': np.round(rng.normal(19, 6, size=rows).clip(1, 133)),
+    }
+    for col in ['首次上榜打赏额(双榜)', '首日v收', '首日鲜花', '首日打赏', '首日评价', '首日书评数', '首日字数(千)']:
+        data[col] = _with_missing(rng, data[col], MISSING_SHARE.get(col, DEFAULT_MISSING_SHARE))
+    return pd.DataFrame(data)
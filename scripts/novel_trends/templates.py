@@ -0,0 +1,131 @@
+"""
+图表页面模板
+
+所有图表页面共用同一个外壳：引用 ECharts、放置图表容器、加载数据文件后调用图表的渲染函数。
+外壳在导入时编译为 string.Template，各图表只提供一个渲染函数片段 function (chart, data) {...}。
+片段是普通的 JavaScript，不需要像 f-string 那样转义大括号，生成页面只是简单的字符串拼接。
+
+ECharts 随仓库存放在 vendor/ 目录，构建时复制到输出目录的 assets/ 下，所有页面引用同一份文件，
+浏览器只需缓存一次，离线环境也能构建和查看。vendor/ 中没有的脚本退回到固定版本的 CDN 地址。
+"""
+import filecmp
+import os
+import shutil
+import textwrap
+from string import Template
+
+from .profiling import skipped, step
+
+VENDOR_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'vendor')
+ASSETS_DIR = 'assets'
+
+# 页面依赖的脚本：文件名 -> vendor/ 中没有该文件时使用的 CDN 地址
+ECHARTS = 'echarts.min.js'
+WORDCLOUD = 'echarts-wordcloud.min.js'
+SCRIPTS = {
+    ECHARTS: 'https://cdn.jsdelivr.net/npm/echarts@5.4.3/dist/echarts.min.js',
+    WORDCLOUD: 'https://cdn.jsdelivr.net/npm/echarts-wordcloud@2.1.0/dist/echarts-wordcloud.min.js',
+}
+
+DEFAULT_STYLE = 'width: 100%; height: 600px;'
+
+PAGE = Template("""<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>$title</title>
+$scripts
+</head>
+<body>
+$header    <div id="chart" style="$style"></div>
+    <script>
+        var render = $render;
+        var chart = echarts.init(document.getElementById('chart'));
+        fetch('$data_url')
+            .then(function (response) { return response.json(); })
+            .then(function (data) { render(chart, data); });
+    </script>
+</body>
+</html>
+""")
+
+
+# 已提示过从 CDN 加载的脚本，每个进程只提示一次
+_cdn_fallbacks = set()
+
+
+def _copy_if_changed(source, target):
+    """
+    内容不同时才复制；先写临时文件再替换，并行构建的多个阶段可能同时复制同一个文件
+    """
+    if os.path.exists(target) and filecmp.cmp(source, target, shallow=False):
+        skipped(target)
+        return
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp_path = f"{target}.{os.getpid()}.tmp"
+    shutil.copyfile(source, tmp_path)
+    os.replace(tmp_path, target)
+
+
+def install_scripts(output_dir, names=(ECHARTS,)):
+    """
+    将页面依赖的脚本从 vendor/ 复制到输出目录的 assets/ 下
+
+    参数:
+    output_dir: str - 图表输出目录
+    names: list - 脚本文件名，见 SCRIPTS
+
+    返回:
+    tuple - (页面中引用各脚本的地址, 复制到输出目录的文件路径)
+    """
+    urls, paths = [], []
+    for name in names:
+        source = os.path.join(VENDOR_DIR, name)
+        if not os.path.exists(source):
+            if name not in _cdn_fallbacks:
+                _cdn_fallbacks.add(name)
+                print(f"提示：vendor/ 中没有 {name}，页面改为从 CDN 加载：{SCRIPTS[name]}")
+            urls.append(SCRIPTS[name])
+            continue
+        target = os.path.join(output_dir, ASSETS_DIR, name)
+        _copy_if_changed(source, target)
+        urls.append(f"{ASSETS_DIR}/{name}")
+        paths.append(target)
+    return urls, paths
+
+
+def script_tags(urls, indent='    '):
+    return '\n'.join(f'{indent}<script src="{url}"></script>' for url in urls)
+
+
+def render_page(output_html, title, render_js, data_url, header='', style=DEFAULT_STYLE, scripts=(ECHARTS,)):
+    """
+    用共享外壳生成图表页面
+
+    参数:
+    output_html: str - 输出HTML文件路径
+    title: str - 页面标题
+    render_js: str - 渲染函数片段 function (chart, data) {...}，chart 为 ECharts 实例，data 为加载的数据
+    data_url: str - 数据文件相对于页面的地址
+    header: str - 图表上方的 HTML 内容
+    style: str - 图表容器的样式
+    scripts: list - 页面依赖的脚本，见 SCRIPTS
+
+    返回:
+    list - 生成的文件路径，包括复制到输出目录的脚本
+    """
+    with step('复制脚本'):
+        urls, assets = install_scripts(os.path.dirname(output_html), scripts)
+    html_content = PAGE.substitute(
+        title=title,
+        scripts=script_tags(urls),
+        header=textwrap.indent(header.strip() + '\n', '    ') if header.strip() else '',
+        style=style,
+        # 片段第一行紧跟在 "var render = " 之后，其余各行与外壳脚本对齐
+        render=textwrap.indent(textwrap.dedent(render_js).strip(), ' ' * 8)[8:],
+        data_url=data_url,
+    )
+    with step('写页面'), open(output_html, 'w', encoding='utf-8') as f:
+        f.write(html_content)
+    return [output_html] + assets
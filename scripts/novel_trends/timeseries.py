@@ -0,0 +1,107 @@
+"""
+按时间段计数的共享时间序列引擎
+
+日期先按粒度转换为整数周期序号（pandas Period 的 ordinal），分组和补齐日历都在整数上完成，
+不再生成 Period 字符串；只有最终的时间轴标签才格式化为字符串。
+"""
+import numpy as np
+import pandas as pd
+
+# 时间粒度对应的 pandas 周期频率
+GRANULARITIES = {'day': 'D', 'week': 'W', 'month': 'M', 'quarter': 'Q'}
+DEFAULT_GRANULARITY = 'month'
+
+# 时间轴标签格式，按周统计时以每周的第一天作为标签
+LABEL_FORMATS = {'D': '%Y-%m-%d', 'W': '%Y-%m-%d', 'M': '%Y-%m', 'Q': '%YQ%q'}
+
+# 各粒度时间轴的名称
+PERIOD_NAMES = {'day': '日期', 'week': '周', 'month': '月份', 'quarter': '季度'}
+
+
+def frequency(granularity):
+    """
+    时间粒度对应的 pandas 周期频率
+
+    异常:
+    ValueError - 未知的时间粒度
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"未知的时间粒度：{granularity}（可选：{', '.join(GRANULARITIES)}）")
+    return GRANULARITIES[granularity]
+
+
+def period_codes(dates, granularity=DEFAULT_GRANULARITY):
+    """
+    将日期转换为整数周期序号，缺失的日期转换为缺失值
+
+    参数:
+    dates: Series - datetime 类型的日期
+    granularity: str - 时间粒度，可选 day、week、month、quarter
+
+    返回:
+    Series - Int64 类型的周期序号，与 dates 的索引对齐
+    """
+    ordinals = dates.dt.to_period(frequency(granularity)).array.asi8
+    return pd.Series(ordinals, index=dates.index, dtype='Int64').mask(dates.isna())
+
+
+def period_labels(codes, granularity=DEFAULT_GRANULARITY):
+    """
+    将整数周期序号格式化为时间轴标签
+
+    参数:
+    codes: array-like - 周期序号
+    granularity: str - 时间粒度
+
+    返回:
+    list - 标签字符串
+    """
+    freq = frequency(granularity)
+    ordinals = np.asarray(codes, dtype='int64')
+    periods = pd.PeriodIndex(pd.arrays.PeriodArray(ordinals, dtype=pd.PeriodDtype(freq)))
+    if freq == 'W':
+        return periods.start_time.strftime(LABEL_FORMATS[freq]).tolist()
+    return periods.strftime(LABEL_FORMATS[freq]).tolist()
+
+
+def period_counts(dates, groups, granularity=DEFAULT_GRANULARITY, complete=True):
+    """
+    统计每个时间段内各分组的数量，一次交叉计数得到 时间段 × 分组 的矩阵
+
+    参数:
+    dates: Series - datetime 类型的日期，缺失的日期不参与统计
+    groups: Series - 与 dates 对齐的分组
+    granularity: str - 时间粒度，可选 day、week、month、quarter
+    complete: bool - 为 True 时把结果补齐到从最早到最晚的完整日历，没有数据的时间段计为 0；
+              为 False 时只保留有数据的时间段
+
+    返回:
+    DataFrame - 行为按时间先后排列的周期序号，列为分组（分类类型时保持分类顺序），值为 int64 计数
+    """
+    codes = period_codes(dates, granularity)
+    valid = codes.notna() & groups.notna()
+    counts = pd.crosstab(codes[valid].astype('int64').rename('周期'), groups[valid], dropna=False)
+    if isinstance(groups.dtype, pd.CategoricalDtype):
+        # 只保留实际出现过的分类
+        counts = counts.loc[:, counts.sum() > 0]
+    if complete and not counts.empty:
+        counts = counts.reindex(range(counts.index.min(), counts.index.max() + 1), fill_value=0)
+    return counts
+
+
+def melt_counts(df, columns, granularity=DEFAULT_GRANULARITY, complete=True):
+    """
+    将多个日期列合并为长表后一次计数，得到每个时间段内各日期列的数量
+
+    参数:
+    df: DataFrame - 数据
+    columns: dict - 日期列名 -> 结果中的列名
+    granularity: str - 时间粒度
+    complete: bool - 是否补齐到完整日历，见 period_counts
+
+    返回:
+    DataFrame - 行为周期序号，列依次为 columns 中的结果列名
+    """
+    long = df[list(columns)].melt(var_name='类型', value_name='日期')
+    counts = period_counts(long['日期'], long['类型'].map(columns), granularity, complete)
+    return counts.reindex(columns=list(columns.values()), fill_value=0)